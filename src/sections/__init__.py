@@ -5,17 +5,27 @@ https://github.com/trevorpogue/sections
 """
 
 __version__ = '0.0.3'
-__all__ = ['MetaSection', 'Section', 'SectionNone']
+__all__ = [
+    'MetaSection', 'Section', 'SectionNone', 'SectionView', 'cached_property',
+]
 
 import sys
 
 from .meta import MetaSection
+from .properties import cached_property
 from .section import Section
+from .shared import SectionView
 from .types import SectionNone
 
 
 class Module:
 
+    from concurrent.futures import Executor
+    from typing import Dict
+    from typing import Iterable
+    from typing import Optional
+    from typing import Sequence
+    from typing import Tuple
     from typing import Type
 
     from .types import SectionAttrs
@@ -48,6 +58,26 @@ class Module:
         """
         return self.Section_factory(*args, **kwds)
 
+    def build_parallel(
+            self,
+            specs: Iterable[Tuple[Sequence[SectionKeysOrObjects],
+                                  Dict[str, SectionAttrs]]],
+            executor: Optional[Executor] = None,
+            **kwds: SectionAttrs,
+    ) -> Section:
+        """
+        Return a structure whose top-level subtrees are constructed in
+        parallel worker processes. Each spec in `specs` is a pair of the args
+        and kwds that sections() would be called with to construct one
+        subtree, and must be picklable. Each subtree is sent back as a flat
+        record stream and constructed directly in the returned structure's
+        unique class, along with any properties and methods it defined.
+        `kwds` are the attrs of the root node. If `executor` is None, a
+        ProcessPoolExecutor is created and shut down for this call.
+        """
+        from .parallel import build
+        return build(self.Section_factory, specs, executor=executor, **kwds)
+
 
 sections = Module()
 
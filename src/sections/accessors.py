@@ -0,0 +1,73 @@
+from typing import Any
+from typing import Callable
+from typing import Type
+
+from .attr_parser import _get_iterable_attrs
+from .pluralizer import Pluralizer
+from .properties import read
+from .types import AnyDict
+from .types import GetType
+from .types import SectionNone
+from .types import SectionType
+
+
+def accessor(
+        cls: Type[SectionType],
+        name: str,
+        gettype: GetType = 'default',
+        default: Any = SectionNone,
+) -> Callable[[SectionType], Any]:
+    """See :meth:`Section.accessor <Section.accessor>`."""
+    if gettype == 'default':
+        gettype = cls.default_gettype
+    if cls.use_pluralsingular:
+        forms = (name, *_pluralizer(name))
+    else:
+        forms = (name,)
+    names = (name,)
+    convert = _converter(gettype)
+
+    def get(node: SectionType) -> Any:
+        read(node, names)
+        node_attrs = node.__dict__
+        cache = node_attrs.get('_SectionAttrParser__cache')
+        # only non-leaf nodes ever have cached attrs
+        if cache and node.use_cache:
+            attrs = cache.get(name)
+            if attrs:
+                return convert(attrs)
+        for form in forms:
+            value = node_attrs.get(form, SectionNone)
+            if value is not SectionNone:
+                return convert({node: value})
+        # not cached yet, or needing the default: take the full path
+        return node(name, gettype=gettype, default=default)
+
+    get.__name__ = get.__qualname__ = name
+    return get
+
+
+def _converter(gettype: GetType) -> Callable[[AnyDict], Any]:
+    """
+    Return a function converting a dict of found attrs to the form returned
+    for `gettype`, as :meth:`_parse_top_getattr
+    <Section._parse_top_getattr>` does.
+    """
+    if gettype == 'hybrid':
+        def convert(attrs: AnyDict) -> Any:
+            if len(attrs) > 1:
+                return list(attrs.values())
+            return next(iter(attrs.values()))
+    elif gettype is list:
+        def convert(attrs: AnyDict) -> Any:
+            return list(attrs.values())
+    elif gettype is dict:
+        def convert(attrs: AnyDict) -> Any:
+            return {node.name: value for node, value in attrs.items()}
+    else:
+        def convert(attrs: AnyDict) -> Any:
+            return _get_iterable_attrs(attrs, gettype=gettype)
+    return convert
+
+
+_pluralizer = Pluralizer()
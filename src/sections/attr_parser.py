@@ -1,10 +1,18 @@
 from typing import Any
+from typing import Dict
 from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import Union
 
+from .hooks import before_change
+from .hooks import changed
+from .index import index_rename
+from .index import structure_changed
 from .pluralizer import Pluralizer
+from .properties import invalidate
 from .types import AnyDict
 from .types import GetType
 from .types import SectionNone
@@ -20,6 +28,10 @@ class SectionAttrParser:
     _setattr_invalidate_cache_excludes = [
         'default_gettype',
         'use_cache',
+        'use_render_cache',
+        'str_max_depth',
+        'str_max_children',
+        'str_max_width',
     ]
     # default value for __use_nearest until it can be set __init__. Causes
     # issue when using deepcopy with Section otherwise, has to do with this
@@ -36,28 +48,113 @@ class SectionAttrParser:
         attribute `name`. This should be done every time a node is added or
         removed from the tree, or when a node attribute is changed.
         """
+        names = None if name is None else {name}
         node = self
         while node:
             # in some cases, node might not have parent assigned yet here
             # also, use parent in case node gets deleted during
             # structure_change()
             parent = node.__dict__.get('parent', None)
+            node.__dict__.pop('_Section__content_hash', None)
+            invalidate(node, names, node is self)
             if node.use_cache and not node.isleaf:
                 node.__invalidate_node_cache(name)
+            node._SectionStringParser__invalidate_render_cache(node is self)
             if name is None:
+                node._SectionNode__invalidate_structure_caches()
                 node.structure_change()
+                if parent is None:
+                    structure_changed(node)
+            else:
+                # cached leaves/descendants nodes stay valid, but the
+                # attribute caches they hold do not
+                sequences = node.__dict__.get('_Section__sequences', {})
+                for sequence in sequences.values():
+                    sequence.__invalidate_node_cache(name)
             node = parent
 
+    @staticmethod
+    def _set_nodes_attrs(attrs_by_node: Dict[Any, AnyDict]) -> None:
+        """
+        Set attrs on many nodes in one batched update: each node's attrs are
+        set without invalidating caches, then the caches of every changed node
+        and every ancestor above them are invalidated once for all the changed
+        attribute names, instead of once per set attribute.
+        """
+        names = set()
+        for node, attrs in attrs_by_node.items():
+            private_prefix = node.cls._Section__private_prefix
+            before_change(node)
+            for name, value in attrs.items():
+                node.__set_node_attr(name, value, _invalidate_cache=False)
+                if name.startswith(private_prefix):
+                    continue
+                changed(node, 'setattr', name, value)
+                names.add(name)
+                if name == node._Section__keyname:
+                    index_rename(node)
+        visited = set()
+        for changed_node in attrs_by_node:
+            changed_node._SectionStringParser__invalidate_render_cache(True)
+            invalidate(changed_node, names, own=True)
+            node = changed_node
+            while node is not None and node not in visited:
+                visited.add(node)
+                node.__dict__.pop('_Section__content_hash', None)
+                invalidate(node, names)
+                if node.use_cache and not node.isleaf:
+                    for name in names:
+                        node.__invalidate_node_cache(name)
+                if node is not changed_node:
+                    node._SectionStringParser__invalidate_render_cache(False)
+                sequences = node.__dict__.get('_Section__sequences', {})
+                for sequence in sequences.values():
+                    for name in names:
+                        sequence.__invalidate_node_cache(name)
+                node = node.__dict__.get('parent', None)
+
+    @staticmethod
+    def _children_changed(nodes: Iterable[Any]) -> None:
+        """
+        Invalidate the caches of `nodes`, whose children were added or
+        removed without invalidating any caches, and of every ancestor above
+        them, once for all of them instead of once per changed child.
+        """
+        visited = set()
+        for changed_node in nodes:
+            node = changed_node
+            while node is not None and node not in visited:
+                visited.add(node)
+                parent = node.__dict__.get('parent', None)
+                node.__dict__.pop('_Section__content_hash', None)
+                invalidate(node)
+                if node.use_cache and not node.isleaf:
+                    node.__invalidate_node_cache()
+                node._SectionStringParser__invalidate_render_cache(False)
+                node._SectionNode__invalidate_structure_caches()
+                node.structure_change()
+                if parent is None:
+                    structure_changed(node)
+                node = parent
+
     def __invalidate_node_cache(self, name: Optional[str] = None) -> None:
         """Invalidate cache for only self node."""
+        gathers = self.__dict__.get('_SectionAttrParser__gathers')
         if name:
             plural, singular = self.__pluralizer(name)
             self.__cache.pop(name, None)
             self.__cache.pop(plural, None)
             self.__cache.pop(singular, None)
+            if gathers:
+                forms = {name, plural, singular}
+                for names in list(gathers):
+                    if not forms.isdisjoint(names):
+                        del gathers[names]
         else:
             self.__setattr__('_SectionAttrParser__cache',
                              {}, _invalidate_cache=False)
+            if gathers:
+                gathers.clear()
 
     def __setattr__(
             self, name: str, value: Any, _invalidate_cache=True
@@ -77,11 +174,24 @@ class SectionAttrParser:
             self, name: str, value: Any, _invalidate_cache=True
     ) -> None:
         """Set attr for only the self node."""
+        private = name.startswith(self.cls._Section__private_prefix)
+        if _invalidate_cache and not private:
+            before_change(self)
         super().__setattr__(name, value)
-        if (_invalidate_cache and not name.startswith(
-                self.cls._Section__private_prefix)
-                and not self.cls._setattr_invalidate_cache_excludes.count(
-                    name)):
+        if not _invalidate_cache or private:
+            return
+        if self.cls._Section__change_listeners:
+            changed(self, 'setattr', name, value)
+        if self.cls._setattr_invalidate_cache_excludes.count(name):
+            # not an attribute that is searched for, but still printed
+            node = self
+            while node:
+                node._SectionStringParser__invalidate_render_cache(
+                    node is self)
+                node = node.__dict__.get('parent', None)
+        else:
+            if name == self._Section__keyname:
+                index_rename(self)
             self.__invalidate_caches(name)
 
     def __getattr__(self, name: str) -> Any:
@@ -114,6 +224,74 @@ class SectionAttrParser:
             self.__update_cache(name, attrs)
         return attrs
 
+    def _gather_attrs(
+            self, names: Sequence[str],
+    ) -> List[Tuple[Any, Tuple[Any, ...]]]:
+        """
+        Return the rows of attributes `names` gathered from self or
+        descendant nodes in one walk, as pairs of a node and its values. Each
+        attribute is found with the same nearest semantics as
+        :meth:`_get_nearest_attr <Section._get_nearest_attr>`: the walk stops
+        at the first nodes having all of them, or at leaves, and values
+        found on a node are shared by the rows below it. Values not found
+        for a row are SectionNone. The rows are cached under the whole set
+        of names.
+        """
+        names = tuple(names)
+        rows = SectionNone
+        use_cache = self.use_cache and not self.isleaf
+        if use_cache:
+            gathers = self.__dict__.get('_SectionAttrParser__gathers')
+            if gathers is None:
+                gathers = self.__dict__['_SectionAttrParser__gathers'] = {}
+            rows = gathers.get(names, SectionNone)
+        if rows is SectionNone:
+            rows = []
+            if self.use_pluralsingular:
+                forms = tuple((name, *self.__pluralizer(name))
+                              for name in names)
+            else:
+                forms = tuple((name,) for name in names)
+            self.__gather_rows(forms, (SectionNone,) * len(names), rows)
+            if use_cache:
+                gathers[names] = rows
+        return rows
+
+    def __gather_rows(
+            self, forms: Tuple[Tuple[str, ...], ...], values: Tuple[Any, ...],
+            rows: List[Tuple[Any, Tuple[Any, ...]]],
+    ) -> None:
+        """
+        Append to `rows` the rows of self's subtree, given the `values`
+        found on self's ancestors. `forms` holds the names to try for each
+        attribute, in the order :meth:`__get_self_attr` tries them.
+        """
+        found = True
+        if any(value is SectionNone for value in values):
+            values = list(values)
+            node_attrs = self.__dict__
+            for i, names in enumerate(forms):
+                if values[i] is not SectionNone:
+                    continue
+                for name in names:
+                    value = node_attrs.get(name, SectionNone)
+                    if value is not SectionNone:
+                        break
+                else:
+                    # not set on self, but may still be a class attribute
+                    value = self.__get_self_attr(names[0])
+                    if value is not SectionNone:
+                        value = value[self]
+                if value is SectionNone:
+                    found = False
+                values[i] = value
+            values = tuple(values)
+        if found or self.isleaf:
+            rows.append((self, values))
+        else:
+            for child in self.values():
+                child.__gather_rows(forms, values, rows)
+
     def __update_cache(self, name: str, attrs: Any) -> None:
         if self.use_cache and not self.isleaf:
             self.__cache[name] = attrs
@@ -179,6 +357,7 @@ class SectionAttrParser:
         """Delete attribute `name`."""
         # TODO: maybe this should delete all children attrs if not in self like
         # in get_nearest_attr()
+        before_change(self)
         if self.__dict__.get(name, SectionNone) is not SectionNone:
             super().__delattr__(name)
         if self.use_pluralsingular:
@@ -188,6 +367,7 @@ class SectionAttrParser:
             if self.__dict__.get(singular, SectionNone) is not SectionNone:
                 super().__delattr__(singular)
         self.__invalidate_caches(name)
+        changed(self, 'delattr', name)
 
     def __check_for_attribute_error(
         self, name: str, attrs: AnyDict, gettype: GetType = 'default',
@@ -0,0 +1,135 @@
+from collections import Counter
+from collections import OrderedDict
+from typing import Any
+from typing import Type
+from typing import Union
+from weakref import WeakSet
+from weakref import finalize
+
+from .hooks import add_change_hook
+from .hooks import remove_change_hook
+from .index import key_of
+from .lazy import LazyChildren
+from .lazy import lazy_class
+from .lazy import materialize
+from .types import AnyDict
+from .types import SectionNone
+from .types import SectionType
+
+
+class CloneChildren(LazyChildren):
+    """
+    Mixin for the class of a copy-on-write clone. Each node of a clone starts
+    out as a shallow copy of a node of the original, sharing its attribute
+    values, and its children are only copied from the original's when they
+    are first accessed. Until then, attributes gathered from the node's
+    descendants are read from the original node, including its caches.
+    """
+
+    def _get_nearest_attr(self, name: str) -> Union[Any, AnyDict]:
+        """See :meth:`Section._get_nearest_attr`."""
+        pending = self.__dict__.get('_Section__pending')
+        if pending is None:
+            return super()._get_nearest_attr(name)
+        attrs = self._SectionAttrParser__get_self_attr(name)
+        if attrs is SectionNone:
+            attrs = pending[1]._get_nearest_attr(name)
+        return attrs
+
+
+class Cloner:
+    """Copies the children of clone nodes from their original nodes."""
+
+    def add_children(self, node: SectionType, original: SectionType) -> None:
+        """Add shallow copies of the children of `original` to `node`."""
+        for key, child in original.items():
+            OrderedDict.__setitem__(node, key, self.copy(child, node))
+
+    def copy(self, original: SectionType,
+             parent: SectionType = None) -> SectionType:
+        """
+        Return a shallow copy of node `original`, whose children are copied
+        from the original's when they are first accessed.
+        """
+        cls = parent.cls if parent is not None else lazy_class(
+            original.cls, CloneChildren)
+        attrs = {k: v for k, v in original.__dict__.items()
+                 if not k.startswith(cls._Section__private_prefix)}
+        attrs.pop('parent', None)
+        attrs['_Section__keyname'] = original._Section__keyname
+        node = type.__call__(cls, parent=parent, **attrs)
+        if original.isparent:
+            node.__dict__['_Section__pending'] = (self, original)
+        return node
+
+
+def clone(node: SectionType) -> SectionType:
+    """See :meth:`Section.clone <Section.clone>`."""
+    copy = _cloner.copy(node)
+    clones = node.__dict__.get('_Section__clones')
+    if clones is None:
+        clones = WeakSet()
+        node.__setattr__('_Section__clones', clones, _invalidate_cache=False)
+    clones.add(copy)
+    if not _nofclones[node.cls]:
+        add_change_hook(node.cls, copy_clone_paths)
+    _nofclones[node.cls] += 1
+    finalize(copy, _forget_clone, node.cls)
+    return copy
+
+
+def _forget_clone(cls: Type[SectionType]) -> None:
+    """
+    Called when a clone of a node of structure class `cls` is freed. Stop
+    copying clone paths before its nodes change once it has no clones left.
+    """
+    _nofclones[cls] -= 1
+    if not _nofclones[cls]:
+        del _nofclones[cls]
+        remove_change_hook(cls, copy_clone_paths)
+
+
+def copy_clone_paths(node: SectionType) -> None:
+    """
+    Called before `node` is changed. Any clone of `node` or of one of its
+    ancestors still reads `node` through nodes whose children have not been
+    copied yet, so copy the children along the clone's path to `node`
+    first, keeping the clone unaffected by the change.
+    """
+    path = [node]
+    parent = node.__dict__.get('parent')
+    while parent is not None:
+        path.append(parent)
+        parent = parent.__dict__.get('parent')
+    path.reverse()
+    for depth, ancestor in enumerate(path):
+        for copy in ancestor.__dict__.get('_Section__clones', ()):
+            _copy_path(copy, path[depth:])
+
+
+def _copy_path(copy: SectionType, originals: list) -> None:
+    """
+    Copy the children of the nodes of clone `copy` along the path given by
+    their original nodes `originals`, for as long as the clone still reads
+    from them.
+    """
+    for i, original in enumerate(originals):
+        pending = copy.__dict__.get('_Section__pending')
+        if pending is not None:
+            if pending[1] is not original:
+                return
+            materialize(copy)
+        if i + 1 == len(originals):
+            return
+        try:
+            key = key_of(original, originals[i + 1])
+        except KeyError:
+            return
+        copy = OrderedDict.get(copy, key)
+        if copy is None:
+            return
+
+
+_cloner = Cloner()
+# number of live clones of nodes of each structure class
+_nofclones: 'Counter[Type[SectionType]]' = Counter()
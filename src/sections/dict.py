@@ -4,6 +4,14 @@ from typing import Iterable
 from typing import Tuple
 from typing import Union
 
+from . import pickling
+from .hooks import before_change
+from .hooks import changed
+from .hooks import silenced
+from .index import index_add
+from .index import index_remove
+from .index import key_of
+from .properties import read
 from .types import AnyDict
 from .types import SectionType
 
@@ -35,14 +43,17 @@ class SectionDict(OrderedDict):
 
     def items(self) -> Tuple[Iterable[Any], Iterable[Any]]:
         """Return iterator over child names and children."""
+        read(self)
         return super().items()
 
     def keys(self) -> Iterable[Any]:
         """Return iterator over child names."""
+        read(self, ())
         return super().keys()
 
     def values(self) -> Iterable[Any]:
         """Return iterator over children."""
+        read(self)
         return super().values()
 
     def update(self, other: SectionType) -> None:
@@ -52,8 +63,10 @@ class SectionDict(OrderedDict):
 
     def move_to_end(self, name: Any, last: bool = True) -> None:
         """Move an existing child to either end of ordered children dict."""
+        before_change(self)
         self._SectionAttrParser__invalidate_caches()
         super().move_to_end(name, last)
+        changed(self, 'move_to_end', name, last)
 
     def insertitem(
             self,
@@ -66,12 +79,15 @@ class SectionDict(OrderedDict):
         from child's `name` attribute. If `i` is negative, insert at end of
         dict.
         """
+        before_change(self)
         items = list(self.items())
         if i < 0:
             i = len(items)
         items.insert(i, (name, child))
-        super().clear()
-        self.update(dict(items))
+        with silenced(self):
+            super().clear()
+            self.update(dict(items))
+        changed(self, 'insert', i, name, self[name])
 
     def insert(
             self,
@@ -94,9 +110,12 @@ class SectionDict(OrderedDict):
             return default
 
     def clear(self) -> None:
-        for name in self.copy().keys():
+        before_change(self)
+        for name, child in list(super().items()):
+            self.__index_remove(child)
             super().__delitem__(name)
         self._SectionAttrParser__invalidate_caches()
+        changed(self, 'clear')
 
     def fromkeys(self, *args: Any, **kwds: Any) -> None:
         """Not supported."""
@@ -126,22 +145,43 @@ class SectionDict(OrderedDict):
         Remove child `name_or_i` from self. If there is no child with that
         name and `name_or_i` is int, remove child in position `name_or_i`.
         """
+        before_change(self)
         self._SectionAttrParser__invalidate_caches()
+        key, child = self.__pop(name_or_i)
+        self.__index_remove(child)
+        changed(self, 'delitem', key)
+        return child
+
+    def __pop(self, name_or_i: Union[Any, int]) -> Tuple[Any, SectionType]:
+        """Remove child `name_or_i` and return its key and the child."""
         if not isinstance(name_or_i, int):
-            return super().pop(name_or_i)
+            return name_or_i, super().pop(name_or_i)
         try:
-            return super().pop(name_or_i)
+            return name_or_i, super().pop(name_or_i)
         except KeyError:
             child = self.__getitem_from_index(name_or_i)
             if child is None:
                 raise IndexError
-            name = child._SectionStringParser__name
-            return super().pop(name)
+            key = key_of(self, child)
+            return key, super().pop(key)
 
     def popitem(self, last=True) -> Tuple[Any, Any]:
         """Remove last added child from self."""
+        before_change(self)
         self._SectionAttrParser__invalidate_caches()
-        return super().popitem(last)
+        name, child = super().popitem(last)
+        self.__index_remove(child)
+        changed(self, 'delitem', name)
+        return name, child
+
+    def __index_remove(self, child: SectionType) -> None:
+        """
+        Remove a child being removed from self from the structure's index,
+        unless self does not own it, such as when self was returned from
+        :meth:`leaves <Section.leaves>` or when child was moved elsewhere.
+        """
+        if child.__dict__.get('parent') is self:
+            index_remove(child)
 
     def __iter__(self) -> Iterable[SectionType]:
         """
@@ -152,14 +192,18 @@ class SectionDict(OrderedDict):
 
     def __delitem__(self, name: Any) -> SectionType:
         """Delete child `name`."""
+        before_change(self)
+        self.__index_remove(super().__getitem__(name))
         super().__delitem__(name)
         self._SectionAttrParser__invalidate_caches()
+        changed(self, 'delitem', name)
 
     def __getitem__(self, names: Any) -> SectionType:
         if isinstance(names, tuple):
             items = list(map(self.__getitem, names))
             return self.node_withchildren_fromiter(items)
         else:
+            read(self)
             return self.__getitem(names)
 
     def __getitem(self, name: Any) -> SectionType:
@@ -191,32 +235,87 @@ class SectionDict(OrderedDict):
         update its name to `name`, and its parent to self.
         """
         from . import Section
+        before_change(self)
         if isinstance(value, Section):
+            if isinstance(value, self.cls):
+                # value may be moving here from elsewhere
+                index_remove(value)
             child = self.__convert_to_self_cls(name, value)
         elif isinstance(value, dict):
             child = self.cls(name, **{**value, 'parent': self})
         else:
             raise ValueError
+        replaced_child = super().get(name)
         super().__setitem__(name, child)
+        if replaced_child is not None and replaced_child is not child:
+            self.__index_remove(replaced_child)
+        index_add(child)
         child._SectionAttrParser__invalidate_caches()
+        changed(self, 'setitem', name, child)
 
     def __convert_to_self_cls(
             self, name: Any, value: SectionType
     ) -> None:
-        """Ensure output is of self's unique Section class instance type."""
+        """
+        Ensure output is of self's unique Section class instance type. A node
+        of another class is copied, along with its descendants, from its flat
+        records straight into self's class, leaving the original in place.
+        """
         if isinstance(value, self.cls):
             child = value
-            child.__setattr__('parent', self, _invalidate_cache=False)
-            child.__setattr__(child._Section__keyname, name,
-                              _invalidate_cache=False)
         else:
-            attrs = {k: v for k, v in value.__dict__.items()
-                     if not k.startswith(self.cls._Section__private_prefix)}
-            attrs.pop(value._Section__keyname, None)
-            child = self.cls(
-                name, **{**attrs, 'parent': self})
-            for grandchild in value.children:
-                grandchild_name = grandchild._SectionStringParser__name
-                child[grandchild_name] = (
-                    self.__convert_to_self_cls(grandchild_name, grandchild))
+            child = pickling.build(self.cls, pickling.records(value)[0])[0]
+        child.__setattr__('parent', self, _invalidate_cache=False)
+        child.__setattr__(child._Section__keyname, name,
+                          _invalidate_cache=False)
         return child
+
+    def graft(self, name: Any, subtree: SectionType) -> SectionType:
+        """
+        Move `subtree` from wherever it is, in this structure or another one,
+        to be self's child `name`, and return it. Unlike assigning a node of
+        another structure with `self[name] = node`, which copies it, the
+        subtree's nodes are moved in place, without copying: they are
+        removed from their previous parent and, if they belong to another
+        structure, switched over to self's structure class. Caches held
+        within the subtree stay valid and are kept, apart from printing
+        caches when the class changes, and the caches above the subtree in
+        both structures are invalidated once.
+        """
+        node = self
+        while node is not None:
+            if node is subtree:
+                raise ValueError(
+                    'Cannot graft a node under itself or its descendants.')
+            node = node.__dict__.get('parent')
+        before_change(self)
+        before_change(subtree)
+        old_parent = subtree.__dict__.get('parent')
+        old_key = None
+        if old_parent is None:
+            index_remove(subtree)
+        elif type(old_parent) is self.cls:
+            # a move within the structure is notified as one change
+            old_key = key_of(old_parent, subtree)
+            with silenced(old_parent):
+                old_parent.pop(old_key)
+        else:
+            old_parent.pop(key_of(old_parent, subtree))
+            old_parent = None
+        if type(subtree) is not self.cls:
+            # list all nodes first, since switching class also switches off
+            # reading the children of nodes loaded from a snapshot
+            for node in list(subtree.descendants_iter):
+                object.__setattr__(node, '__class__', self.cls)
+                node.__dict__.pop('_Section__render', None)
+        subtree.__setattr__('parent', self, _invalidate_cache=False)
+        subtree.__setattr__(subtree._Section__keyname, name,
+                            _invalidate_cache=False)
+        replaced_child = super().get(name)
+        super().__setitem__(name, subtree)
+        if replaced_child is not None and replaced_child is not subtree:
+            self.__index_remove(replaced_child)
+        index_add(subtree)
+        subtree._SectionAttrParser__invalidate_caches()
+        changed(self, 'graft', name, subtree, old_parent, old_key)
+        return subtree
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import Sequence
+
+from .pluralizer import Pluralizer
+from .types import GetType
+from .types import SectionNone
+
+
+def forms(name: str, pluralsingular: bool = True) -> List[str]:
+    """
+    Return `name` followed by its plural/singular forms if `pluralsingular`
+    is True, in the order they are looked for.
+    """
+    if not pluralsingular:
+        return [name]
+    return list(OrderedDict.fromkeys((name, *_pluralizer(name))))
+
+
+def nearest(
+        nodes: Sequence[Hashable], value: Callable[[Any], Any],
+        children: Callable[[Any], Sequence[Hashable]],
+) -> Dict[Any, Any]:
+    """
+    Return the value of each of `nodes` that has one, else of the nearest of
+    its descendants that have one, keyed by node in depth-first order, so
+    nodes reached more than once are gathered once. `value` returns a node's
+    value, or SectionNone if it has none, and `children` its children.
+    """
+    found = {}
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        found_value = value(node)
+        if found_value is not SectionNone:
+            found[node] = found_value
+        else:
+            stack.extend(reversed(children(node)))
+    return found
+
+
+def gathered(
+        caller: Any, found: Dict[Any, Any], name: str, gettype: GetType,
+        default: Any, default_key: Any, name_of: Callable[[Any], Any],
+) -> Any:
+    """
+    Return the values `found` for attribute `name` in the form requested by
+    `gettype`, as Section.__call__ does, or `default` keyed by `default_key`
+    if none were found. `name_of` returns the name of a key of `found`.
+    """
+    if not found:
+        if default is SectionNone:
+            raise AttributeError(name)
+        found = {default_key: default}
+    values = list(found.values())
+    if gettype == 'default':
+        gettype = caller.default_gettype
+    if gettype == 'hybrid':
+        return values if len(values) > 1 else values[0]
+    if gettype is list:
+        return values
+    if gettype is dict:
+        return {SectionNone if key is None else name_of(key): value
+                for key, value in found.items()}
+    return iter(values)
+
+
+_pluralizer = Pluralizer()
@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Tuple
+from typing import Type
+
+from .types import SectionType
+
+ChangeHook = Callable[[SectionType], None]
+ChangeListener = Callable[[SectionType, Tuple[Any, ...]], None]
+
+
+def add_change_hook(cls: Type[SectionType], hook: ChangeHook) -> None:
+    """
+    Call `hook(node)` before any node of structure class `cls` is changed by
+    setting or deleting one of its attributes or by adding, removing or
+    reordering its children.
+    """
+    if hook not in cls._Section__change_hooks:
+        cls._Section__change_hooks = (*cls._Section__change_hooks, hook)
+
+
+def remove_change_hook(cls: Type[SectionType], hook: ChangeHook) -> None:
+    """Stop calling `hook` before nodes of structure class `cls` change."""
+    cls._Section__change_hooks = tuple(
+        h for h in cls._Section__change_hooks if h != hook)
+
+
+def before_change(node: SectionType) -> None:
+    """
+    Call the change hooks of `node`'s structure class with `node`, after
+    refusing to change a read-only node.
+    """
+    if '_Section__readonly' in node.__dict__:
+        raise TypeError('A cached leaves or descendants node is shared '
+                        'between reads and cannot be changed.')
+    for hook in node.cls._Section__change_hooks:
+        hook(node)
+
+
+def add_change_listener(
+        cls: Type[SectionType], listener: ChangeListener
+) -> None:
+    """
+    Call `listener(node, change)` after any node of structure class `cls` is
+    changed, where `change` is a tuple describing the change:
+
+        ('setattr', name, value)        attribute `name` was set
+        ('delattr', name)               attribute `name` was deleted
+        ('setitem', key, child)         `child` was added as child `key`
+        ('delitem', key)                child `key` was removed
+        ('clear',)                      all children were removed
+        ('insert', i, key, child)       `child` was inserted at index `i`
+        ('move_to_end', key, last)      child `key` was moved to an end
+        ('graft', key, child, old_parent, old_key)
+                                        `child` was moved to be child `key`
+                                        from child `old_key` of `old_parent`,
+                                        both None if it came from another
+                                        structure or was a root
+    """
+    if listener not in cls._Section__change_listeners:
+        cls._Section__change_listeners = (
+            *cls._Section__change_listeners, listener)
+
+
+def remove_change_listener(
+        cls: Type[SectionType], listener: ChangeListener
+) -> None:
+    """Stop calling `listener` after nodes of structure class `cls` change."""
+    cls._Section__change_listeners = tuple(
+        h for h in cls._Section__change_listeners if h != listener)
+
+
+def changed(node: SectionType, *change: Any) -> None:
+    """
+    Call the change listeners of `node`'s structure class with `node` and
+    `change`, unless changes to `node` are being silenced.
+    """
+    listeners = node.cls._Section__change_listeners
+    if listeners and '_Section__silenced' not in node.__dict__:
+        for listener in listeners:
+            listener(node, change)
+
+
+@contextmanager
+def silenced(node: SectionType) -> Iterator[None]:
+    """
+    Context manager for not notifying listeners of the changes made to
+    `node`, such as the steps of a change that is notified as a whole.
+    """
+    node.__dict__['_Section__silenced'] = True
+    try:
+        yield
+    finally:
+        del node.__dict__['_Section__silenced']
@@ -0,0 +1,222 @@
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from .types import SectionType
+
+
+class SectionIndex:
+    """
+    Structure-wide name-to-nodes lookup table, kept by the root node of a
+    structure. It is built the first time it is needed, then kept current as
+    subtrees are added to, removed from, or renamed in the structure.
+    """
+
+    def __init__(self, root: SectionType) -> None:
+        """Index every node in the structure with root `root`."""
+        # nodes with the same name are stored in a dict used as an ordered set
+        self.nodes_by_name: Dict[Any, Dict[SectionType, None]] = {}
+        self.names: Dict[SectionType, Any] = {}
+        self.add(root)
+
+    def add(self, subtree: SectionType) -> None:
+        """
+        Index every node in `subtree` and drop their cached paths, since
+        `subtree` may have moved.
+        """
+        for node in subtree.descendants_iter:
+            node.__dict__.pop('_Section__path', None)
+            self.__add_node(node)
+
+    def remove(self, subtree: SectionType) -> None:
+        """Remove every node in `subtree` from the index."""
+        for node in subtree.descendants_iter:
+            node.__dict__.pop('_Section__path', None)
+            self.__remove_node(node)
+
+    def rename(self, subtree: SectionType) -> None:
+        """
+        Re-index the root node of `subtree` under its current name, and drop
+        the cached paths that contain its old name.
+        """
+        self.__remove_node(subtree)
+        self.__add_node(subtree)
+        for node in subtree.descendants_iter:
+            node.__dict__.pop('_Section__path', None)
+
+    def find(self, name: Any) -> List[SectionType]:
+        """Return every node in the structure with name `name`."""
+        return list(self.nodes_by_name.get(name, ()))
+
+    def __add_node(self, node: SectionType) -> None:
+        if node in self.names:
+            self.__remove_node(node)
+        name = node._SectionStringParser__name
+        self.names[node] = name
+        self.nodes_by_name.setdefault(name, {})[node] = None
+
+    def __remove_node(self, node: SectionType) -> None:
+        name = self.names.pop(node, None)
+        nodes = self.nodes_by_name.get(name)
+        if nodes is not None:
+            nodes.pop(node, None)
+            if not nodes:
+                del self.nodes_by_name[name]
+
+
+class SectionAncestry:
+    """
+    Structure-wide ancestry tables: preorder (Euler tour) intervals, depths
+    and binary lifting jump tables for every node in a structure. These answer
+    ancestor queries in O(1) time and lowest common ancestor queries in
+    O(log depth) time. The tables are built lazily and marked stale whenever
+    the structure changes.
+    """
+
+    def __init__(self, root: SectionType) -> None:
+        """Build the tables for the structure with root `root`."""
+        self.stale = False
+        self.ids: Dict[SectionType, int] = {}
+        self.nodes: List[SectionType] = []
+        self.depths: List[int] = []
+        parents = []
+        stack = [(root, -1)]
+        while stack:
+            node, parent_id = stack.pop()
+            node_id = len(self.nodes)
+            self.ids[node] = node_id
+            self.nodes.append(node)
+            if parent_id < 0:
+                parents.append(node_id)
+                self.depths.append(0)
+            else:
+                parents.append(parent_id)
+                self.depths.append(self.depths[parent_id] + 1)
+            node.__dict__['_Section__ancestry'] = self
+            stack.extend((child, node_id)
+                         for child in reversed(tuple(node.values())))
+        self.sizes = [1] * len(self.nodes)
+        for node_id in range(len(self.nodes) - 1, 0, -1):
+            self.sizes[parents[node_id]] += self.sizes[node_id]
+        # self.jumps[k][i] is the id of the 2**k-th ancestor of node i
+        self.jumps = [parents]
+        for _ in range(1, max(self.depths).bit_length()):
+            prev = self.jumps[-1]
+            self.jumps.append([prev[ancestor] for ancestor in prev])
+
+    def contains(self, *nodes: SectionType) -> bool:
+        """True iff every node in `nodes` is in the tables."""
+        return all(node in self.ids for node in nodes)
+
+    def depth(self, node: SectionType) -> int:
+        """Return the number of ancestors `node` has."""
+        return self.depths[self.ids[node]]
+
+    def is_ancestor(
+            self, ancestor: SectionType, node: SectionType
+    ) -> bool:
+        """True iff `ancestor` is `node` or one of its ancestors."""
+        ancestor_id = self.ids[ancestor]
+        return (ancestor_id <= self.ids[node]
+                < ancestor_id + self.sizes[ancestor_id])
+
+    def lca(self, a: SectionType, b: SectionType) -> SectionType:
+        """Return the lowest common ancestor of `a` and `b`."""
+        if self.is_ancestor(a, b):
+            return a
+        if self.is_ancestor(b, a):
+            return b
+        a_id, b_id = self.ids[a], self.ids[b]
+        for jumps in reversed(self.jumps):
+            ancestor_id = jumps[a_id]
+            if not (ancestor_id <= b_id
+                    < ancestor_id + self.sizes[ancestor_id]):
+                a_id = ancestor_id
+        return self.nodes[self.jumps[0][a_id]]
+
+
+def get_root(node: SectionType) -> SectionType:
+    """Return the root node of the structure containing `node`."""
+    parent = node.__dict__.get('parent')
+    while parent is not None:
+        node = parent
+        parent = node.__dict__.get('parent')
+    return node
+
+
+def get_index(
+        node: SectionType, build: bool = False
+) -> Optional[SectionIndex]:
+    """
+    Return the index of the structure containing `node`. If it has not been
+    built yet, build it if `build` is True, else return None.
+    """
+    root = get_root(node)
+    index = root.__dict__.get('_Section__index')
+    if index is None and build:
+        index = SectionIndex(root)
+        root.__setattr__('_Section__index', index, _invalidate_cache=False)
+    return index
+
+
+def get_ancestry(node: SectionType) -> SectionAncestry:
+    """
+    Return the ancestry tables of the structure containing `node`, rebuilding
+    them first if the structure changed since they were last built. Each node
+    keeps a reference to the tables it was last built into, so that an
+    unchanged structure's tables are found in O(1) time.
+    """
+    ancestry = node.__dict__.get('_Section__ancestry')
+    if ancestry is None or ancestry.stale:
+        root = get_root(node)
+        ancestry = root.__dict__.get('_Section__ancestry')
+        if ancestry is None or ancestry.stale:
+            ancestry = SectionAncestry(root)
+    return ancestry
+
+
+def structure_changed(root: SectionType) -> None:
+    """Mark the structure-wide tables of `root` that need rebuilding stale."""
+    ancestry = root.__dict__.get('_Section__ancestry')
+    if ancestry is not None:
+        ancestry.stale = True
+
+
+def index_add(subtree: SectionType) -> None:
+    """Add `subtree` to the index of its structure, if it has one."""
+    index = get_index(subtree)
+    if index is not None:
+        index.add(subtree)
+
+
+def index_remove(subtree: SectionType) -> None:
+    """
+    Remove `subtree` from the index of the structure it is currently in, if
+    it has one. If `subtree` is itself a root, its own index is discarded.
+    """
+    root = get_root(subtree)
+    structure_changed(root)
+    index = root.__dict__.get('_Section__index')
+    if index is not None:
+        index.remove(subtree)
+    subtree.__dict__.pop('_Section__index', None)
+
+
+def index_rename(node: SectionType) -> None:
+    """Re-index `node` under its current name, if its structure has an index."""
+    index = get_index(node)
+    if index is not None:
+        index.rename(node)
+
+
+def key_of(parent: SectionType, child: SectionType) -> Any:
+    """Return the key that `parent` holds `child` under."""
+    name = child._SectionStringParser__name
+    if OrderedDict.get(parent, name) is child:
+        return name
+    for key, value in OrderedDict.items(parent):
+        if value is child:
+            return key
+    raise KeyError(name)
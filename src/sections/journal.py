@@ -0,0 +1,221 @@
+import os
+import pickle
+import struct
+from collections import OrderedDict
+from typing import IO
+from typing import Any
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+from . import pickling
+from . import snapshot
+from .hooks import add_change_listener
+from .hooks import remove_change_listener
+from .index import key_of
+from .lazy import materialize
+from .types import SectionType
+
+# A journal is a magic string followed by a sequence of records, each a
+# uint32 length followed by a pickled (op, path, *args) tuple. `path` holds
+# the keys leading from the journaled root to the changed node, and op and
+# args describe the change as listed in hooks.add_change_listener, except
+# that child nodes are stored as their flat pickling record streams and
+# grafts within the structure store the path the child was moved from.
+MAGIC = b'SECTJRNL'
+_LENGTH = struct.Struct('<I')
+
+JournalFile = Union[str, os.PathLike, IO[bytes]]
+
+
+class Journal:
+    """
+    An append-only journal of the changes made to the structure with root
+    `root`, written as compact binary records to a file or binary buffer.
+    Records are buffered and written in batches of `flush_every` records,
+    and whenever :meth:`flush <Journal.flush>` is called.
+    """
+
+    def __init__(self, root: SectionType, file: JournalFile,
+                 flush_every: int = 1000) -> None:
+        """
+        Start journaling changes under `root` to `file`, a path or binary
+        file object, appending to any records it already holds.
+        """
+        self.root = root
+        self.flush_every = flush_every
+        self.__owns_file = isinstance(file, (str, os.PathLike))
+        self.__file = open(file, 'ab') if self.__owns_file else file
+        if self.__file.tell() == 0:
+            self.__file.write(MAGIC)
+        self.__records: List[bytes] = []
+        add_change_listener(root.cls, self.__append)
+
+    def flush(self) -> None:
+        """Write all buffered records to the journal's file."""
+        if self.__records:
+            self.__file.write(b''.join(self.__records))
+            self.__records = []
+        self.__file.flush()
+
+    def close(self) -> None:
+        """Flush the journal and stop recording changes."""
+        remove_change_listener(self.root.cls, self.__append)
+        self.flush()
+        if self.__owns_file:
+            self.__file.close()
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def checkpoint(self, path: str) -> None:
+        """
+        Save the structure to a snapshot file at `path`, replacing it only
+        once it is complete, then empty the journal, whose records the
+        snapshot now holds.
+        """
+        self.flush()
+        tmp_path = f'{path}.tmp'
+        snapshot.save(self.root, tmp_path)
+        os.replace(tmp_path, path)
+        _empty(self.__file)
+
+    def __append(self, node: SectionType, change: Tuple[Any, ...]) -> None:
+        """Called after `node` is changed by `change`. Record the change."""
+        op, *args = change
+        path = _path(self.root, node)
+        if op == 'graft':
+            key, child, old_parent, old_key = args
+            old_path = (None if old_parent is None
+                        else _path(self.root, old_parent))
+            if path is None:
+                if old_path is None:
+                    return
+                # grafted out of the journaled subtree
+                op, path, args = 'delitem', old_path, [old_key]
+            elif old_path is None:
+                op, args = 'setitem', [key, child]
+            else:
+                args = [key, (*old_path, old_key)]
+        elif path is None:
+            return
+        if op in ('setitem', 'insert'):
+            args[-1] = pickling.records(args[-1])[0]
+        data = pickle.dumps((op, path, *args), pickle.HIGHEST_PROTOCOL)
+        self.__records.append(_LENGTH.pack(len(data)) + data)
+        if len(self.__records) >= self.flush_every:
+            self.flush()
+
+
+def records(file: JournalFile) -> Iterator[Tuple[Any, ...]]:
+    """
+    Iterate over the records of the journal in `file`. A record cut short,
+    such as by a crash while it was being written, ends the journal.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            data = f.read()
+    else:
+        data = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a sections journal.')
+    view = memoryview(data)
+    pos = len(MAGIC)
+    while pos + _LENGTH.size <= len(view):
+        length, = _LENGTH.unpack_from(view, pos)
+        start = pos + _LENGTH.size
+        if start + length > len(view):
+            break
+        yield pickle.loads(view[start:start + length])
+        pos = start + length
+
+
+def replay(root: SectionType, file: JournalFile) -> int:
+    """See :meth:`Section.replay <Section.replay>`."""
+    n = 0
+    for op, path, *args in records(file):
+        node = _node_at(root, path)
+        if op == 'setattr':
+            node._SectionAttrParser__set_node_attr(*args)
+        elif op == 'delattr':
+            delattr(node, *args)
+        elif op == 'setitem':
+            key, stream = args
+            node[key] = pickling.build(node.cls, stream)[0]
+        elif op == 'delitem':
+            del node[args[0]]
+        elif op == 'clear':
+            node.clear()
+        elif op == 'insert':
+            i, key, stream = args
+            node.insertitem(i, key, pickling.build(node.cls, stream)[0])
+        elif op == 'move_to_end':
+            node.move_to_end(*args)
+        elif op == 'graft':
+            key, old_path = args
+            node.graft(key, _node_at(root, old_path))
+        else:
+            raise ValueError(f'Unknown journal record {op!r}.')
+        n += 1
+    return n
+
+
+def compact(cls: Type[SectionType], snapshot_path: str,
+            journal_path: JournalFile,
+            path: Optional[str] = None) -> SectionType:
+    """See :meth:`Section.compact <Section.compact>`."""
+    root = snapshot.load(cls, snapshot_path)
+    replay(root, journal_path)
+    path = snapshot_path if path is None else path
+    tmp_path = f'{path}.tmp'
+    snapshot.save(root, tmp_path)
+    os.replace(tmp_path, path)
+    _empty(journal_path)
+    return root
+
+
+def _empty(file: JournalFile) -> None:
+    """
+    Empty the journal in `file`, whose records a snapshot now holds. A
+    journal file at a path is replaced by an empty one in one step.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        tmp_path = f'{os.fspath(file)}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+        os.replace(tmp_path, file)
+        return
+    file.seek(0)
+    file.truncate()
+    file.write(MAGIC)
+    file.flush()
+
+
+def _path(root: SectionType, node: SectionType) -> Optional[Tuple[Any, ...]]:
+    """
+    Return the keys leading from `root` down to `node`, or None if `node`
+    is not in the subtree with root `root`.
+    """
+    keys = []
+    while node is not root:
+        parent = node.__dict__.get('parent')
+        if parent is None:
+            return None
+        keys.append(key_of(parent, node))
+        node = parent
+    return tuple(reversed(keys))
+
+
+def _node_at(root: SectionType, path: Tuple[Any, ...]) -> SectionType:
+    """Return the node reached from `root` through the keys in `path`."""
+    node = root
+    for key in path:
+        materialize(node)
+        node = OrderedDict.__getitem__(node, key)
+    return node
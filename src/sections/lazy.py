@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Any
+from typing import Type
+
+from .types import SectionType
+
+
+class LazyChildren:
+    """
+    Mixin for the class of a structure whose nodes' children are only
+    constructed the first time any of them are accessed. A node whose
+    children are still pending holds a (source, key) pair in its
+    `_Section__pending` attr, and `source.add_children(node, key)` constructs
+    and adds them.
+    """
+
+    def __materialize(self) -> None:
+        if '_Section__pending' not in self.__dict__:
+            return
+        # other threads may be materializing the same node, and must not see
+        # it without its pending attr until all its children have been added
+        with _lock:
+            pending = self.__dict__.get('_Section__pending')
+            if pending is not None:
+                source, key = pending
+                source.add_children(self, key)
+                del self.__dict__['_Section__pending']
+
+    def graft(self, name: Any, subtree: SectionType) -> SectionType:
+        """See :meth:`Section.graft <Section.graft>`."""
+        self.__materialize()
+        return super().graft(name, subtree)
+
+
+_lock = RLock()
+
+
+def _materializing(name: str) -> Any:
+    """Return a method that adds self's pending children before `name`."""
+
+    def method(self, *args: Any, **kwds: Any) -> Any:
+        self._LazyChildren__materialize()
+        return getattr(super(LazyChildren, self), name)(*args, **kwds)
+
+    method.__name__ = name
+    method.__doc__ = getattr(OrderedDict, name).__doc__
+    return method
+
+
+for _name in ['__len__', '__iter__', '__contains__', '__getitem__',
+              '__setitem__', '__delitem__', '__reversed__', '__repr__',
+              '__reduce__', '__reduce_ex__', 'keys', 'values', 'items',
+              'get', 'pop', 'popitem', 'setdefault', 'clear', 'update',
+              'move_to_end', 'copy']:
+    setattr(LazyChildren, _name, _materializing(_name))
+
+
+def lazy_class(
+        cls: Type[SectionType], mixin: type = LazyChildren
+) -> Type[SectionType]:
+    """Return a new unique class inheriting `mixin` and `cls`."""
+    return type(cls.__name__, (mixin, cls), {
+        '__doc__': 'Unique Section class creation.',
+        '__module__': cls.__module__,
+        # a copy of a structure does not inherit hooks watching the original
+        '_Section__change_hooks': (),
+        '_Section__change_listeners': (),
+    })
+
+
+def materialize(node: SectionType) -> None:
+    """Construct the pending children of `node`, if it has any."""
+    if '_Section__pending' in node.__dict__:
+        node._LazyChildren__materialize()
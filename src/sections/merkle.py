@@ -0,0 +1,152 @@
+import hashlib
+import pickle
+from typing import Any
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+
+from .types import AnyDict
+from .types import SectionType
+
+
+class Diff(NamedTuple):
+    """
+    The differences between two structures found by :meth:`Section.diff
+    <Section.diff>`. Nodes of the first structure are paired with their
+    counterparts in the second.
+    """
+
+    added: List[SectionType]
+    removed: List[SectionType]
+    moved: List[Tuple[SectionType, SectionType]]
+    changed: List[Tuple[SectionType, SectionType]]
+
+
+def content_hash(node: SectionType) -> int:
+    """See :attr:`Section.content_hash <Section.content_hash>`."""
+    cached = node.__dict__.get('_Section__content_hash')
+    if cached is not None:
+        return cached
+    # postorder over the nodes whose hashes are not cached, without recursion
+    stack = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+        if children_done:
+            digest = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+            digest.update(_attrs_bytes(own_attrs(current)))
+            for key, child in current.items():
+                digest.update(_value_bytes(key))
+                digest.update(child.__dict__['_Section__content_hash']
+                              .to_bytes(_DIGEST_SIZE, 'big'))
+            current.__dict__['_Section__content_hash'] = int.from_bytes(
+                digest.digest(), 'big')
+            continue
+        stack.append((current, True))
+        stack.extend((child, False) for child in current.values()
+                     if '_Section__content_hash' not in child.__dict__)
+    return node.__dict__['_Section__content_hash']
+
+
+def own_attrs(node: SectionType) -> AnyDict:
+    """
+    Return the attrs stored on `node` that make up its content, leaving out
+    its name, parent, private attrs and printing options.
+    """
+    cls = node.cls
+    prefix = cls._Section__private_prefix
+    excludes = cls._setattr_invalidate_cache_excludes
+    keyname = node._Section__keyname
+    return {k: v for k, v in node.__dict__.items()
+            if k != keyname and k != 'parent' and not k.startswith(prefix)
+            and k not in excludes}
+
+
+def diff(a: SectionType, b: SectionType) -> Diff:
+    """See :meth:`Section.diff <Section.diff>`."""
+    result = Diff([], [], [], [])
+    stack = [(a, b)]
+    while stack:
+        x, y = stack.pop()
+        if content_hash(x) == content_hash(y):
+            continue
+        if own_attrs(x) != own_attrs(y):
+            result.changed.append((x, y))
+        y_children = dict(y.items())
+        pairs = []
+        for key, child in x.items():
+            other = y_children.pop(key, None)
+            if other is None:
+                result.removed.append(child)
+            else:
+                pairs.append((child, other))
+        result.added.extend(y_children.values())
+        stack.extend(reversed(pairs))
+    _find_moves(result)
+    return result
+
+
+def _find_moves(result: Diff) -> None:
+    """
+    Pair each removed subtree with an added subtree of the same content, as
+    a subtree that was moved or renamed.
+    """
+    removed = {}
+    for node in result.removed:
+        removed.setdefault(content_hash(node), []).append(node)
+    added = []
+    for node in result.added:
+        candidates = removed.get(content_hash(node))
+        if candidates:
+            result.moved.append((candidates.pop(0), node))
+        else:
+            added.append(node)
+    moved = {id(pair[0]) for pair in result.moved}
+    result.removed[:] = [node for node in result.removed
+                         if id(node) not in moved]
+    result.added[:] = added
+
+
+_DIGEST_SIZE = 16
+
+
+def _attrs_bytes(attrs: AnyDict) -> bytes:
+    return _value_bytes(attrs)
+
+
+def _value_bytes(value: Any) -> bytes:
+    """
+    Encode `value` canonically, so that equal values of the same types are
+    encoded equally and values that differ are encoded differently. The
+    contents of lists, tuples, dicts and sets are encoded, in sorted order
+    for dicts and sets, and any other object is encoded by its pickle, or
+    failing that, by its identity.
+    """
+    value_type = type(value)
+    if value is None:
+        return b'N'
+    if value_type is bool:
+        return b'T' if value else b'F'
+    if value_type is int:
+        return b'i%d;' % value
+    if value_type is float:
+        return b'f' + value.hex().encode() + b';'
+    if value_type is str:
+        value = value.encode('utf-8', 'surrogatepass')
+        return b's%d:' % len(value) + value
+    if value_type is bytes:
+        return b'y%d:' % len(value) + value
+    if value_type is list or value_type is tuple:
+        return (b'l' if value_type is list else b't') + b'%d:' % len(
+            value) + b''.join(map(_value_bytes, value))
+    if value_type is dict:
+        items = sorted(_value_bytes(k) + _value_bytes(v)
+                       for k, v in value.items())
+        return b'd%d:' % len(items) + b''.join(items)
+    if value_type is set or value_type is frozenset:
+        items = sorted(map(_value_bytes, value))
+        return b'e%d:' % len(items) + b''.join(items)
+    try:
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return b'o%d;' % id(value)
+    return b'p%d:' % len(data) + data
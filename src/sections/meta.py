@@ -1,9 +1,10 @@
+from collections import OrderedDict
 from copy import copy
 from types import FunctionType
 from typing import Any
+from typing import Iterator
 from typing import List
 from typing import Tuple
-from typing import Union
 
 from .types import AnyDict
 from .types import SectionAttr
@@ -20,7 +21,7 @@ class MetaSection(type):
     Parses args and kwds passed to a sections() call or :class:`Section
     <Section>` instantiation and returns a Section tree structure. Parses
     node names/keys, separate attrs intended for current node vs child nodes,
-    constructs current node, then recursively repeats for all child nodes.
+    constructs current node, then repeats for all descendant nodes.
     """
 
     singular_keyname = 'name'
@@ -39,13 +40,44 @@ class MetaSection(type):
         """
         Construct a tree structure of Section nodes based on the args and kwds
         provided by user in a sections() call or a Section() instantiation.
+        Descendants are constructed depth-first from an explicit stack instead
+        of recursive calls, so nested input of any depth is supported.
+        """
+        node, keyname, children = self.__construct_subtree_root(
+            list(args), kwds, parent)
+        stack = [(node, keyname, children)]
+        while stack:
+            parent, keyname, children = stack[-1]
+            child_attrs = next(children, None)
+            if child_attrs is None:
+                stack.pop()
+                self.__finish_node(parent)
+                continue
+            child, child_keyname, grandchildren = (
+                self.__construct_subtree_root([], child_attrs, parent))
+            # child was already given its parent and name in construction, so
+            # skip the conversion and ancestor cache invalidation done in
+            # Section.__setitem__
+            OrderedDict.__setitem__(parent, getattr(child, keyname), child)
+            stack.append((child, child_keyname, grandchildren))
+        return node
+
+    def __construct_subtree_root(
+            self,
+            args: SectionKeysOrObjects,
+            kwds: SectionAttr,
+            parent: SectionParent,
+    ) -> Tuple[SectionType, str, Iterator[SectionAttrs]]:
+        """
+        Construct a single node from its args and kwds, and return it along
+        with an iterator over the attrs of its children still to construct.
         """
-        args = list(args)
         node_attrs, children_attrs, keyname = self.__parse_attrs(
             args, kwds, parent)
         node = self.__construct_node(parent, node_attrs)
-        self.__construct_children(node, args, children_attrs, keyname)
-        return node
+        children = self.__iter_children_attrs(
+            node, args, children_attrs, keyname)
+        return node, keyname, children
 
     def __parse_attrs(
             self,
@@ -59,6 +91,7 @@ class MetaSection(type):
         child nodes, construct current node, then recursively repeat for all
         child nodes.
         """
+        self.__check_reserved(kwds)
         node_attrs, children_attrs = {}, {}
         keyname = self.singular_keyname
         keys = self.__parse_keys(args, kwds, keyname)
@@ -72,6 +105,20 @@ class MetaSection(type):
         node_attrs['_Section__keyname'] = keyname
         return node_attrs, children_attrs, keyname
 
+    def __check_reserved(self, kwds: SectionAttr) -> None:
+        """
+        Refuse attrs named after read-only properties of Section, such as
+        path or nofleaves, which nodes cannot hold. Properties and methods
+        may still be given under these names to replace them.
+        """
+        for name, value in kwds.items():
+            attr = getattr(self, name, None)
+            if (isinstance(attr, property) and attr.fset is None
+                    and not isinstance(value, (FunctionType, property))):
+                raise AttributeError(
+                    f"'{name}' is a reserved Section property and cannot be "
+                    f"given as a node attribute")
+
     def __parse_node_attrs(
         self, name: str, value: Any, node_attrs: SectionAttrs,
         children_attrs: SectionAttrs
@@ -161,15 +208,18 @@ class MetaSection(type):
             setattr(node.__class__, k, v)
         return node
 
-    def __construct_children(
+    def __iter_children_attrs(
         self,
         node: SectionType,
         args: SectionKeysOrObjects,
         children_attrs: SectionAttrs,
         keyname: str
-    ) -> None:
+    ) -> Iterator[SectionAttrs]:
         """
-        Recursively repeat construction per child with extracted child attrs.
+        Add any pre-constructed Section children from args to node, then give
+        attr[i] from each attr to child i. Existing children are updated in
+        place, while the attrs of each child still to be constructed are
+        yielded.
         """
         nofchildren_from_attrs, children_from_args = (
             _get_children_data(args, children_attrs)
@@ -179,38 +229,35 @@ class MetaSection(type):
             if key is SectionNone:
                 key = i
             node[key] = child
+        existing_children = list(node.values())
         for child_i in range(nofchildren_from_attrs):
-            self.__contruct_child(child_i, children_attrs, node, keyname)
-
-    def __contruct_child(
-        self,
-        child_i: int, children_attrs: SectionAttrs,
-        node: SectionType, keyname: str
-    ) -> None:
-        """Parse attr[i] from each attr and give to child."""
-        child_attrs = {}
-        for k, v in children_attrs.items():
-            if len(v) > child_i:
-                child_attrs[k] = v[child_i]
-        child = _get_dictval_i(node, child_i)
-        self.__contruct_child_from_dict_or_cls(
-            child, child_attrs, child_i, keyname, node)
+            child_attrs = {}
+            for k, v in children_attrs.items():
+                if len(v) > child_i:
+                    child_attrs[k] = v[child_i]
+            if child_i < len(existing_children):
+                child = existing_children[child_i]
+                for name, value in child_attrs.items():
+                    setattr(child, name, value)
+            else:
+                child_attrs[keyname] = child_attrs.get(keyname, child_i)
+                yield child_attrs
 
-    def __contruct_child_from_dict_or_cls(
-            self,
-            child: Union[SectionType, None],
-            child_attrs: SectionAttrs,
-            child_i: int,
-            keyname: str,
-            node: SectionType,
-    ) -> None:
-        if child:  # if child is Section instance
-            for name, value in child_attrs.items():
-                setattr(child, name, value)
-        else:
-            child_attrs[keyname] = child_attrs.get(keyname, child_i)
-            child = self(parent=node, **child_attrs)
-            node[getattr(child, keyname)] = child
+    def __finish_node(self, node: SectionType) -> None:
+        """
+        Called once all of node's descendants have been constructed. Does the
+        per-node work of Section.__invalidate_caches once per node, rather than
+        once per added descendant.
+        """
+        if node.isleaf:
+            # leaves have no caches, but were added to their parent
+            if node.__dict__.get('parent') is not None:
+                node.structure_change()
+            return
+        node._SectionNode__invalidate_structure_caches()
+        if node.use_cache:
+            node._SectionAttrParser__invalidate_node_cache()
+        node.structure_change()
 
 
 def _fix_children_keys_if_invalid(child_attrs, keyname):
@@ -253,16 +300,6 @@ def _dict_haskey(d: AnyDict, key: Any) -> bool:
     return d.get(key, SectionNone) is not SectionNone
 
 
-def _get_dictval_i(d: AnyDict, i: int) -> Any:
-    """Get value in iterator position i from dict as if its a list."""
-    ret = None
-    for ii, value in enumerate(d.values()):
-        if ii == i:
-            ret = value
-            break
-    return ret
-
-
 def _args_is_str_and_sections(*args: Any):
     if len(args) <= 1:
         args_is_str_and_sections = False
@@ -1,13 +1,40 @@
+from bisect import bisect_right
 from collections import OrderedDict
-from itertools import chain
-from itertools import repeat
+from itertools import islice
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 
+from .index import get_ancestry
+from .index import get_index
+from .index import key_of
+from .properties import read
+from .properties import untracked
+from .types import GetType
 from .types import SectionType
 
 
 class SectionNode:
     """Generic tree-structure node-related logic."""
 
+    # private attrs holding data derived from a node's position in its
+    # structure, which must not be shared with copies of the node
+    _structure_cache_attrs = [
+        '_Section__path',
+        '_Section__index',
+        '_Section__ancestry',
+        '_Section__subtree_counts',
+        '_Section__child_offsets',
+        '_Section__sequences',
+        '_Section__render',
+        '_Section__properties',
+        '_Section__dependents',
+    ]
+
     @ property
     def nofchildren(self) -> int:
         """Nunber of children Sections/nodes."""
@@ -42,7 +69,8 @@ class SectionNode:
         list of the childrens' attr `attr`, then write section.children.attr to
         access the attr list.
         """
-        return self.node_withchildren_fromiter(self.values())
+        with untracked():
+            return self.node_withchildren_fromiter(self.values())
 
     def node_withchildren_fromiter(
             self, itr: iter
@@ -55,11 +83,15 @@ class SectionNode:
         import sections
         root = sections()
         root._SectionDict__children_by_name = {}
-        for node in itr:
-            OrderedDict.__setitem__(root, node, node)
-            name = node._SectionStringParser__name
-            root._SectionDict__children_by_name[name] = node
+        with untracked():
+            for node in itr:
+                OrderedDict.__setitem__(root, node, node)
+                name = node._SectionStringParser__name
+                root._SectionDict__children_by_name[name] = node
         delattr(root, 'name')
+        # reads from the returned node are reads from self's subtree
+        root.__dict__['_Section__owner'] = self
+        read(self, ())
         return root
 
     @ property
@@ -70,7 +102,8 @@ class SectionNode:
         """
         import sections
         node = sections()
-        node.__dict__ = self.__dict__
+        node.__dict__ = {k: v for k, v in self.__dict__.items()
+                         if k not in self._structure_cache_attrs}
         for attr in self._setattr_invalidate_cache_excludes:
             setattr(node, attr, getattr(self, attr))
         return node
@@ -80,18 +113,303 @@ class SectionNode:
         """
         Return iterator that iterates through all self's leaf node descendants.
         """
-        return (chain(*(child.leaves_iter for child in self.values()))
-                if self.isparent else repeat(self, 1))
+        return (node for node in self.descendants_iter if node.isleaf)
 
     @ property
     def descendants_iter(self) -> iter:
         """
         Return iterator that iterates through self and all self's descendants.
         """
-        return (
-            chain(repeat(self, 1),
-                  *(child.descendants_iter for child in self.values()))
-            if self.isparent else repeat(self, 1))
+        return self.__iter_descendants()
+
+    def __iter_descendants(self) -> Iterable[SectionType]:
+        """
+        Depth-first traversal using an explicit stack so that structures of
+        any depth can be traversed.
+        """
+        stack = [iter((self,))]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                continue
+            yield node
+            if node.isparent:
+                stack.append(iter(tuple(node.values())))
+
+    @ property
+    def path(self) -> Tuple[Any, ...]:
+        """
+        The keys of the nodes leading from the structure's root to self, each
+        the key a node is held under by its parent, such that
+        `root.at(node.path)` returns `node`. The root's path is `()`. The
+        path is cached in self after the first read.
+        """
+        path = self.__dict__.get('_Section__path')
+        if path is None:
+            # building the index makes sure the cached path is dropped on any
+            # later change to the structure that changes the path
+            get_index(self, build=True)
+            keys = []
+            node = self
+            while node.__dict__.get('parent') is not None:
+                keys.append(key_of(node.parent, node))
+                node = node.parent
+            path = tuple(reversed(keys))
+            self.__setattr__('_Section__path', path, _invalidate_cache=False)
+        return path
+
+    def at(self, path: Iterable[Any]) -> SectionType:
+        """
+        Return the descendant reached by looking up each key in `path` in
+        turn, starting from self. Raises KeyError if no such node exists.
+        """
+        node = self
+        for key in path:
+            node = node._SectionDict__getitem(key)
+        return node
+
+    def find_name(
+            self, name: Any, gettype: GetType = 'hybrid'
+    ) -> Union[SectionType, List[SectionType], Iterable[SectionType]]:
+        """
+        Return the nodes named `name` from self and self's descendants, found
+        from a structure-wide index rather than by traversal. Raises KeyError
+        if there are none.
+
+        :param gettype: Setting to `'hybrid'` returns the node itself if only
+                        one is found, else a list of the nodes. Setting to
+                        `list` always returns a list, and setting to `iter`
+                        returns an iterator over the nodes.
+        """
+        nodes = get_index(self, build=True).find(name)
+        if not self.isroot:
+            nodes = [node for node in nodes
+                     if node is self or self.is_ancestor_of(node)]
+        if not nodes:
+            raise KeyError(name)
+        if gettype == 'hybrid':
+            return nodes[0] if len(nodes) == 1 else nodes
+        elif gettype is iter:
+            return iter(nodes)
+        return nodes
+
+    @ property
+    def depth(self) -> int:
+        """
+        Number of ancestors self has, read from structure-wide ancestry tables
+        in O(1) time. The root's depth is 0.
+        """
+        ancestry = get_ancestry(self)
+        if ancestry.contains(self):
+            return ancestry.depth(self)
+        return len(self.__ancestors())
+
+    def is_ancestor_of(self, other: SectionType) -> bool:
+        """
+        True iff self is a parent, grandparent, etc. of `other`. Answered from
+        structure-wide ancestry tables in O(1) time.
+        """
+        if other is self:
+            return False
+        ancestry = get_ancestry(self)
+        if ancestry.contains(self, other):
+            return ancestry.is_ancestor(self, other)
+        return any(node is self for node in other.__ancestors())
+
+    @staticmethod
+    def lca(a: SectionType, b: SectionType) -> Optional[SectionType]:
+        """
+        Return the lowest common ancestor of nodes `a` and `b`, which is `a`
+        itself if `a` is an ancestor of `b` and vice versa. Return None if `a`
+        and `b` are not in the same structure. Answered from structure-wide
+        ancestry tables in O(log depth) time.
+        """
+        ancestry = get_ancestry(a)
+        if ancestry.contains(a, b):
+            return ancestry.lca(a, b)
+        a_ancestors = {a, *a.__ancestors()}
+        for node in (b, *b.__ancestors()):
+            if node in a_ancestors:
+                return node
+        return None
+
+    def __ancestors(self) -> List[SectionType]:
+        """
+        Return self's ancestors from parent to root by walking up the parent
+        references. Used for nodes the ancestry tables do not contain, such
+        as nodes that have been removed from their structure.
+        """
+        ancestors = []
+        node = self.__dict__.get('parent')
+        while node is not None:
+            ancestors.append(node)
+            node = node.__dict__.get('parent')
+        return ancestors
+
+    @ property
+    def nofleaves(self) -> int:
+        """
+        Number of leaf nodes in self's subtree, counting self if self is a
+        leaf. Counts are kept in each node and only recounted for the nodes
+        whose subtree changed.
+        """
+        return self.__subtree_counts()[0]
+
+    @ property
+    def nofdescendants(self) -> int:
+        """
+        Number of nodes in :meth:`descendants <Section.descendants>`, i.e.
+        self and all of self's descendants.
+        """
+        return self.__subtree_counts()[1]
+
+    def leaf_at(self, i: int) -> SectionType:
+        """
+        Return the leaf at index `i` of :meth:`leaves <Section.leaves>`
+        without building the leaves structure, descending from self in
+        O(depth) steps using each node's subtree counts.
+        """
+        i = self.__check_index(i, self.nofleaves)
+        return next(self.__iter_leaves_from(i))
+
+    def leaves_slice(
+            self, start: Optional[int] = None, stop: Optional[int] = None
+    ) -> SectionType:
+        """
+        Return :meth:`leaves <Section.leaves>`[start:stop] as a Section node,
+        in the same form as :meth:`leaves <Section.leaves>`, visiting only the
+        leaves in the slice and the nodes on the path to the first of them.
+        """
+        start, stop, _ = slice(start, stop).indices(self.nofleaves)
+        leaves = (islice(self.__iter_leaves_from(start), stop - start)
+                  if start < stop else ())
+        return self.node_withchildren_fromiter(leaves)
+
+    def descendant_at(self, i: int) -> SectionType:
+        """
+        Return the node at index `i` of :meth:`descendants
+        <Section.descendants>`, where index 0 is self, without building the
+        descendants structure.
+        """
+        i = self.__check_index(i, self.nofdescendants)
+        node = self
+        while i:
+            i -= 1  # step past node itself
+            children, _, descendant_starts, _ = node.__child_offsets()
+            k = bisect_right(descendant_starts, i) - 1
+            i -= descendant_starts[k]
+            node = children[k]
+        return node
+
+    def descendant_rank(self, node: SectionType) -> int:
+        """
+        Return the index of `node` in :meth:`descendants
+        <Section.descendants>`, walking from `node` up to self. Raises
+        ValueError if `node` is not self or one of self's descendants.
+        """
+        rank = 0
+        while node is not self:
+            parent = node.__dict__.get('parent')
+            if parent is None:
+                raise ValueError(f'{node!r} is not a descendant of {self!r}')
+            _, _, descendant_starts, positions = parent.__child_offsets()
+            k = positions.get(node)
+            if k is None:
+                raise ValueError(f'{node!r} is not a descendant of {self!r}')
+            rank += 1 + descendant_starts[k]
+            node = parent
+        return rank
+
+    def __check_index(self, i: int, length: int) -> int:
+        if i < 0:
+            i += length
+        if not 0 <= i < length:
+            raise IndexError(i)
+        return i
+
+    def __iter_leaves_from(self, i: int) -> Iterable[SectionType]:
+        """
+        Iterate through self's leaves starting from leaf index `i`, descending
+        straight to it and then continuing depth-first from there.
+        """
+        stack = []
+        node = self
+        while node.isparent:
+            children, leaf_starts, _, _ = node.__child_offsets()
+            k = bisect_right(leaf_starts, i) - 1
+            i -= leaf_starts[k]
+            stack.append(iter(children[k + 1:]))
+            node = children[k]
+        yield node
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+            elif node.isleaf:
+                yield node
+            else:
+                stack.append(iter(tuple(node.values())))
+
+    def __subtree_counts(self) -> Tuple[int, int]:
+        """
+        Return the number of leaves and descendants in self's subtree. Counts
+        missing after a structure change are recomputed bottom-up, reusing the
+        counts still held by unchanged subtrees.
+        """
+        counts = self.__dict__.get('_Section__subtree_counts')
+        if counts is not None:
+            return counts
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            uncounted = [child for child in node.values()
+                         if '_Section__subtree_counts' not in child.__dict__]
+            if uncounted:
+                stack.extend(uncounted)
+                continue
+            stack.pop()
+            nofleaves, nofdescendants = (0, 1) if node.isparent else (1, 1)
+            for child in node.values():
+                child_counts = child.__dict__['_Section__subtree_counts']
+                nofleaves += child_counts[0]
+                nofdescendants += child_counts[1]
+            node.__dict__['_Section__subtree_counts'] = (
+                nofleaves, nofdescendants)
+        return self.__dict__['_Section__subtree_counts']
+
+    def __child_offsets(self) -> Tuple[
+            Tuple[SectionType, ...], List[int], List[int],
+            Dict[SectionType, int]]:
+        """
+        Return self's children in order along with the number of leaves and
+        descendants before each child in self's subtree, and each child's
+        position.
+        """
+        offsets = self.__dict__.get('_Section__child_offsets')
+        if offsets is None:
+            children = tuple(self.values())
+            leaf_starts, descendant_starts = [], []
+            nofleaves = nofdescendants = 0
+            for child in children:
+                leaf_starts.append(nofleaves)
+                descendant_starts.append(nofdescendants)
+                child_counts = child.__subtree_counts()
+                nofleaves += child_counts[0]
+                nofdescendants += child_counts[1]
+            positions = {child: k for k, child in enumerate(children)}
+            offsets = children, leaf_starts, descendant_starts, positions
+            self.__dict__['_Section__child_offsets'] = offsets
+        return offsets
+
+    def __invalidate_structure_caches(self) -> None:
+        """
+        Drop self's structure-derived caches. Called for every node from a
+        changed node up to the root by Section.__invalidate_caches.
+        """
+        self.__dict__.pop('_Section__subtree_counts', None)
+        self.__dict__.pop('_Section__child_offsets', None)
+        self.__dict__.pop('_Section__sequences', None)
 
     @ property
     def descendants(self) -> SectionType:
@@ -99,16 +417,14 @@ class SectionNode:
         Similar to :meth:`leaves <Section.leaves>` except all nodes in
         structure are returned.
         """
-        return self.node_withchildren_fromiter(
-            self.descendants_iter)
+        return self.__cached_sequence('descendants', 'descendants_iter')
 
     @ property
     def flat(self) -> SectionType:
         """
         Synonym for :meth:`descendants <Section.descendants>`.
         """
-        return self.node_withchildren_fromiter(
-            self.descendants_iter)
+        return self.descendants
 
     @ property
     def leaves(self) -> SectionType:
@@ -119,4 +435,27 @@ class SectionNode:
         access a list of the leaves' attr `attr`, then write
         section.leaves.attr to access the leaf attr list.
         """
-        return self.node_withchildren_fromiter(self.leaves_iter)
+        return self.__cached_sequence('leaves', 'leaves_iter')
+
+    def __cached_sequence(self, name: str, iter_name: str) -> SectionType:
+        """
+        Return the Section node built from iterator property `iter_name`. If
+        self uses a cache, the node is kept in self until the structure of
+        self's subtree changes, and its attribute cache is invalidated along
+        with self's when attributes in self's subtree change. The returned
+        node is shared between reads, so it is read-only: changing its
+        attributes or children raises TypeError, while its children are
+        self's own nodes and can be changed as usual.
+        """
+        if not self.use_cache or self.isleaf:
+            return self.node_withchildren_fromiter(getattr(self, iter_name))
+        sequences = self.__dict__.get('_Section__sequences')
+        if sequences is None:
+            sequences = self.__dict__['_Section__sequences'] = {}
+        sequence = sequences.get(name)
+        if sequence is None:
+            sequence = self.node_withchildren_fromiter(
+                getattr(self, iter_name))
+            sequence.__dict__['_Section__readonly'] = True
+            sequences[name] = sequence
+        return sequence
@@ -0,0 +1,143 @@
+import os
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce as _reduce
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Type
+
+from . import pickling
+from .types import AnyDict
+from .types import SectionNone
+from .types import SectionType
+
+
+def balanced_chunks(
+        root: SectionType, nofchunks: int
+) -> List[List[SectionType]]:
+    """
+    Split the leaves of `root` into about `nofchunks` chunks of similar leaf
+    counts. Each chunk is a list of whole subtrees, found by descending from
+    `root` into every subtree with more leaves than a chunk should have, so
+    the chunks hold the leaves in the same order as `root.leaves`.
+    """
+    target = max(1, -(-root.nofleaves // max(1, nofchunks)))
+    subtrees = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.nofleaves > target:
+            stack.extend(reversed(tuple(node.values())))
+        else:
+            subtrees.append(node)
+    chunks, chunk, size = [], [], 0
+    for subtree in subtrees:
+        if chunk and size + subtree.nofleaves > target:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(subtree)
+        size += subtree.nofleaves
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def map_reduce(
+        root: SectionType,
+        fn: Callable[[SectionType], Any],
+        reduce: Optional[Callable[[Any, Any], Any]] = None,
+        executor: Optional[Executor] = None,
+        nofchunks: Optional[int] = None,
+        write: bool = False,
+) -> Any:
+    """See :meth:`Section.map_reduce <Section.map_reduce>`."""
+    if nofchunks is None:
+        nofchunks = 4 * (os.cpu_count() or 1)
+    chunks = balanced_chunks(root, nofchunks)
+    spec = pickling.class_spec(root.cls)
+    streams = [[pickling.records(subtree)[0] for subtree in chunk]
+               for chunk in chunks]
+    if executor is None:
+        with ProcessPoolExecutor() as executor:
+            chunk_results = _map_chunks(executor, fn, spec, streams)
+    else:
+        chunk_results = _map_chunks(executor, fn, spec, streams)
+    results: Dict[SectionType, Any] = {}
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        leaves = (leaf for subtree in chunk for leaf in subtree.leaves_iter)
+        results.update(zip(leaves, chunk_result))
+    if write:
+        root._set_nodes_attrs(results)
+    if reduce is not None:
+        return _reduce(reduce, results.values())
+    return results
+
+
+def build(
+        cls: Type[SectionType],
+        specs: Iterable[Tuple[Sequence[Any], AnyDict]],
+        executor: Optional[Executor] = None,
+        **kwds: Any,
+) -> SectionType:
+    """See :meth:`sections.build_parallel <Module.build_parallel>`."""
+    specs = list(specs)
+    args = [spec[0] for spec in specs]
+    subtree_kwds = [pickling.dict_spec(spec[1]) for spec in specs]
+    if executor is None:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(_build_subtree, args, subtree_kwds))
+    else:
+        results = list(executor.map(_build_subtree, args, subtree_kwds))
+    root = cls(**kwds)
+    for class_attrs, stream in results:
+        for k, v in pickling.build_dict(class_attrs).items():
+            if k != '__doc__':
+                setattr(cls, k, v)
+        # constructed straight into cls, so assigning it below does not
+        # rebuild it the way assigning a node of another structure does
+        subtree = pickling.build(cls, stream)[0]
+        keyname = subtree._Section__keyname
+        name = subtree.__dict__.get(keyname, SectionNone)
+        if name is SectionNone:
+            # unnamed children are named by their position, as in sections()
+            name = root.nofchildren
+            subtree.__setattr__(keyname, name, _invalidate_cache=False)
+        root[name] = subtree
+    return root
+
+
+def _build_subtree(
+        args: Sequence[Any], kwds: AnyDict
+) -> Tuple[AnyDict, List[Any]]:
+    """
+    Construct a structure from `args` and the kwds described by `kwds` as
+    sections() does, and return its class attrs and record stream.
+    """
+    import sections
+    subtree = sections(*args, **pickling.build_dict(kwds))
+    return (pickling.class_attrs_spec(subtree.cls),
+            pickling.records(subtree)[0])
+
+
+def _map_chunks(executor: Executor, fn: Callable[[SectionType], Any],
+                spec: Any, streams: List[List[Any]]) -> List[List[Any]]:
+    futures = [executor.submit(_map_chunk, fn, spec, chunk_streams)
+               for chunk_streams in streams]
+    return [future.result() for future in futures]
+
+
+def _map_chunk(fn: Callable[[SectionType], Any], spec: Any,
+               streams: List[List[Any]]) -> List[Any]:
+    """Rebuild the subtrees of a chunk and apply `fn` to their leaves."""
+    cls = pickling.build_class(spec)
+    results = []
+    for stream in streams:
+        subtree = pickling.build(cls, stream)[0]
+        results.extend(fn(leaf) for leaf in subtree.leaves_iter)
+    return results
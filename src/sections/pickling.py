@@ -0,0 +1,199 @@
+import builtins
+import marshal
+import pickle
+import sys
+import types
+from collections import OrderedDict
+from typing import Any
+from typing import List
+from typing import Tuple
+from typing import Type
+
+from .types import AnyDict
+from .types import SectionType
+
+# Class dict entries recreated by type creation rather than copied
+_IMPLICIT_CLASS_ATTRS = {'__module__', '__qualname__', '__dict__',
+                         '__weakref__'}
+# Class dict entries attaching live objects to a structure, such as journals,
+# subscriptions and versions watching it, or the store it is paged in from,
+# which a copy of the structure does not inherit
+_ATTACHED_CLASS_ATTRS = {'_Section__change_hooks',
+                         '_Section__change_listeners', '_Section__store'}
+
+
+def records(root: SectionType) -> Tuple[List[Any], List[SectionType]]:
+    """
+    Return the flat record stream of the subtree with root `root`, and its
+    nodes in the same preorder. Each node contributes two records: its attrs,
+    excluding its parent and cached data, and the keys its children are held
+    under, which need not be their names.
+    """
+    stream, nodes = [], []
+    prefix = root.cls._Section__private_prefix
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        attrs = {k: v for k, v in node.__dict__.items()
+                 if not k.startswith(prefix)}
+        attrs.pop('parent', None)
+        attrs['_Section__keyname'] = node.__dict__['_Section__keyname']
+        keys, children = [], []
+        for key, child in node.items():
+            # nodes holding other nodes' children are keyed by the children
+            keys.append(_SelfKey if key is child else key)
+            children.append(child)
+        stream.append(attrs)
+        stream.append(tuple(keys))
+        stack.extend(reversed(children))
+    return stream, nodes
+
+
+def build(cls: Type[SectionType], stream: List[Any]) -> List[SectionType]:
+    """
+    Construct nodes of class `cls` from a record stream returned by
+    :func:`records`, and return them in preorder.
+    """
+    nodes = []
+    stack = []  # [parent, iterator over the keys of its children]
+    it = iter(stream)
+    for attrs, keys in zip(it, it):
+        parent = stack[-1] if stack else None
+        node = type.__call__(cls, parent=parent and parent[0], **attrs)
+        nodes.append(node)
+        if parent is not None:
+            key = parent[1].pop()
+            OrderedDict.__setitem__(parent[0],
+                                    node if key is _SelfKey else key, node)
+            if not parent[1]:
+                stack.pop()
+        if keys:
+            stack.append([node, list(reversed(keys))])
+    return nodes
+
+
+def class_spec(cls: type) -> Any:
+    """
+    Return a picklable description of `cls`. Importable classes are pickled
+    by reference, while others, such as the unique class of each structure,
+    are described by their name, bases and class dict so that they can be
+    recreated, including properties and methods attached to them.
+    """
+    if _importable(cls):
+        return cls
+    return (_ClassSpec, cls.__name__, cls.__module__,
+            tuple(class_spec(base) for base in cls.__bases__),
+            class_attrs_spec(cls))
+
+
+def class_attrs_spec(cls: type) -> AnyDict:
+    """
+    Return a picklable description of the class dict of `cls`, leaving out
+    the objects attached to its structure.
+    """
+    return dict_spec({k: v for k, v in cls.__dict__.items()
+                      if k not in _IMPLICIT_CLASS_ATTRS
+                      and k not in _ATTACHED_CLASS_ATTRS})
+
+
+def dict_spec(attrs: AnyDict) -> AnyDict:
+    """
+    Return a picklable description of `attrs`, in which functions and
+    properties that cannot be pickled by reference are described by their
+    code.
+    """
+    return {k: _value_spec(v) for k, v in attrs.items()}
+
+
+def build_dict(spec: AnyDict) -> AnyDict:
+    """Return the dict described by `spec` from :func:`dict_spec`."""
+    return {k: _build_value(v) for k, v in spec.items()}
+
+
+def build_class(spec: Any) -> type:
+    """Return the class described by `spec` from :func:`class_spec`."""
+    if not isinstance(spec, tuple):
+        return spec
+    _, name, module, bases, attrs = spec
+    bases = tuple(build_class(base) for base in bases)
+    attrs = build_dict(attrs)
+    attrs['__module__'] = module
+    return types.new_class(name, bases,
+                           exec_body=lambda namespace: namespace.update(attrs))
+
+
+def unpickle(spec: Any, stream: List[Any]) -> SectionType:
+    """Recreate a pickled structure in a new unique class."""
+    return build(build_class(spec), stream)[0]
+
+
+class _ClassSpec:
+    """Marks a class description."""
+
+
+class _SelfKey:
+    """Marks a child held under itself as key."""
+
+
+class _FunctionSpec:
+    """Marks a function description."""
+
+
+class _DescriptorSpec:
+    """Marks a property, staticmethod or classmethod description."""
+
+
+def _value_spec(value: Any) -> Any:
+    if isinstance(value, types.FunctionType) and not _importable(value):
+        closure = tuple(cell.cell_contents
+                        for cell in value.__closure__ or ())
+        return (_FunctionSpec, sys.implementation.cache_tag,
+                marshal.dumps(value.__code__), value.__name__,
+                value.__qualname__, value.__module__, value.__defaults__,
+                value.__kwdefaults__, closure, value.__dict__)
+    if isinstance(value, property):
+        return (_DescriptorSpec, property, _value_spec(value.fget),
+                _value_spec(value.fset), _value_spec(value.fdel), value.__doc__)
+    if isinstance(value, (staticmethod, classmethod)):
+        return (_DescriptorSpec, type(value), _value_spec(value.__func__))
+    if isinstance(value, tuple):
+        # keep tuple values distinguishable from descriptions
+        return (tuple, value)
+    return value
+
+
+def _build_value(spec: Any) -> Any:
+    if not isinstance(spec, tuple):
+        return spec
+    if spec[0] is tuple:
+        return spec[1]
+    if spec[0] is _DescriptorSpec:
+        return spec[1](*map(_build_value, spec[2:]))
+    (_, cache_tag, code, name, qualname, module, defaults, kwdefaults,
+     closure, attrs) = spec
+    if cache_tag != sys.implementation.cache_tag:
+        raise pickle.UnpicklingError(
+            f'Function {qualname} was pickled by {cache_tag} and cannot be '
+            f'loaded by {sys.implementation.cache_tag}.')
+    module_globals = getattr(sys.modules.get(module), '__dict__', None)
+    if module_globals is None:
+        module_globals = {'__builtins__': builtins, '__name__': module}
+    function = types.FunctionType(
+        marshal.loads(code), module_globals, name, defaults,
+        tuple(types.CellType(value) for value in closure) or None)
+    function.__qualname__ = qualname
+    function.__kwdefaults__ = kwdefaults
+    function.__dict__.update(attrs)
+    return function
+
+
+def _importable(obj: Any) -> bool:
+    """True iff `obj` can be found again from its module and qualname."""
+    module = sys.modules.get(getattr(obj, '__module__', None))
+    if module is None:
+        return False
+    found = module
+    for name in obj.__qualname__.split('.'):
+        found = getattr(found, name, None)
+    return found is obj
@@ -0,0 +1,183 @@
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from .pluralizer import Pluralizer
+from .types import SectionType
+
+# What a property being evaluated has read: for each node it read from, the
+# names of the attributes gathered from its subtree, or None if it read the
+# nodes themselves, and with them any attribute. A None frame suspends
+# recording, such as while the library reads nodes on its own behalf.
+Reads = Dict[SectionType, Optional[Set[str]]]
+_frames: List[Optional[Reads]] = []
+# in a node's read names, its own attributes, read without being gathered
+_OWN = '_Section__own'
+
+
+class cached_property:
+    """
+    Decorator for a property of a Section class whose value is computed
+    once per node and kept until something it read changes. While it is
+    computed, the attributes it gathers and the nodes it reads are recorded,
+    and its value is invalidated along with the caches of the nodes it read
+    from: when a gathered attribute is set or deleted, when any attribute of
+    its own node is, or when anything changes in the subtree of a node whose
+    children it iterated or indexed.
+    """
+
+    def __init__(self, fn: Callable[[SectionType], Any]) -> None:
+        self.fn = fn
+        self.name = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, node: Optional[SectionType], cls: type = None) -> Any:
+        if node is None:
+            return self
+        cache = node.__dict__.get('_Section__properties')
+        entry = None if cache is None else cache.get(self.name)
+        if entry is None:
+            reads: Reads = {node: {_OWN}}
+            _frames.append(reads)
+            try:
+                value = self.fn(node)
+            finally:
+                _frames.pop()
+            if cache is None:
+                cache = node.__dict__['_Section__properties'] = {}
+            entry = cache[self.name] = (value, reads)
+            _depend(node, self.name, reads)
+        if _frames and _frames[-1] is not None:
+            # what this property read is read by the one reading it too
+            for region, names in entry[1].items():
+                _add(_frames[-1], region, names)
+        return entry[0]
+
+
+def read(node: SectionType, names: Optional[Iterable[str]] = None) -> None:
+    """
+    Record that the property being evaluated, if any, read attributes
+    `names` gathered from the subtree of `node`, or with None, the nodes of
+    the subtree themselves. Nodes holding a sequence of another node's
+    children, leaves or descendants count as that node.
+    """
+    if not _frames or _frames[-1] is None:
+        return
+    node = node.__dict__.get('_Section__owner', node)
+    if names is not None:
+        forms = set()
+        for name in names:
+            forms.update((name, *_pluralizer(name)))
+        names = forms
+    _add(_frames[-1], node, names)
+
+
+def reading(node: SectionType, name: str,
+            fn: Callable[[str], Any]) -> Any:
+    """
+    Record that attribute `name` is gathered from the subtree of `node`,
+    and return ``fn(name)`` without recording the reads it makes itself.
+    """
+    if not _frames:
+        return fn(name)
+    read(node, (name,))
+    _frames.append(None)
+    try:
+        return fn(name)
+    finally:
+        _frames.pop()
+
+
+@contextmanager
+def untracked() -> Iterator[None]:
+    """Context manager for not recording the reads made within it."""
+    if not _frames:
+        yield
+        return
+    _frames.append(None)
+    try:
+        yield
+    finally:
+        _frames.pop()
+
+
+def invalidate(node: SectionType, names: Optional[Set[str]] = None,
+               own: bool = False) -> None:
+    """
+    Called for each node whose caches are invalidated, for changes of
+    attributes `names` in its subtree or, with None, of its structure, and
+    with `own` if they are attributes of the node itself. Drop the cached
+    property values that depend on them.
+    """
+    dependents = node.__dict__.get('_Section__dependents')
+    if not dependents:
+        return
+    for key, depends_on in list(dependents.items()):
+        if (names is None or depends_on is None
+                or (own and _OWN in depends_on)
+                or not depends_on.isdisjoint(names)):
+            del dependents[key]
+            dependent, name = key
+            cache = dependent.__dict__.get('_Section__properties')
+            if cache is not None:
+                cache.pop(name, None)
+
+
+def _depend(node: SectionType, name: str, reads: Reads) -> None:
+    """
+    Register property `name` of `node` as depending on `reads` with the
+    nodes whose caches are invalidated when they change: reads within the
+    subtree of `node` with `node` itself, and others with the node read.
+    Reads of a node's own attributes stay with that node.
+    """
+    key = (node, name)
+    for region, names in reads.items():
+        if names is not None and _OWN in names:
+            _register(region, key, {_OWN})
+            names = names - {_OWN}
+            if not names:
+                continue
+        target = region
+        ancestor = region
+        while ancestor is not None:
+            if ancestor is node:
+                target = node
+                break
+            ancestor = ancestor.__dict__.get('parent')
+        _register(target, key, names)
+
+
+def _register(target: SectionType, key: Tuple[SectionType, str],
+              names: Optional[Set[str]]) -> None:
+    dependents = target.__dict__.get('_Section__dependents')
+    if dependents is None:
+        dependents = target.__dict__['_Section__dependents'] = {}
+    if key in dependents:
+        old = dependents[key]
+        names = None if old is None or names is None else old | names
+    dependents[key] = names
+
+
+def _add(reads: Reads, node: SectionType,
+         names: Optional[Set[str]]) -> None:
+    if node in reads:
+        old = reads[node]
+        if old is None:
+            return
+        if names is not None:
+            old.update(names)
+            return
+    reads[node] = None if names is None else set(names)
+
+
+_pluralizer = Pluralizer()
@@ -4,20 +4,54 @@ Flexible tree data structures for organizing lists and dicts into sections.
 https://github.com/trevorpogue/sections
 """
 
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from copy import deepcopy
 from typing import Any
+from typing import AsyncIterable
+from typing import Callable
+from typing import Dict
+from typing import Iterable
 from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
 from typing import Type
 from typing import Union
 
+from . import accessors
+from . import clone
+from . import journal
+from . import merkle
+from . import parallel
+from . import pickling
+from . import snapshot
+from . import sqlite
+from . import warm
 from .attr_parser import SectionAttrParser
 from .dict import SectionDict
+from .index import get_root
+from .journal import Journal
+from .journal import JournalFile
+from .merkle import Diff
 from .meta import MetaSection
 from .node import SectionNode
+from .properties import read
+from .properties import reading
+from .properties import untracked
+from .shared import SectionView
+from .shared import SharedStructure
+from .sqlite import SqliteStore
+from .stream import StreamBuilder
 from .string_parser import SectionStringParser
+from .subscriptions import Callback
+from .subscriptions import Subscription
 from .types import GetType
 from .types import SectionAttrs
 from .types import SectionNone
 from .types import SectionType
+from .versions import VersionedStructure
+from .warm import WarmReport
 
 
 class Section(SectionNode, SectionDict, SectionAttrParser, SectionStringParser,
@@ -56,11 +90,29 @@ class Section(SectionNode, SectionDict, SectionAttrParser, SectionStringParser,
     default_gettype = 'hybrid'
 
     default_attr = 'names'
+
+    # Limits applied when printing a structure, i.e. the defaults for the
+    # max_depth, max_children and max_width arguments of Section.render and
+    # Section.descendants_str. None means no limit.
+    str_max_depth = None
+    str_max_children = None
+    str_max_width = None
+
+    # Choose whether to keep printed output in each node, so that printing a
+    # structure again only formats the nodes changed since. Attribute values
+    # changed in place, such as a list appended to, are not seen as changes,
+    # so this is off by default.
+    use_render_cache = False
+
     list_attr_prefix = '_'
     # See https://sections.readthedocs.io/ for usage:
     use_pluralsingular = True
     ##########################################################################
     __private_prefix = '_Section'
+    # called with a node before and after it is changed, see
+    # hooks.add_change_hook and hooks.add_change_listener
+    __change_hooks = ()
+    __change_listeners = ()
 
     def __init__(self, **kwds: SectionAttrs) -> None:
         """Set object attr for every attr in kwds and init attr cache."""
@@ -96,6 +148,344 @@ class Section(SectionNode, SectionDict, SectionAttrParser, SectionStringParser,
         """
         pass
 
+    def save(self, path: str, intern: bool = False) -> None:
+        """
+        Save the structure with self as root to a compact binary snapshot file
+        at `path`. Node names and attribute values are stored in columns, with
+        strings kept in a shared table and other non-numeric values pickled.
+        Properties and methods defined on the structure's class are not saved.
+        If `intern` is True, identical subtrees are stored once and shared by
+        every parent holding one, so the file shrinks with the duplication.
+        """
+        snapshot.save(self, path, intern)
+
+    @classmethod
+    def load(cls, path: str) -> SectionType:
+        """
+        Return the root of the structure saved to the snapshot file at `path`
+        by :meth:`save <Section.save>`. The file is memory-mapped and each
+        node's children are only read from it when they are first accessed,
+        so loading is fast regardless of the snapshot's size. The returned
+        structure's nodes are instances of a new unique class inheriting cls.
+        """
+        return snapshot.load(cls, path)
+
+    def save_sqlite(self, path: str) -> None:
+        """
+        Save the structure with self as root to a SQLite database at `path`,
+        to be opened with :meth:`open_sqlite <Section.open_sqlite>`. Numbers,
+        strings and None are stored as they are and other attribute values
+        pickled. Properties and methods defined on the structure's class are
+        not saved.
+        """
+        sqlite.save(self, path)
+
+    @classmethod
+    def open_sqlite(cls, path: str, cache_budget: int = 100000,
+                    batch_size: int = 1000) -> SqliteStore:
+        """
+        Open the structure saved to the SQLite database at `path` by
+        :meth:`save_sqlite <Section.save_sqlite>`, without reading it into
+        memory. Return a :class:`SqliteStore <SqliteStore>`, whose root's
+        children are paged in from the database as they are accessed, keeping
+        at most about `cache_budget` nodes in memory. Attributes gathered
+        from a node's descendants are read with one range query each, and
+        changes are written back in transactions of `batch_size` changes.
+        """
+        return SqliteStore(cls, path, cache_budget, batch_size)
+
+    @classmethod
+    def abuild(
+            cls,
+            records: AsyncIterable[Mapping[str, Any]],
+            group_by: Sequence[str] = (),
+            chunk_size: int = 1000,
+            **kwds: SectionAttrs,
+    ) -> StreamBuilder:
+        """
+        Return a :class:`StreamBuilder <StreamBuilder>` that, when awaited,
+        builds a structure from the async iterable `records` of attr dicts
+        and returns its root, as in `root = await Section.abuild(records,
+        group_by=['sector'])`. Each record becomes a leaf under the group
+        nodes named by its values of the `group_by` attrs. Records are
+        inserted as they arrive, in chunks of `chunk_size` between which the
+        event loop runs other tasks, which can read the partly built
+        structure from the builder's root and always see whole chunks.
+        Caches are invalidated once per chunk. `kwds` are the root's attrs.
+        """
+        return StreamBuilder(cls, records, group_by, chunk_size, **kwds)
+
+    @classmethod
+    def accessor(
+            cls,
+            name: str,
+            gettype: GetType = 'default',
+            default: Any = SectionNone,
+    ) -> Callable[[SectionType], Any]:
+        """
+        Return a function `getter` such that ``getter(node)`` returns the
+        same as ``node(name, gettype, default)``, for use in tight loops. The
+        plural/singular forms of `name` and the form of the value returned
+        are resolved once, with `'default'` gettype resolved to the class's
+        default_gettype, and each call reads the node's attribute cache or
+        own attribute directly, only taking the full path of
+        :meth:`__call__ <Section.__call__>` when neither has the attribute.
+        """
+        return accessors.accessor(cls, name, gettype, default)
+
+    def journal(self, file: JournalFile,
+                flush_every: int = 1000) -> Journal:
+        """
+        Start an append-only :class:`Journal <Journal>` of every change made
+        to the structure with self as root, written to `file`, a path or
+        binary file object, as compact binary records in batches of
+        `flush_every`. Together with a snapshot saved beforehand, it lets the
+        structure be recovered with :meth:`replay <Section.replay>` or
+        :meth:`compact <Section.compact>` instead of being rebuilt.
+        """
+        return Journal(self, file, flush_every)
+
+    def replay(self, file: JournalFile) -> int:
+        """
+        Apply the changes recorded in the journal `file` to the structure
+        with self as root, such as one just loaded from the snapshot the
+        journal was started after, and return the number of changes applied.
+        """
+        return journal.replay(self, file)
+
+    @classmethod
+    def compact(cls, snapshot_path: str, journal_path: JournalFile,
+                path: Optional[str] = None) -> SectionType:
+        """
+        Load the snapshot file at `snapshot_path`, replay the journal at
+        `journal_path` onto it and save the result as a new snapshot at
+        `path`, or in place of the old snapshot by default, then empty the
+        journal, whose records the new snapshot holds. Return the replayed
+        structure's root.
+        """
+        return journal.compact(cls, snapshot_path, journal_path, path)
+
+    def map_reduce(
+            self,
+            fn: Callable[[SectionType], Any],
+            reduce: Optional[Callable[[Any, Any], Any]] = None,
+            executor: Optional[Executor] = None,
+            nofchunks: Optional[int] = None,
+            write: bool = False,
+    ) -> Any:
+        """
+        Apply `fn` to each of self's leaves in parallel worker processes.
+
+        The leaves are split into about `nofchunks` chunks of whole subtrees
+        with similar leaf counts (by default 4 per CPU). Each chunk is sent
+        to `executor` as flat pickled records and rebuilt there, so `fn` is
+        called with a copy of each leaf whose ancestors only go up to its
+        chunk subtree's root. `fn` must be picklable, e.g. a module-level
+        function. If `executor` is None, a ProcessPoolExecutor is created and
+        shut down for this call.
+
+        :param reduce: If given, return the results combined by
+                       `functools.reduce(reduce, results)`, in leaf order.
+                       Else return a dict of each leaf with its result.
+        :param write: If True, `fn` must return a dict of attrs for each
+                      leaf, which are set on the leaves in one batched update.
+        """
+        return parallel.map_reduce(self, fn, reduce=reduce,
+                                   executor=executor, nofchunks=nofchunks,
+                                   write=write)
+
+    def share(self, name: str = None, intern: bool = False) -> SharedStructure:
+        """
+        Export the structure with self as root to a new block of shared
+        memory, named `name` or a generated name, and return its owner. Other
+        processes attach to it by name with
+        :meth:`SectionView.attach <SectionView.attach>` to get a zero-copy,
+        read-only view of the structure, so memory use stays constant as more
+        processes attach. Call the owner's unlink method to free the block.
+        `intern` works as in :meth:`save <Section.save>`.
+        """
+        return SharedStructure(self, name, intern)
+
+    def freeze(self, intern: bool = False) -> SectionView:
+        """
+        Return a read-only :class:`SectionView <SectionView>` of a frozen copy
+        of the structure with self as root, packed in memory in the snapshot
+        format. With `intern` True, identical subtrees are stored once, and
+        a node's parent is the one it was reached through, so memory shrinks
+        with the structure's duplication.
+        """
+        return SectionView.freeze(self, intern)
+
+    def clone(self) -> SectionType:
+        """
+        Return a copy-on-write copy of the subtree with self as root, made in
+        constant time. The clone's nodes are copied from the original's only
+        when their children are first accessed, and until then attributes
+        gathered from them are read from the original, reusing its caches.
+        Changing either structure afterwards leaves the other unaffected.
+        """
+        return clone.clone(self)
+
+    @property
+    def content_hash(self) -> int:
+        """
+        A hash of the content of the subtree with self as root: self's
+        attributes other than its name, and the names and content hashes of
+        its children, in order. It is a 128-bit BLAKE2b digest of a
+        canonical encoding of that content, so equal subtrees have equal
+        hashes, and renamed or moved subtrees keep theirs, while subtrees
+        that differ practically never collide. Hashes are computed on first
+        use and cached, and a change to a node drops the cached hashes of the
+        node and its ancestors only. Attribute values changed in place, such
+        as a list appended to, are not seen as changes: set the attribute
+        again for its node's hash to be recomputed.
+        """
+        return merkle.content_hash(self)
+
+    def diff(self, other: SectionType) -> Diff:
+        """
+        Compare the subtree with self as root to the subtree with `other` as
+        root and return their differences as a :class:`Diff <Diff>` of
+        `added` and `removed` subtrees, `moved` subtrees found under another
+        parent or name, and `changed` nodes whose own attributes differ.
+        Children are matched by name, and subtrees with equal content hashes
+        are skipped, so the time taken is proportional to the size of the
+        change rather than of the structures. Can be called as
+        ``Section.diff(a, b)``.
+        """
+        return merkle.diff(self, other)
+
+    def subscribe(
+            self,
+            callback: Callback,
+            attrs: Optional[Iterable[str]] = None,
+            subtree: Optional[SectionType] = None,
+            delivery: str = 'sync',
+            loop: Optional[Any] = None,
+    ) -> Subscription:
+        """
+        Call `callback` with lists of :class:`Change <Change>` events for the
+        nodes added to, removed from or moved within the subtree with root
+        `subtree`, or self by default, and for the attributes set or deleted
+        on its nodes, limited to `attrs` and their plural/singular forms if
+        given. Each change is notified once, however deep the changed node,
+        instead of to every ancestor as :meth:`structure_change
+        <Section.structure_change>` is. `delivery` is `'sync'` to deliver
+        each change as it is made, `'deferred'` to collect them until
+        :meth:`Subscription.flush <Subscription.flush>` is called, or
+        `'asyncio'` to deliver them in one batch per iteration of `loop`,
+        the running loop by default. Repeated changes of the same attribute
+        of a node are coalesced in batches. Return the :class:`Subscription
+        <Subscription>`, which is stopped by its close method.
+        """
+        return Subscription(self if subtree is None else subtree, callback,
+                            attrs, delivery, loop)
+
+    def warm(
+            self, names: Iterable[str], background: bool = False,
+    ) -> Union[WarmReport, 'Future[WarmReport]']:
+        """
+        Fill the attribute caches of every non-leaf node in the subtree with
+        self as root for attributes `names`, in one bottom-up pass where each
+        node's caches are built from its children's, so that the first reads
+        of these attributes are as fast as later ones. Return a
+        :class:`WarmReport <WarmReport>` with the time taken and the number
+        and size of the cache entries added. If `background` is True, warm
+        the caches in a daemon thread instead and return a future for the
+        report; the structure should not be changed until it is done.
+        """
+        if background:
+            return warm.warm_in_background(self, names)
+        return warm.warm(self, names)
+
+    def versioned(self) -> VersionedStructure:
+        """
+        Return a :class:`VersionedStructure <VersionedStructure>` publishing
+        the changes made to the structure with self as root as numbered,
+        immutable versions. A writer changes the structure in place inside
+        its batch() context, committing a new version on exit, while readers
+        pin the latest version with its pin() method in O(1) and read it
+        consistently, without blocking the writer. Its close() method, also
+        called on leaving it as a context manager, stops the versioning.
+        """
+        return VersionedStructure(self)
+
+    def __reduce_ex__(self, protocol: int) -> Any:
+        """
+        Pickle the subtree with self as root as one flat stream of node attrs
+        and child keys, leaving out parent references and caches. The
+        structure's class is pickled by reference if it is importable, else
+        it is recreated as a new unique class when unpickled, along with any
+        properties and methods that were attached to it. Self is unpickled as
+        a root node.
+        """
+        stream, _ = pickling.records(self)
+        return pickling.unpickle, (pickling.class_spec(self.cls), stream)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> SectionType:
+        """
+        Copy the whole structure containing self into nodes of the same class
+        and return the copy of self.
+        """
+        stream, nodes = pickling.records(get_root(self))
+        copies = pickling.build(self.cls, stream)
+        memo.update({id(node): copy for node, copy in zip(nodes, copies)})
+        for copy, attrs in zip(copies, stream[::2]):
+            copy.__dict__.update(deepcopy(attrs, memo))
+        return memo[id(self)]
+
+    def gather(
+            self,
+            names: Sequence[str],
+            as_: Any = 'records',
+            default: Any = SectionNone,
+    ) -> Any:
+        """
+        Gather attributes `names` from self or self's descendants in one
+        walk, aligned by node. Each attribute is found as by
+        :meth:`__call__ <Section.__call__>`, with its singular/plural forms
+        and from the nearest nodes: the walk stops at the first nodes having
+        all of them, or at leaves, and an attribute found on a node is shared
+        by every row below it. The result is cached once for the set of
+        names.
+
+        :param names: The names of the attributes to gather.
+
+        :param as_: `'records'` returns a list with a dict of the attribute
+                    values for each row, `'columns'` returns a dict with a
+                    list of each attribute's values, and `numpy.ndarray`
+                    returns a 2D numpy array with a row per row and a column
+                    per attribute (requires numpy).
+
+        :param default: If not provided, AttributeError will be raised if an
+                        attribute is not found for a row. If given, it is
+                        used as the value instead.
+        """
+        names = tuple(names)
+        read(self, names)
+        with untracked():
+            rows = [values for _, values in self._gather_attrs(names)]
+        for values in rows:
+            for name, value in zip(names, values):
+                if value is SectionNone:
+                    if default is SectionNone:
+                        raise AttributeError(name)
+                    break
+            else:
+                continue
+            rows = [tuple(default if value is SectionNone else value
+                          for value in values) for values in rows]
+            break
+        if as_ == 'records':
+            return [dict(zip(names, values)) for values in rows]
+        elif as_ == 'columns':
+            return {name: [values[i] for values in rows]
+                    for i, name in enumerate(names)}
+        elif getattr(as_, '__name__', None) == 'ndarray':
+            import numpy
+            return numpy.array(rows)
+        raise ValueError(f'Unknown as_ {as_!r}.')
+
     def __call__(
             self,
             name: str = SectionNone,
@@ -145,6 +535,6 @@ class Section(SectionNode, SectionDict, SectionAttrParser, SectionStringParser,
         """
         if name is SectionNone:
             name = self.default_attr
-        attrs = self._get_nearest_attr(name)
+        attrs = reading(self, name, self._get_nearest_attr)
         return self._parse_top_getattr(name, attrs, gettype=gettype,
                                        default=default)
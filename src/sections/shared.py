@@ -0,0 +1,434 @@
+import mmap
+from array import array
+from collections.abc import Sequence
+from io import BytesIO
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+from .gathering import forms
+from .gathering import gathered
+from .gathering import nearest
+from .snapshot import SnapshotReader
+from .snapshot import SnapshotWriter
+from .types import AnyDict
+from .types import GetType
+from .types import SectionNone
+from .types import SectionType
+
+
+class SharedStructure:
+    """
+    A structure exported to a block of shared memory in the snapshot format,
+    for any number of processes to attach to as a read-only
+    :class:`SectionView <SectionView>` without copying it. The block lives
+    until :meth:`unlink <SharedStructure.unlink>` is called.
+    """
+
+    def __init__(self, root: SectionType, name: Optional[str] = None,
+                 intern: bool = False) -> None:
+        """
+        Export the structure with root `root` to a new block `name`, storing
+        identical subtrees once if `intern` is True.
+        """
+        file = BytesIO()
+        SnapshotWriter(intern).write(root, file)
+        data = file.getbuffer()
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=len(data))
+        self.shm.buf[:len(data)] = data
+        self.name = self.shm.name
+        _exported.add(self.name)
+
+    def close(self) -> None:
+        """Close this process's access to the block."""
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Close and free the block once every process has detached."""
+        self.shm.close()
+        self.shm.unlink()
+        _exported.discard(self.name)
+
+    def __enter__(self) -> 'SharedStructure':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.unlink()
+
+
+class SectionView:
+    """
+    A read-only node of a structure held in a snapshot buffer, such as a
+    shared memory block or a memory-mapped snapshot file. Names and attribute
+    values are decoded from the buffer when read, so a view uses almost no
+    memory of its own regardless of the structure's size. Supports the
+    read-only part of the Section interface: child access by name, attribute
+    gathering through calls and attribute access, and the children, leaves
+    and descendants sequences.
+    """
+
+    default_gettype = 'hybrid'
+    default_attr = 'names'
+
+    def __init__(
+            self, reader: SnapshotReader, i: int = 0,
+            parent: Optional['SectionView'] = None,
+    ) -> None:
+        """
+        View node `i` of the snapshot read by `reader`, reached through
+        `parent`. Nodes of interned snapshots may have several parents, and
+        their parent is the one they were reached through.
+        """
+        self.__reader = reader
+        self.__i = i
+        self.__parent = parent
+
+    @classmethod
+    def attach(cls, name: str) -> 'SectionView':
+        """
+        Return a view of the root of the structure exported to shared memory
+        block `name` by :meth:`Section.share <Section.share>`.
+        """
+        shm = _attach_untracked(name)
+        reader = SnapshotReader(shm.buf, cache_strings=False)
+        reader.shm = shm
+        return cls(reader)
+
+    @classmethod
+    def freeze(cls, root: SectionType, intern: bool = False) -> 'SectionView':
+        """
+        Return a view of a frozen copy of the structure with root `root`,
+        held in memory in the snapshot format, storing identical subtrees
+        once if `intern` is True.
+        """
+        file = BytesIO()
+        SnapshotWriter(intern).write(root, file)
+        return cls(SnapshotReader(file.getbuffer(), cache_strings=False))
+
+    @classmethod
+    def open(cls, path: str) -> 'SectionView':
+        """
+        Return a view of the root of the structure saved to the snapshot file
+        at `path` by :meth:`Section.save <Section.save>`.
+        """
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(SnapshotReader(buffer, cache_strings=False))
+
+    @property
+    def name(self) -> Any:
+        """The name of the node."""
+        return self.__reader.value(self.__reader.names, self.__i)
+
+    @property
+    def parent(self) -> Optional['SectionView']:
+        """The parent node, or None for the root."""
+        if self.__parent is not None:
+            return self.__parent
+        parent = self.__reader.parents[self.__i]
+        return None if parent < 0 else type(self)(self.__reader, parent)
+
+    @property
+    def isleaf(self) -> bool:
+        """True iff self node has no children."""
+        return not len(self)
+
+    @property
+    def isroot(self) -> bool:
+        """True iff self node has no parent."""
+        return self.__reader.parents[self.__i] < 0
+
+    @property
+    def children(self) -> 'SectionViews':
+        """The child nodes of self."""
+        return SectionViews(self.__reader, self.__reader.children(self.__i),
+                            self)
+
+    @property
+    def leaves(self) -> 'SectionViews':
+        """The leaf nodes of self, in the same order as Section.leaves."""
+        if self.__reader.interned:
+            return self.__preorder(leaves_only=True)
+        offsets = self.__reader.child_offsets
+        return SectionViews(self.__reader, array('q', (
+            i for i in _iter_preorder(self.__reader, [self.__i])
+            if offsets[i] == offsets[i + 1])))
+
+    @property
+    def descendants(self) -> 'SectionViews':
+        """Self and all its descendant nodes in depth-first order."""
+        if self.__reader.interned:
+            return self.__preorder(leaves_only=False)
+        return SectionViews(self.__reader, array(
+            'q', _iter_preorder(self.__reader, [self.__i])))
+
+    def __len__(self) -> int:
+        start, stop = self.__children_range()
+        return stop - start
+
+    def __iter__(self) -> Iterator['SectionView']:
+        """Iterate over child nodes, as Section does, not over their keys."""
+        return iter(self.children)
+
+    def __contains__(self, name: Any) -> bool:
+        return name in self.__children_by_name()
+
+    def __getitem__(self, name: Any) -> 'SectionView':
+        return type(self)(self.__reader, self.__children_by_name()[name],
+                          self)
+
+    def get(self, name: Any, default: Any = None) -> Any:
+        """Return the child named `name` if there is one, else `default`."""
+        i = self.__children_by_name().get(name)
+        return default if i is None else type(self)(self.__reader, i, self)
+
+    def keys(self) -> List[Any]:
+        """The keys of self's children."""
+        return self.__reader.child_keys(self.__i)
+
+    def values(self) -> 'SectionViews':
+        """The child nodes of self."""
+        return self.children
+
+    def items(self) -> List[Tuple[Any, 'SectionView']]:
+        """The (key, node) pairs of self's children."""
+        return list(zip(self.keys(), self.children))
+
+    def __call__(
+            self,
+            name: str = SectionNone,
+            gettype: GetType = 'default',
+            default: Any = SectionNone,
+    ) -> Union[Any, List[Any]]:
+        """
+        Return attribute `name` from self if it has it, else gather it from
+        the nearest descendants that have it, exactly as
+        :meth:`Section.__call__ <Section.__call__>` does.
+        """
+        paths = [self._path()] if self.__reader.interned else None
+        return _gather(self, self.__reader, [self.__i], name, gettype,
+                       default, paths)
+
+    def __getattr__(self, name: str) -> Any:
+        """Gather attribute `name` through :meth:`__call__`."""
+        if name.startswith(('__', '_SectionView')):
+            raise AttributeError(name)
+        return self(name)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} {self.name!r}>'
+
+    def __eq__(self, other: Any) -> bool:
+        return (isinstance(other, SectionView)
+                and other.__reader is self.__reader and other.__i == self.__i)
+
+    def __hash__(self) -> int:
+        return hash((id(self.__reader), self.__i))
+
+    def __preorder(self, leaves_only: bool) -> 'SectionViews':
+        """
+        Return self and its descendants, or just its leaves, in depth-first
+        order, each with the parent it was reached through.
+        """
+        reader = self.__reader
+        ids, parents = array('q'), []
+        stack = [(self.__i, self.__parent, self)]
+        while stack:
+            i, parent, view = stack.pop()
+            children = reader.children(i)
+            if not leaves_only or not len(children):
+                ids.append(i)
+                parents.append(parent)
+            if len(children):
+                if view is None:
+                    view = type(self)(reader, i, parent)
+                stack.extend((child, view, None) for child in reversed(children))
+        return SectionViews(reader, ids, parents)
+
+    def _path(self) -> Tuple[int, ...]:
+        """The ids of the nodes from the snapshot's root down to self."""
+        path = []
+        view = self
+        while view is not None:
+            path.append(view.__i)
+            view = view.parent
+        return tuple(reversed(path))
+
+    def __children_range(self) -> Tuple[int, int]:
+        offsets = self.__reader.child_offsets
+        return offsets[self.__i], offsets[self.__i + 1]
+
+    def __children_by_name(self) -> AnyDict:
+        """Return self's child ids by key, built on first use."""
+        reader = self.__reader
+        ids = reader.children_by_name.get(self.__i)
+        if ids is None:
+            children = reader.children(self.__i)
+            ids = dict(zip(reader.child_keys(self.__i), children))
+            reader.children_by_name[self.__i] = ids
+        return ids
+
+
+class SectionViews(Sequence):
+    """
+    A sequence of :class:`SectionView <SectionView>` nodes whose attributes
+    can be gathered together, like the node returned by Section.leaves. Nodes
+    are kept as ids and only wrapped in views when accessed.
+    """
+
+    default_gettype = 'hybrid'
+    default_attr = 'names'
+
+    def __init__(
+            self, reader: SnapshotReader, ids: Union[range, array, memoryview],
+            parents: Union[SectionView, List[SectionView], None] = None,
+    ) -> None:
+        """
+        Hold nodes `ids` of the snapshot read by `reader`, reached through
+        `parents`, either one parent of them all or the parent of each.
+        """
+        self.__reader = reader
+        self.__ids = ids
+        self.__parents = parents
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def __getitem__(
+            self, i: Union[int, slice]
+    ) -> Union[SectionView, 'SectionViews']:
+        parents = self.__parents
+        if isinstance(i, slice):
+            if isinstance(parents, list):
+                parents = parents[i]
+            return SectionViews(self.__reader, self.__ids[i], parents)
+        if isinstance(parents, list):
+            parents = parents[i]
+        return SectionView(self.__reader, self.__ids[i], parents)
+
+    def names_list(self) -> List[Any]:
+        """Return the name of each node."""
+        reader = self.__reader
+        return [reader.value(reader.names, i) for i in self.__ids]
+
+    def __call__(
+            self,
+            name: str = SectionNone,
+            gettype: GetType = 'default',
+            default: Any = SectionNone,
+    ) -> Union[Any, List[Any]]:
+        """Gather attribute `name` from each node like SectionView does."""
+        paths = ([view._path() for view in self] if self.__reader.interned
+                 else None)
+        return _gather(self, self.__reader, self.__ids, name, gettype,
+                       default, paths)
+
+    def __getattr__(self, name: str) -> Any:
+        """Gather attribute `name` through :meth:`__call__`."""
+        if name.startswith(('__', '_SectionViews')):
+            raise AttributeError(name)
+        return self(name)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} of {len(self)} nodes>'
+
+
+def _iter_preorder(
+        reader: SnapshotReader, ids: Iterable[int]
+) -> Iterator[int]:
+    """Iterate over `ids` and their descendants' ids in preorder."""
+    stack = list(reversed(ids))
+    while stack:
+        i = stack.pop()
+        yield i
+        stack.extend(reversed(reader.children(i)))
+
+
+def _gather(
+        caller: Union[SectionView, SectionViews], reader: SnapshotReader,
+        ids: Iterable[int], name: str, gettype: GetType, default: Any,
+        paths: Optional[List[Tuple[int, ...]]] = None,
+) -> Any:
+    """
+    Gather attribute `name` from each node in `ids` that has it, else from
+    the nearest of its descendants that have it, and return the values in the
+    form requested by `gettype`, as Section.__call__ does. Nodes of interned
+    snapshots are told apart by `paths`, the path of each node in `ids`.
+    """
+    if name is SectionNone:
+        name = caller.default_attr
+    # the columns holding the name, plural or singular forms of the attribute
+    columns = []
+    for form in forms(name):
+        column = (reader.names if form == reader.keyname
+                  else reader.columns.get(form))
+        if column is not None and all(column is not c for c in columns):
+            columns.append(column)
+
+    def value(i: int) -> Any:
+        for column in columns:
+            found_value = reader.value(column, i)
+            if found_value is not SectionNone:
+                return found_value
+        return SectionNone
+
+    if paths is None:
+        found = nearest(ids, value, reader.children)
+        default_key = (caller._SectionView__i
+                       if isinstance(caller, SectionView) else None)
+        return gathered(caller, found, name, gettype, default, default_key,
+                        lambda i: reader.value(reader.names, i))
+    # keyed by path, as a node may be reached through several parents
+    found = nearest(
+        paths, lambda path: value(path[-1]),
+        lambda path: [(*path, child) for child in reader.children(path[-1])])
+    default_key = paths[0] if isinstance(caller, SectionView) else None
+    return gathered(caller, found, name, gettype, default, default_key,
+                    lambda path: reader.value(reader.names, path[-1]))
+
+
+class _AttachedMemory(shared_memory.SharedMemory):
+    """
+    Shared memory attached to by a :class:`SectionView <SectionView>`, whose
+    reader's arrays view it in place and may outlive it.
+    """
+
+    def close(self) -> None:
+        """
+        Close access to the block, which is unmapped when the last array
+        viewing it is freed if any still are.
+        """
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to shared memory block `name` without registering it with the
+    resource tracker, which would otherwise free the block when this process
+    exits, even though the exporting process still owns it.
+    """
+    try:
+        return _AttachedMemory(name=name, track=False)
+    except TypeError:  # track was added in Python 3.13
+        pass
+    shm = _AttachedMemory(name=name)
+    # the tracker keeps one entry per block, which in the exporting process,
+    # or a process forked from it, is the exporter's own
+    if name not in _exported:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+# names of the blocks exported by this process
+_exported: Set[str] = set()
@@ -0,0 +1,385 @@
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+from typing import IO
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+from .lazy import lazy_class
+from .types import AnyDict
+from .types import SectionNone
+from .types import SectionType
+
+# A snapshot is a magic string and byte order marker followed by a sequence
+# of arrays, each stored as its length in bytes, then its data padded to a
+# multiple of 8 bytes so that every array can be read in place, without
+# copying, through a memoryview cast:
+#
+#   meta            int64[5]: nofnodes, nofcolumns, nofstrings, nofblobs,
+#                   string index of the structure's keyname attr
+#   column names    int64[nofcolumns]: string index of each attr name
+#   parents         int64[nofnodes]: parent id of each node, -1 for the root,
+#                   or the id of its first parent if it is shared
+#   child offsets   int64[nofnodes + 1]: children of node i are the nodes
+#                   with ids child_offsets[i] to child_offsets[i + 1] - 1, or
+#                   if the snapshot is interned, the nodes with the ids held
+#                   by those entries of child ids
+#   child ids       int64[]: empty unless the snapshot is interned
+#   name column     uint8[nofnodes] tags, then int64[nofnodes] payloads
+#   key column      uint8[] tags, then int64[] payloads: the key each child
+#                   is held under by its parent, with the entry of child
+#                   offset j for the child listed there
+#   attr columns    one tags array and one payloads array per column
+#   string table    int64[nofstrings + 1] offsets, then utf-8 data
+#   blob table      int64[nofblobs + 1] offsets, then pickled data
+#
+# Nodes are numbered breadth-first so that, unless the snapshot is interned,
+# each node's children have consecutive ids. An interned snapshot stores
+# identical subtrees once, shared by every parent holding one. Each value in
+# a column is encoded by a tag and an int64 payload whose meaning depends on
+# the tag.
+MAGIC = b'SECTIONS'
+VERSION = 3
+_ABSENT, _NONE, _BOOL, _INT, _FLOAT, _STR, _BLOB, _SECTIONNONE = range(8)
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class SnapshotWriter:
+    """
+    Encodes a structure into the snapshot format. If `intern` is True,
+    identical subtrees are written only once and shared by every parent
+    that holds one, so the snapshot shrinks with the structure's duplication.
+    """
+
+    def __init__(self, intern: bool = False) -> None:
+        self.intern = intern
+        self.strings: Dict[str, int] = {}
+        self.blobs: Dict[bytes, int] = {}
+
+    def write(self, root: SectionType, file: IO[bytes]) -> None:
+        """Write the structure with root `root` to binary file `file`."""
+        nodes = _breadth_first(root)
+        keyname = root._Section__keyname
+        encoded = {node: self.__encode_node(node, keyname) for node in nodes}
+        keys = {node: tuple(map(self.__encode, node.keys()))
+                for node in nodes}
+        if self.intern:
+            nodes, children = _interned(nodes, encoded, keys)
+        else:
+            children = {node: node.values() for node in nodes}
+        ids = {}
+        for node in nodes:
+            ids[node] = len(ids)
+        parents = array('q', [-1] * len(nodes))
+        child_offsets = array('q', [0 if self.intern else 1])
+        child_ids = array('q')
+        # the root's entry is unused unless the snapshot is interned
+        key_column = (array('B', [0] * (not self.intern)),
+                      array('q', [0] * (not self.intern)))
+        for node in nodes:
+            for tag, payload in keys[node]:
+                key_column[0].append(tag)
+                key_column[1].append(payload)
+            node_children = [ids[child] for child in children[node]]
+            for i in node_children:
+                if parents[i] < 0:
+                    parents[i] = ids[node]
+            if self.intern:
+                child_ids.extend(node_children)
+            child_offsets.append(child_offsets[-1] + len(node_children))
+        names = array('B'), array('q')
+        columns = {}
+        for i, node in enumerate(nodes):
+            (tag, payload), attrs = encoded[node]
+            names[0].append(tag)
+            names[1].append(payload)
+            for name, tag, payload in attrs:
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = (array('B', bytes(len(nodes))),
+                                              array('q', [0]) * len(nodes))
+                column[0][i] = tag
+                column[1][i] = payload
+        column_names = array('q', map(self.__string, columns))
+        meta = array('q', [len(nodes), len(columns), 0, 0,
+                           self.__string(keyname)])
+        string_offsets, string_data = _table(
+            [s.encode() for s in self.strings])
+        blob_offsets, blob_data = _table(list(self.blobs))
+        meta[2], meta[3] = len(self.strings), len(self.blobs)
+        file.write(MAGIC)
+        file.write(struct.pack('<4sI', _byteorder(), VERSION))
+        for data in (meta, column_names, parents, child_offsets, child_ids,
+                     *names, *key_column):
+            _write_array(file, data)
+        for tags, payloads in columns.values():
+            _write_array(file, tags)
+            _write_array(file, payloads)
+        for data in (string_offsets, string_data, blob_offsets, blob_data):
+            _write_array(file, data)
+
+    def __encode_node(self, node: SectionType, keyname: str) -> Tuple[
+            Tuple[int, int], Tuple[Tuple[str, int, int], ...]]:
+        """Return the encoded name and (name, tag, payload) attrs of node."""
+        name = self.__encode(node.__dict__.get(keyname, SectionNone))
+        attrs = tuple(sorted(
+            (k, *self.__encode(v)) for k, v in _public_attrs(node).items()
+            if v is not SectionNone))
+        return name, attrs
+
+    def __encode(self, value: Any) -> Tuple[int, int]:
+        if value is None:
+            return _NONE, 0
+        if value is SectionNone:
+            return _SECTIONNONE, 0
+        value_type = type(value)
+        if value_type is bool:
+            return _BOOL, int(value)
+        if value_type is int and _INT64_MIN <= value <= _INT64_MAX:
+            return _INT, value
+        if value_type is float:
+            return _FLOAT, struct.unpack('q', struct.pack('d', value))[0]
+        if value_type is str:
+            return _STR, self.__string(value)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        i = self.blobs.get(blob)
+        if i is None:
+            i = self.blobs[blob] = len(self.blobs)
+        return _BLOB, i
+
+    def __string(self, s: str) -> int:
+        i = self.strings.get(s)
+        if i is None:
+            i = self.strings[s] = len(self.strings)
+        return i
+
+
+class SnapshotReader:
+    """
+    Decodes nodes from a snapshot held in a buffer, such as a memory-mapped
+    file. Arrays are read in place from the buffer, so only the parts of the
+    snapshot that are read are ever paged in.
+    """
+
+    def __init__(
+            self, buffer: Union[bytes, memoryview, mmap.mmap],
+            cache_strings: bool = True
+    ) -> None:
+        """
+        Parse the array layout of the snapshot in `buffer`. If
+        `cache_strings` is True, each string is decoded only once and kept,
+        else strings are decoded every time they are read.
+        """
+        self.buffer = buffer
+        self.cache_strings = cache_strings
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not a sections snapshot.')
+        byteorder, version = struct.unpack(
+            '<4sI', view[len(MAGIC):len(MAGIC) + 8])
+        if version not in (1, 2, VERSION):
+            raise ValueError(f'Unsupported snapshot version {version}.')
+        if byteorder != _byteorder():
+            raise ValueError('Snapshot was saved with a different byte '
+                             'order than this machine uses.')
+        self.__view = view
+        self.__pos = len(MAGIC) + 8
+        meta = self.__read_array('q')
+        self.nofnodes, nofcolumns, nofstrings, nofblobs, keyname = meta
+        column_names = self.__read_array('q')
+        self.parents = self.__read_array('q')
+        self.child_offsets = self.__read_array('q')
+        # version 1 snapshots were never interned
+        self.child_ids = (self.__read_array('q') or None if version > 1
+                          else None)
+        self.names = self.__read_array('B'), self.__read_array('q')
+        # children were keyed by their names before version 3
+        self.keys = ((self.__read_array('B'), self.__read_array('q'))
+                     if version > 2 else None)
+        columns = [(self.__read_array('B'), self.__read_array('q'))
+                   for _ in range(nofcolumns)]
+        self.string_offsets = self.__read_array('q')
+        self.string_data = self.__read_array('B')
+        self.blob_offsets = self.__read_array('q')
+        self.blob_data = self.__read_array('B')
+        self.__strings: Dict[int, str] = {}
+        # child ids by key of each node, built by SectionView lookups
+        self.children_by_name: Dict[int, AnyDict] = {}
+        self.keyname = self.string(keyname)
+        self.columns = {self.string(name): column
+                        for name, column in zip(column_names, columns)}
+
+    def __read_array(self, typecode: str) -> memoryview:
+        nbytes, = struct.unpack('q', self.__view[self.__pos:self.__pos + 8])
+        start = self.__pos + 8
+        self.__pos = start + nbytes + (-nbytes % 8)
+        return self.__view[start:start + nbytes].cast(typecode)
+
+    def string(self, i: int) -> str:
+        """Return string `i` of the string table."""
+        s = self.__strings.get(i)
+        if s is None:
+            start, stop = self.string_offsets[i], self.string_offsets[i + 1]
+            s = str(self.string_data[start:stop], 'utf-8')
+            if self.cache_strings:
+                self.__strings[i] = s
+        return s
+
+    @property
+    def interned(self) -> bool:
+        """True iff nodes of the snapshot may be shared by several parents."""
+        return self.child_ids is not None
+
+    def children(self, i: int) -> Union[range, memoryview]:
+        """Return the ids of the children of node `i`."""
+        start, stop = self.child_offsets[i], self.child_offsets[i + 1]
+        if self.child_ids is None:
+            return range(start, stop)
+        return self.child_ids[start:stop]
+
+    def child_keys(self, i: int) -> List[Any]:
+        """Return the keys node `i` holds its children under."""
+        start, stop = self.child_offsets[i], self.child_offsets[i + 1]
+        if self.keys is None:
+            return [self.value(self.names, child)
+                    for child in self.children(i)]
+        return [self.value(self.keys, j) for j in range(start, stop)]
+
+    def value(self, column: Tuple[memoryview, memoryview], i: int) -> Any:
+        """
+        Return the value of node `i` in `column`, or SectionNone if node `i`
+        does not have the attribute.
+        """
+        tag = column[0][i]
+        payload = column[1][i]
+        if tag == _STR:
+            return self.string(payload)
+        elif tag == _INT:
+            return payload
+        elif tag == _ABSENT:
+            return SectionNone
+        elif tag == _FLOAT:
+            return struct.unpack('d', struct.pack('q', payload))[0]
+        elif tag == _BOOL:
+            return bool(payload)
+        elif tag == _NONE:
+            return None
+        elif tag == _SECTIONNONE:
+            return SectionNone
+        start, stop = self.blob_offsets[payload], self.blob_offsets[
+            payload + 1]
+        return pickle.loads(self.blob_data[start:stop])
+
+    def attrs(self, i: int) -> AnyDict:
+        """Return the attrs of node `i`, including its name."""
+        attrs = {self.keyname: self.value(self.names, i)}
+        for name, column in self.columns.items():
+            if column[0][i] != _ABSENT:
+                attrs[name] = self.value(column, i)
+        attrs['_Section__keyname'] = self.keyname
+        return attrs
+
+    def node(self, cls: Type[SectionType], i: int,
+             parent: SectionType = None) -> SectionType:
+        """
+        Construct node `i` of class `cls` without its children, which are
+        only read from the snapshot when they are first accessed.
+        """
+        node = type.__call__(cls, parent=parent, **self.attrs(i))
+        if self.child_offsets[i] < self.child_offsets[i + 1]:
+            node.__dict__['_Section__pending'] = (self, i)
+        return node
+
+    def add_children(self, node: SectionType, i: int) -> None:
+        """Construct and add the children of node `i` to `node`."""
+        for key, child_i in zip(self.child_keys(i), self.children(i)):
+            OrderedDict.__setitem__(node, key,
+                                    self.node(node.cls, child_i, node))
+
+
+def save(root: SectionType, path: str, intern: bool = False) -> None:
+    """Save the structure with root `root` to a snapshot file at `path`."""
+    with open(path, 'wb') as file:
+        SnapshotWriter(intern).write(root, file)
+
+
+def load(cls: Type[SectionType], path: str) -> SectionType:
+    """
+    Memory-map the snapshot file at `path` and return its root node, as an
+    instance of a new unique class inheriting `cls`.
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    reader = SnapshotReader(buffer)
+    return reader.node(lazy_class(cls), 0)
+
+
+def _breadth_first(root: SectionType) -> List[SectionType]:
+    nodes = [root]
+    i = 0
+    while i < len(nodes):
+        nodes.extend(nodes[i].values())
+        i += 1
+    return nodes
+
+
+def _interned(
+        nodes: List[SectionType], encoded: AnyDict, keys: AnyDict
+) -> Tuple[List[SectionType], Dict[SectionType, List[SectionType]]]:
+    """
+    Return the distinct subtrees of breadth-first ordered `nodes`, again in
+    breadth-first order, and the children of each, where each set of
+    identical subtrees is represented by the first one found.
+    """
+    firsts: AnyDict = {}
+    representative = {}
+    children = {}
+    # children before parents, so a node's key holds its children's ids
+    for node in reversed(nodes):
+        node_children = [representative[child] for child in node.values()]
+        key = encoded[node], keys[node], tuple(map(id, node_children))
+        representative[node] = first = firsts.setdefault(key, node)
+        if first is node:
+            children[node] = node_children
+    unique = [nodes[0]]
+    seen = {nodes[0]}
+    for node in unique:
+        for child in children[node]:
+            if child not in seen:
+                seen.add(child)
+                unique.append(child)
+    return unique, children
+
+
+def _public_attrs(node: SectionType) -> AnyDict:
+    """Return the attrs of `node` other than its name and parent."""
+    attrs = {k: v for k, v in node.__dict__.items()
+             if not k.startswith(node.cls._Section__private_prefix)}
+    attrs.pop(node._Section__keyname, None)
+    attrs.pop('parent', None)
+    return attrs
+
+
+def _table(items: List[bytes]) -> Tuple[array, bytes]:
+    offsets = array('q', [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    return offsets, b''.join(items)
+
+
+def _write_array(file: IO[bytes], data: Union[array, bytes]) -> None:
+    data = data.tobytes() if isinstance(data, array) else data
+    file.write(struct.pack('q', len(data)))
+    file.write(data)
+    file.write(b'\0' * (-len(data) % 8))
+
+
+def _byteorder() -> bytes:
+    return sys.byteorder.encode()[:4].ljust(4, b'\0')
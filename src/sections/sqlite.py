@@ -0,0 +1,592 @@
+import os
+import pickle
+import sqlite3
+from collections import Counter
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+from .gathering import forms
+from .hooks import add_change_listener
+from .lazy import LazyChildren
+from .lazy import lazy_class
+from .types import AnyDict
+from .types import SectionNone
+from .types import SectionType
+
+# Each node is identified by its path: the 8-byte big-endian positions among
+# their siblings of the node and its ancestors, from the root's children
+# down, so paths sort in depth-first order and each subtree's rows form the
+# range [path, path + _END). Positions are spaced to leave room for
+# insertions, and the largest position is never used. The key each node is
+# held under by its parent is kept in the nodes table, to find children by
+# key.
+_SCHEMA = '''
+CREATE TABLE meta (name TEXT PRIMARY KEY, value);
+CREATE TABLE nodes (
+    path BLOB PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    nofchildren INTEGER NOT NULL,
+    key,
+    keypickled INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX nodes_depth ON nodes (depth, path);
+CREATE INDEX nodes_key ON nodes (depth, key, path);
+CREATE TABLE attrs (
+    name TEXT NOT NULL,
+    path BLOB NOT NULL,
+    value,
+    pickled INTEGER NOT NULL,
+    PRIMARY KEY (name, path)
+) WITHOUT ROWID;
+CREATE INDEX attrs_path ON attrs (path);
+'''
+_POSITION_SIZE = 8
+_GAP = 2 ** 32
+_LAST_POSITION = 2 ** 64 - 1
+_END = _LAST_POSITION.to_bytes(_POSITION_SIZE, 'big')
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class StoredChildren(LazyChildren):
+    """
+    Mixin for the class of a structure stored in a SQLite database. A node's
+    children are paged in from the database when they are first accessed,
+    and attributes gathered from a node's descendants are read with one
+    indexed range query, without paging them in.
+    """
+
+    def _get_nearest_attr(self, name: str) -> AnyDict:
+        """See :meth:`Section._get_nearest_attr`."""
+        path = self.__dict__.get('_Section__store_path')
+        if path is None:
+            return super()._get_nearest_attr(name)
+        attrs = self._SectionAttrParser__get_self_attr(name)
+        if attrs is not SectionNone:
+            return attrs
+        if ('_Section__pending' not in self.__dict__
+                and not OrderedDict.__len__(self)):
+            return {}
+        cache = (self.__dict__.get('_SectionAttrParser__cache')
+                 if self.use_cache else None)
+        if cache is not None:
+            attrs = cache.get(name, SectionNone)
+        if attrs is SectionNone:
+            attrs = self.cls._Section__store.gather(self, path, name)
+            if cache is not None:
+                cache[name] = attrs
+        return attrs
+
+    def graft(self, name: Any, subtree: SectionType) -> SectionType:
+        """
+        See :meth:`Section.graft <Section.graft>`. The ancestors of
+        `subtree` are kept paged in until it is moved, so that paging in
+        self's children cannot evict the page holding it.
+        """
+        if '_Section__store_path' not in self.__dict__:
+            return super().graft(name, subtree)
+        store = self.cls._Section__store
+        with store._SqliteStore__pinned(subtree.__dict__.get('parent')):
+            return super().graft(name, subtree)
+
+    def _SectionDict__index_remove(self, child: SectionType) -> None:
+        """
+        Called for each child being removed from self. Unless it is only
+        being moved within the structure, read the rest of it first, before
+        its rows are deleted.
+        """
+        super()._SectionDict__index_remove(child)
+        if (child.__dict__.get('parent') is self
+                and '_Section__store_path' in child.__dict__
+                and '_Section__silenced' not in self.__dict__):
+            self.cls._Section__store.detach(child)
+
+
+class StoredNode:
+    """
+    Stands in for a node whose attribute was gathered from the database, so
+    that gathering does not page in the nodes it reads from.
+    """
+
+    __slots__ = ('store', 'path')
+
+    def __init__(self, store: 'SqliteStore', path: bytes) -> None:
+        self.store = store
+        self.path = path
+
+    @property
+    def name(self) -> Any:
+        """The name of the node."""
+        return self.store.attr(self.path, self.store.keyname)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, StoredNode) and other.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} {self.path.hex()}>'
+
+
+class SqliteStore:
+    """
+    A structure kept in a SQLite database saved by :meth:`Section.save_sqlite
+    <Section.save_sqlite>`, with a table of nodes keyed by their paths and a
+    table of attributes indexed by both name and path. Its :attr:`root` is a
+    node of a new unique class whose nodes' children are paged in from the
+    database when first accessed, and evicted again, least recently paged in
+    first, while more than `cache_budget` nodes are paged in. Nodes kept from
+    before their eviction stay usable, but are no longer part of the loaded
+    structure, whose evicted parts are paged in again as new nodes.
+
+    Changes made to the structure are written through to the database as
+    they are made, and committed in transactions of `batch_size` changes, at
+    the end of a :meth:`batch <SqliteStore.batch>`, or by :meth:`commit
+    <SqliteStore.commit>`. Subtrees removed from the structure are read in
+    full before their rows are deleted, so they stay usable on their own.
+    """
+
+    def __init__(self, cls: Type[SectionType], path: str,
+                 cache_budget: int = 100000, batch_size: int = 1000) -> None:
+        """Open the structure saved to the SQLite database at `path`."""
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.cache_budget = cache_budget
+        self.batch_size = batch_size
+        self.keyname, = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'keyname'").fetchone()
+        self.cls = lazy_class(cls, StoredChildren)
+        self.cls._Section__store = self
+        # paged in nodes and their numbers of children, least recent first
+        self.__pages: Dict[SectionType, int] = OrderedDict()
+        self.__nofloaded = 0
+        # ids of the nodes whose pages must not be evicted for now
+        self.__pins: Counter = Counter()
+        self.__nofwrites = 0
+        self.__in_batch = False
+        nofchildren, = self.connection.execute(
+            "SELECT nofchildren FROM nodes WHERE path = x''").fetchone()
+        self.root = self.__node(b'', self.__attrs(b''), nofchildren, None)
+        add_change_listener(self.cls, self.__write)
+
+    def close(self) -> None:
+        """Commit any changes and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self) -> 'SqliteStore':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def commit(self) -> None:
+        """Commit the changes written so far."""
+        self.connection.commit()
+        self.__nofwrites = 0
+
+    @contextmanager
+    def batch(self) -> Iterator[SectionType]:
+        """
+        Context manager for changing the structure, yielding its root, whose
+        changes are committed together in one transaction on exit.
+        """
+        self.__in_batch = True
+        try:
+            yield self.root
+        finally:
+            self.__in_batch = False
+            self.commit()
+
+    @property
+    def nofloaded(self) -> int:
+        """The number of nodes currently paged in, besides the root."""
+        return self.__nofloaded
+
+    def attr(self, path: bytes, name: str) -> Any:
+        """Return attribute `name` of the node at `path` if it has it."""
+        row = self.connection.execute(
+            'SELECT value, pickled FROM attrs WHERE name = ? AND path = ?',
+            (name, path)).fetchone()
+        return SectionNone if row is None else _decode(*row)
+
+    def gather(self, node: SectionType, path: bytes, name: str) -> AnyDict:
+        """
+        Return attribute `name`, in any of its plural/singular forms, from
+        the nearest descendants that have it of `node`, the node at `path`.
+        """
+        names = forms(name, node.use_pluralsingular)
+        rank = {form: i for i, form in enumerate(names)}
+        rows = self.connection.execute(
+            f'SELECT path, name, value, pickled FROM attrs '
+            f'WHERE name IN ({", ".join("?" * len(names))}) '
+            f'AND path > ? AND path < ? ORDER BY path',
+            (*names, path, path + _END))
+        found = {}
+        found_path = found_rank = None
+        for row_path, row_name, value, pickled in rows:
+            if found_path is not None and row_path.startswith(found_path):
+                # another form found on the same node, or a descendant
+                if row_path == found_path and rank[row_name] < found_rank:
+                    found_rank = rank[row_name]
+                    found[StoredNode(self, row_path)] = _decode(value,
+                                                                pickled)
+                continue
+            found_path, found_rank = row_path, rank[row_name]
+            found[StoredNode(self, row_path)] = _decode(value, pickled)
+        return found
+
+    def add_children(self, node: SectionType, path: bytes) -> None:
+        """Page in the children of `node`, the node at `path`."""
+        self.__read_children(node, path)
+        self.__paged_in(node, OrderedDict.__len__(node))
+
+    def __read_children(self, node: SectionType, path: bytes) -> None:
+        rows = self.connection.execute(
+            'SELECT n.path, n.nofchildren, n.key, n.keypickled, a.name, '
+            'a.value, a.pickled '
+            'FROM nodes n LEFT JOIN attrs a ON a.path = n.path '
+            'WHERE n.depth = ? AND n.path > ? AND n.path < ? ORDER BY n.path',
+            (len(path) // _POSITION_SIZE + 1, path, path + _END))
+        children = OrderedDict()
+        for (child_path, nofchildren, key, keypickled,
+             name, value, pickled) in rows:
+            attrs = children.setdefault(
+                child_path, (nofchildren, key, keypickled, {}))[3]
+            if name is not None:
+                attrs[name] = _decode(value, pickled)
+        for child_path, (nofchildren, key, keypickled,
+                         attrs) in children.items():
+            child = self.__node(child_path, attrs, nofchildren, node)
+            OrderedDict.__setitem__(node, _decode(key, keypickled), child)
+
+    def __node(self, path: bytes, attrs: AnyDict, nofchildren: int,
+               parent: Optional[SectionType]) -> SectionType:
+        attrs['_Section__keyname'] = self.keyname
+        node = type.__call__(self.cls, parent=parent, **attrs)
+        node.__dict__['_Section__store_path'] = path
+        if nofchildren:
+            node.__dict__['_Section__pending'] = (self, path)
+        return node
+
+    def __attrs(self, path: bytes) -> AnyDict:
+        return {name: _decode(value, pickled)
+                for name, value, pickled in self.connection.execute(
+                    'SELECT name, value, pickled FROM attrs WHERE path = ?',
+                    (path,))}
+
+    def __paged_in(self, node: SectionType, nofchildren: int) -> None:
+        """
+        Record that the children of `node` were paged in, then evict the
+        least recently paged in nodes' children while over budget. A node's
+        ancestors count as paged in again along with it, so nodes are
+        evicted before their ancestors, and never along with `node`.
+        """
+        ancestors = []
+        parent = node.__dict__.get('parent')
+        while parent is not None:
+            ancestors.append(parent)
+            parent = parent.__dict__.get('parent')
+        for ancestor in reversed(ancestors):
+            if ancestor in self.__pages:
+                self.__pages.move_to_end(ancestor)
+        self.__pages[node] = nofchildren
+        self.__nofloaded += nofchildren
+        kept = {id(node), *map(id, ancestors), *self.__pins}
+        while self.__nofloaded > self.cache_budget:
+            page = next((page for page in self.__pages
+                         if id(page) not in kept), None)
+            if page is None:
+                break
+            self.__evict(page)
+
+    @contextmanager
+    def __pinned(self, node: Optional[SectionType]) -> Iterator[None]:
+        """Keep the pages of `node` and its ancestors paged in within."""
+        ids = []
+        while node is not None:
+            ids.append(id(node))
+            node = node.__dict__.get('parent')
+        self.__pins.update(ids)
+        try:
+            yield
+        finally:
+            self.__pins.subtract(ids)
+            self.__pins += Counter()
+
+    def __evict(self, page: SectionType) -> None:
+        """Drop the children of `page`, to be paged in again when needed."""
+        for node in _loaded_nodes(page):
+            self.__nofloaded -= self.__pages.pop(node, 0)
+        OrderedDict.clear(page)
+        page.__dict__['_Section__pending'] = (
+            self, page.__dict__['_Section__store_path'])
+        # gathered attributes are cached by path, so only the caches
+        # holding the evicted nodes are dropped
+        node = page
+        while node is not None:
+            node._SectionNode__invalidate_structure_caches()
+            parent = node.__dict__.get('parent')
+            if parent is None:
+                node.__dict__.pop('_Section__index', None)
+                ancestry = node.__dict__.get('_Section__ancestry')
+                if ancestry is not None:
+                    ancestry.stale = True
+            node = parent
+
+    def detach(self, subtree: SectionType) -> None:
+        """
+        Read the rest of `subtree`, being removed from the structure, from
+        the database, leaving it an ordinary subtree no longer stored there.
+        """
+        stack = [subtree]
+        while stack:
+            node = stack.pop()
+            self.__nofloaded -= self.__pages.pop(node, 0)
+            path = node.__dict__.pop('_Section__store_path', None)
+            if node.__dict__.pop('_Section__pending', None) is not None:
+                self.__read_children(node, path)
+            stack.extend(OrderedDict.values(node))
+
+    def __write(self, node: SectionType, change: Tuple[Any, ...]) -> None:
+        """Called after `node` is changed. Write the change through."""
+        path = node.__dict__.get('_Section__store_path')
+        if path is None:
+            return
+        op, *args = change
+        execute = self.connection.execute
+        if op == 'setattr':
+            name, value = args
+            execute('INSERT OR REPLACE INTO attrs VALUES (?, ?, ?, ?)',
+                    (name, path, *_encode(value)))
+        elif op == 'delattr':
+            names = forms(args[0])
+            execute(f'DELETE FROM attrs WHERE path = ? AND name IN '
+                    f'({", ".join("?" * len(names))})', (path, *names))
+        elif op == 'setitem' or op == 'graft' and args[2] is None:
+            self.__add_child(node, path, *args[:2])
+        elif op == 'insert':
+            self.__add_child(node, path, *args[1:])
+        elif op == 'graft':
+            self.__move_child(node, path, *args[:2])
+        elif op == 'delitem':
+            child_path = self.__child_path(path, args[0])
+            if child_path is not None:
+                self.__delete(child_path)
+                self.__count_children(path, -1)
+        elif op == 'clear':
+            self.__delete(path, subtree=False)
+            execute('UPDATE nodes SET nofchildren = 0 WHERE path = ?', (path,))
+        elif op == 'move_to_end':
+            child = OrderedDict.__getitem__(node, args[0])
+            self.__move(child, path + self.__position(node, child))
+        self.__nofwrites += 1
+        if not self.__in_batch and self.__nofwrites >= self.batch_size:
+            self.commit()
+
+    def __add_child(self, node: SectionType, path: bytes, key: Any,
+                    child: SectionType) -> None:
+        """Write the subtree `child`, just added to `node` as `key`."""
+        child_path = self.__child_path(path, key)
+        if child_path is None:
+            child_path = path + self.__position(node, child)
+            self.__count_children(path, 1)
+        else:
+            self.__delete(child_path)
+        _insert(self.connection, *_rows(child, child_path, key))
+
+    def __move_child(self, node: SectionType, path: bytes, key: Any,
+                     child: SectionType) -> None:
+        """Move the rows of `child`, just grafted onto `node` as `key`."""
+        old_path = child.__dict__['_Section__store_path']
+        self.__count_children(old_path[:-_POSITION_SIZE], -1)
+        replaced = self.__child_path(path, key)
+        if replaced is not None and replaced != old_path:
+            self.__delete(replaced)
+            new_path = replaced
+        else:
+            new_path = path + self.__position(node, child)
+            self.__count_children(path, 1)
+        self.__move(child, new_path)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO attrs VALUES (?, ?, ?, ?)',
+            (self.keyname, new_path, *_encode(key)))
+        self.connection.execute(
+            'UPDATE nodes SET key = ?, keypickled = ? WHERE path = ?',
+            (*_encode(key), new_path))
+
+    def __position(self, node: SectionType, child: SectionType) -> bytes:
+        """
+        Return a position for `child` between those of its siblings before
+        and after it in `node`, first spreading out the positions of its
+        siblings if there is no room left between them.
+        """
+        before, after = self.__neighbours(node, child)
+        if after - before < 2:
+            self.__renumber(node, child)
+            before, after = self.__neighbours(node, child)
+        if after - before > 2 * _GAP:
+            return _position(before + _GAP)
+        return _position((before + after) // 2)
+
+    def __neighbours(self, node: SectionType,
+                     child: SectionType) -> Tuple[int, int]:
+        """
+        Return the positions of the siblings before and after `child` in
+        `node`, or 0 and the last position at either end. Children are most
+        often added at the end, which is found without listing the others.
+        """
+        siblings = reversed(OrderedDict.values(node))
+        if next(siblings) is child:
+            return _stored_position(next(siblings, None), 0), _LAST_POSITION
+        siblings = list(OrderedDict.values(node))
+        i = siblings.index(child)
+        return (_stored_position(siblings[i - 1] if i else None, 0),
+                _stored_position(siblings[i + 1], _LAST_POSITION))
+
+    def __renumber(self, node: SectionType, skip: SectionType) -> None:
+        """Spread out the positions of the children of `node`."""
+        path = node.__dict__['_Section__store_path']
+        siblings = {id(child): child for child in OrderedDict.values(node)
+                    if child is not skip
+                    and '_Section__store_path' in child.__dict__}
+        # moved out of the way first, so no new path is still in use
+        for child in siblings.values():
+            self.__move(child, path + _END + child.__dict__[
+                '_Section__store_path'][-_POSITION_SIZE:])
+        for i, child in enumerate(OrderedDict.values(node), 1):
+            if id(child) in siblings:
+                self.__move(child, path + _position(2 * i * _GAP))
+
+    def __move(self, child: SectionType, new_path: bytes) -> None:
+        """Move the rows of the subtree `child` to `new_path`."""
+        old_path = child.__dict__['_Section__store_path']
+        if old_path == new_path:
+            return
+        depth_change = (len(new_path) - len(old_path)) // _POSITION_SIZE
+        args = (new_path, len(old_path) + 1, old_path, old_path + _END)
+        # blobs are concatenated as text, so cast back
+        self.connection.execute(
+            'UPDATE nodes SET path = CAST(? || substr(path, ?) AS BLOB), '
+            f'depth = depth + {depth_change} '
+            'WHERE path >= ? AND path < ?', args)
+        self.connection.execute(
+            'UPDATE attrs SET path = CAST(? || substr(path, ?) AS BLOB) '
+            'WHERE path >= ? AND path < ?', args)
+        for node in _loaded_nodes(child):
+            node_path = new_path + node.__dict__['_Section__store_path'][
+                len(old_path):]
+            node.__dict__['_Section__store_path'] = node_path
+            if '_Section__pending' in node.__dict__:
+                node.__dict__['_Section__pending'] = (self, node_path)
+
+    def __delete(self, path: bytes, subtree: bool = True) -> None:
+        """Delete the rows of the subtree at `path`, or of its descendants."""
+        for table in ('nodes', 'attrs'):
+            self.connection.execute(
+                f'DELETE FROM {table} WHERE path {">=" if subtree else ">"} ? '
+                f'AND path < ?', (path, path + _END))
+
+    def __count_children(self, path: bytes, change: int) -> None:
+        self.connection.execute(
+            'UPDATE nodes SET nofchildren = nofchildren + ? WHERE path = ?',
+            (change, path))
+
+    def __child_path(self, path: bytes, key: Any) -> Optional[bytes]:
+        """Return the path of child `key` of the node at `path`, if stored."""
+        row = self.connection.execute(
+            'SELECT path FROM nodes WHERE depth = ? AND key = ? '
+            'AND path > ? AND path < ?',
+            (len(path) // _POSITION_SIZE + 1, _encode(key)[0], path,
+             path + _END)).fetchone()
+        return None if row is None else row[0]
+
+
+def save(root: SectionType, path: str) -> None:
+    """See :meth:`Section.save_sqlite <Section.save_sqlite>`."""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executescript(_SCHEMA)
+        connection.execute("INSERT INTO meta VALUES ('keyname', ?)",
+                           (root._Section__keyname,))
+        _insert(connection, *_rows(root, b''))
+    connection.close()
+
+
+def _rows(
+        subtree: SectionType, path: bytes, key: Any = None
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
+    """
+    Return the rows of the nodes and attrs tables for `subtree` stored at
+    `path`, held under `key` by its parent, noting each node's path on it if
+    it belongs to a stored class.
+    """
+    stored = '_Section__store' in subtree.cls.__dict__
+    prefix = subtree.cls._Section__private_prefix
+    nodes, attrs = [], []
+    stack = [(subtree, path, key)]
+    while stack:
+        node, node_path, node_key = stack.pop()
+        if stored:
+            node.__dict__['_Section__store_path'] = node_path
+        children = list(node.items())
+        nodes.append((node_path, len(node_path) // _POSITION_SIZE,
+                      len(children), *_encode(node_key)))
+        attrs.extend((name, node_path, *_encode(value))
+                     for name, value in node.__dict__.items()
+                     if name != 'parent' and not name.startswith(prefix))
+        stack.extend((child, node_path + _position(i * _GAP), child_key)
+                     for i, (child_key, child) in enumerate(children, 1))
+    return nodes, attrs
+
+
+def _insert(connection: sqlite3.Connection, nodes: List[Tuple[Any, ...]],
+            attrs: List[Tuple[Any, ...]]) -> None:
+    connection.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?)', nodes)
+    connection.executemany('INSERT INTO attrs VALUES (?, ?, ?, ?)', attrs)
+
+
+def _loaded_nodes(node: SectionType) -> Iterator[SectionType]:
+    """Iterate over `node` and its descendants that are paged in."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(OrderedDict.values(node))
+
+
+def _stored_position(node: Optional[SectionType], default: int) -> int:
+    """Return the position of `node` among its siblings if it is stored."""
+    path = None if node is None else node.__dict__.get('_Section__store_path')
+    if path is None:
+        return default
+    return int.from_bytes(path[-_POSITION_SIZE:], 'big')
+
+
+def _position(position: int) -> bytes:
+    return position.to_bytes(_POSITION_SIZE, 'big')
+
+
+def _encode(value: Any) -> Tuple[Union[int, float, str, bytes, None], int]:
+    """
+    Return `value` as stored in the attrs table, and whether it is pickled.
+    Numbers, strings and None are stored as they are, other values pickled.
+    """
+    value_type = type(value)
+    if value is None or value_type is float or value_type is str or (
+            value_type is int and _INT64_MIN <= value <= _INT64_MAX):
+        return value, 0
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL), 1
+
+
+def _decode(value: Any, pickled: int) -> Any:
+    return pickle.loads(value) if pickled else value
@@ -0,0 +1,123 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any
+from typing import AsyncIterable
+from typing import Dict
+from typing import Generator
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Sequence
+from typing import Tuple
+from typing import Type
+
+from .hooks import before_change
+from .hooks import changed
+from .index import index_add
+from .index import index_remove
+from .types import SectionNone
+from .types import SectionType
+
+
+class StreamBuilder:
+    """
+    Builds a structure from an async iterable of records, as returned by
+    :meth:`Section.abuild <Section.abuild>`. Awaiting the builder inserts the
+    records as they arrive, in chunks of `chunk_size` records, and returns
+    the structure's root. The root is available from :attr:`root` from the
+    start, and since each chunk is inserted in one step between awaits,
+    other tasks reading it always see whole chunks of records.
+    """
+
+    def __init__(
+            self,
+            cls: Type[SectionType],
+            records: AsyncIterable[Mapping[str, Any]],
+            group_by: Sequence[str] = (),
+            chunk_size: int = 1000,
+            **kwds: Any,
+    ) -> None:
+        """
+        Start a structure whose root has attrs `kwds`, in a new unique class
+        inheriting `cls`, to be built from `records`.
+        """
+        unique_cls = type(cls.__name__, (cls,), {
+            '__doc__': 'Unique Section class creation.',
+            '__module__': cls.__module__,
+        })
+        self.root = unique_cls(**kwds)
+        self.group_by = tuple(group_by)
+        self.chunk_size = chunk_size
+        self.__records = records
+
+    def __await__(self) -> Generator[Any, None, SectionType]:
+        return self.run().__await__()
+
+    async def run(self) -> SectionType:
+        """
+        Insert all the records, yielding to the event loop after each chunk,
+        and return the root.
+        """
+        chunk = []
+        async for record in self.__records:
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                self.insert(chunk)
+                chunk = []
+                await asyncio.sleep(0)
+        if chunk:
+            self.insert(chunk)
+        return self.root
+
+    def insert(self, records: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Insert `records` as leaves, each under the path of group nodes named
+        by its values of the :attr:`group_by` attrs, creating missing groups.
+        Each record's attrs are set on its leaf as they are, and a leaf is
+        named by the record's name, if it has one, else by its position.
+        Caches are invalidated, and hooks and listeners called, once per
+        changed node for all the records.
+        """
+        root = self.root
+        cls = root.cls
+        keyname = root._Section__keyname
+        # children added to nodes that existed before these records
+        added: List[Tuple[SectionType, Any, SectionType]] = []
+        parents: Dict[SectionType, None] = {}
+        new = set()
+
+        def add(parent: SectionType, key: Any, child: SectionType) -> None:
+            if id(parent) not in new:
+                if parent not in parents:
+                    before_change(parent)
+                    parents[parent] = None
+                replaced = OrderedDict.get(parent, key)
+                if replaced is not None and id(replaced) not in new:
+                    index_remove(replaced)
+                added.append((parent, key, child))
+            OrderedDict.__setitem__(parent, key, child)
+            new.add(id(child))
+
+        for record in records:
+            node = root
+            for attr in self.group_by:
+                key = record[attr]
+                group = OrderedDict.get(node, key)
+                if group is None:
+                    group = type.__call__(cls, parent=node, **{
+                        keyname: key, '_Section__keyname': keyname})
+                    add(node, key, group)
+                node = group
+            leaf = type.__call__(cls, parent=node,
+                                 _Section__keyname=keyname)
+            # set as they are, unlike list values passed to sections()
+            leaf.__dict__.update(record)
+            key = leaf.__dict__.get(keyname, SectionNone)
+            if key is SectionNone:
+                key = leaf.__dict__[keyname] = OrderedDict.__len__(node)
+            add(node, key, leaf)
+        root._children_changed(parents)
+        for parent, key, child in added:
+            if OrderedDict.get(parent, key) is child:
+                index_add(child)
+                changed(parent, 'setitem', key, child)
@@ -1,6 +1,16 @@
+import sys
+from io import StringIO
+from itertools import islice
+from typing import IO
 from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 
+from .types import AnyDict
 from .types import SectionNone
+from .types import SectionType
 
 
 class SectionStringParser:
@@ -28,9 +38,42 @@ class SectionStringParser:
     def node_str(self) -> str:
         """
         Neatly print the public attributes of the Section node and its class,
-        as well as its types property output.
+        as well as its types property output. If self uses the render cache,
+        the output is kept until one of self's attributes is set or deleted.
         """
-        return self.__node_str()
+        if not self.use_render_cache:
+            return self.__node_str()
+        render_cache = self.__render_cache()
+        s = render_cache.get('node_str')
+        if s is None:
+            s = render_cache['node_str'] = self.__node_str()
+        return s
+
+    def __render_cache(self) -> AnyDict:
+        """
+        Return the dict in self holding its cached node_str output, its box's
+        width when rendered with no limits, and its full descendants_str
+        output.
+        """
+        render_cache = self.__dict__.get('_Section__render')
+        if render_cache is None:
+            render_cache = self.__dict__['_Section__render'] = {}
+        return render_cache
+
+    def __invalidate_render_cache(self, node_changed: bool) -> None:
+        """
+        Drop self's cached box width and descendants_str output, and also its
+        node_str output if `node_changed`. Called for every node from a
+        changed node up to the root by Section.__invalidate_caches, so that
+        only boxes along that path are measured and formatted again.
+        """
+        render_cache = self.__dict__.get('_Section__render')
+        if render_cache is not None:
+            if node_changed:
+                del self.__dict__['_Section__render']
+            else:
+                render_cache.pop('widths', None)
+                render_cache.pop('str', None)
 
     def __node_str(self) -> str:
         section_name = (
@@ -62,54 +105,269 @@ class SectionStringParser:
         pad = ' ' * (longest_line_len - len(name))
         return f'{name}' + pad + ' = ' + value + '\n'
 
-    def descendants_str(self) -> str:
+    def descendants_str(
+            self,
+            max_depth: Optional[int] = SectionNone,
+            max_children: Optional[int] = SectionNone,
+            max_width: Optional[int] = SectionNone,
+            elision: str = '...',
+    ) -> str:
         """
         Print the output of :meth:`node_str <Section.node_str` for self and all
-        of its descendants.
+        of its descendants. See :meth:`render <Section.render>` for the
+        parameters. If self uses the render cache, output with no limits is
+        kept until self or one of its descendants changes.
+        """
+        limits = self.__str_limits(max_depth, max_children, max_width)
+        use_cache = self.use_render_cache and limits == (None, None, None)
+        if use_cache:
+            s = self.__render_cache().get('str')
+            if s is not None:
+                return s
+        out = StringIO()
+        out.write('\n')
+        _BoxRenderer(*limits, elision).render(self, out)
+        s = out.getvalue()
+        if use_cache:
+            self.__render_cache()['str'] = s
+        return s
 
-        :param breadthfirst: Set True to print descendants in a breadth-first
-               pattern or False for depth-first.
+    def render(
+            self,
+            file: Optional[IO[str]] = None,
+            max_depth: Optional[int] = SectionNone,
+            max_children: Optional[int] = SectionNone,
+            max_width: Optional[int] = SectionNone,
+            elision: str = '...',
+    ) -> None:
         """
-        return '\n' + self.__descendants_str()
+        Write the output of :meth:`node_str <Section.node_str` for self and
+        all of its descendants to `file`, each in a box nested inside its
+        parent's box. Lines are written as soon as they are complete, so the
+        rendered text is never held in memory. Time taken is linear in the
+        size of the output.
 
-    def __descendants_str(
-            self, depth: int = 0, prev_depths_s: str = '',
-            prev_header_len: int = 0,
-    ) -> str:
+        :param file: File-like object to write to. Defaults to sys.stdout.
+
+        :param max_depth: Children of nodes `max_depth` levels below self are
+                          not rendered. Defaults to the structure-wide class
+                          attribute `str_max_depth`. None means no limit.
+
+        :param max_children: Only the first `max_children` children of each
+                             node are rendered. Defaults to the structure-wide
+                             class attribute `str_max_children`. None means no
+                             limit.
+
+        :param max_width: Lines are no longer than `max_width` characters.
+                          Node attribute lines that are too long are clipped,
+                          and children too deeply nested to fit are not
+                          rendered. Defaults to the structure-wide class
+                          attribute `str_max_width`. None means no limit.
+
+        :param elision: Marker ending clipped lines, and starting the line
+                        that counts a node's children that were not rendered.
         """
-        Private recursive call for
-        :meth:`descendants_str <Section.descendants_str`.
+        if file is None:
+            file = sys.stdout
+        limits = self.__str_limits(max_depth, max_children, max_width)
+        _BoxRenderer(*limits, elision).render(self, file)
+
+    def __str_limits(
+            self,
+            max_depth: Optional[int],
+            max_children: Optional[int],
+            max_width: Optional[int],
+    ) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """Fill in rendering limits not given with the class defaults."""
+        if max_depth is SectionNone:
+            max_depth = self.str_max_depth
+        if max_children is SectionNone:
+            max_children = self.str_max_children
+        if max_width is SectionNone:
+            max_width = self.str_max_width
+        return max_depth, max_children, max_width
+
+
+class _BoxRenderer:
+    """
+    Renders a structure as nested boxes in two passes. The first measures
+    the width of each box bottom-up, since a box is as wide as its widest
+    descendant. The second writes each line out top-down, prefixed and
+    suffixed by the sides of all the boxes it is nested in. When rendering
+    with no limits and the render cache, box widths are kept in each node's
+    cache, so that the first pass only measures boxes that changed since the
+    last rendering.
+    """
+
+    def __init__(
+            self,
+            max_depth: Optional[int],
+            max_children: Optional[int],
+            max_width: Optional[int],
+            elision: str,
+    ) -> None:
+        self.max_depth = max_depth
+        self.max_children = max_children
+        self.max_width = max_width
+        self.elision = elision
+        self.use_cache = (max_depth is None and max_children is None
+                          and max_width is None)
+        # box widths measured in this rendering by node id and depth
+        self.widths: Dict[Tuple[int, int], int] = {}
+
+    def render(self, root: SectionType, file: IO[str]) -> None:
+        # 4 for the sides of the root's box
+        budget = None if self.max_width is None else self.max_width - 4
+        self.__measure(root, 0, budget)
+        self.__write(root, budget, file)
+
+    def __contents(
+            self, node: SectionType, depth: int, budget: Optional[int]
+    ) -> Tuple[List[str], List[SectionType], Optional[str], str,
+               Optional[int]]:
         """
-        s = ''
-        s += self.__node_str()
-        lpad = '' if depth == 0 else '  '
-        if depth == 1 and prev_depths_s == '':
-            lpad = ''
-        cur_depths_s = s
-        for i, child in enumerate(self.values()):
-            s += child.__descendants_str(
-                depth + 1, cur_depths_s)
-        s = self.__get_box_str(s, lpad)
-        return s
+        Return the lines of node's own attributes, the children to render
+        inside node's box, the elision line for children that are not
+        rendered, and the left padding and width budget of the children's
+        boxes.
+        """
+        node_str = node.node_str()
+        lines = node_str[:-1].split('\n') if node_str else []
+        # children of a root with no name or attrs line up with the root
+        child_lpad = '' if depth == 0 and not node_str else '  '
+        child_budget = (None if budget is None
+                        else budget - len(child_lpad) - 4)
+        nofchildren = nofshown = len(node)
+        if self.max_depth is not None and depth >= self.max_depth:
+            nofshown = 0
+        if child_budget is not None and child_budget <= len(self.elision):
+            nofshown = 0
+        if self.max_children is not None:
+            nofshown = min(nofshown, self.max_children)
+        children = list(islice(node.values(), nofshown))
+        elision = None
+        if nofshown < nofchildren:
+            elision = f'{self.elision} {nofchildren - nofshown} more'
+        if budget is not None:
+            lines = [self.__clip(line, budget) for line in lines]
+            if elision is not None:
+                elision = self.__clip(elision, budget)
+        return lines, children, elision, child_lpad, child_budget
 
-    def __get_box_str(self, s: str, lpad: str) -> str:
-        header_len = 0
-        for line in s[:-1].split('\n'):
-            if len(line) > header_len:
-                header_len = len(line)
-        lpad = lpad + '│ '
-        lines = []
-        for line in s[:-1].split('\n'):
-            rpad_len = header_len - len(line)
-            rpad = ' ' * rpad_len + ' '
-            # if self.isparent:
-            # rpad += ' '
-            rpad += '│'
-            lines.append(lpad + line + rpad)
-        s = '\n'.join(lines) + '\n'
-        # header_len += 3 if self.isparent else 2
-        header_len += 2
-        top_header = lpad[:-2] + ' ' + '_' * header_len + '\n'
-        bottom_header = lpad[:-2] + ' ' + '¯' * header_len + '\n'
-        s = top_header + s + bottom_header
-        return s
+    def __clip(self, line: str, width: int) -> str:
+        if len(line) <= width:
+            return line
+        if width > len(self.elision):
+            return line[:width - len(self.elision)] + self.elision
+        return line[:max(width, 0)]
+
+    def __width(
+            self, node: SectionType, depth: int, budget: Optional[int]
+    ) -> int:
+        """Return the width of the contents of node's box."""
+        width = self.widths.get((id(node), depth))
+        if width is None:
+            width = self.__cached_width(node, depth)
+        if width is None:
+            self.__measure(node, depth, budget)
+            width = self.widths[(id(node), depth)]
+        return width
+
+    def __cached_width(self, node: SectionType, depth: int) -> Optional[int]:
+        if self.use_cache and node.use_render_cache:
+            render_cache = node._SectionStringParser__render_cache()
+            # the root's box width differs if it has no name or attrs
+            return render_cache.get('widths', {}).get(depth == 0)
+        return None
+
+    def __measure(
+            self, root: SectionType, depth: int, budget: Optional[int]
+    ) -> None:
+        """
+        Find the width of the contents of each box, skipping the subtrees of
+        boxes whose width is already cached. Each stack entry holds the
+        widest line found so far in its node's box until all of the node's
+        children's boxes are measured.
+        """
+        stack = [[root, depth, budget, '', None, 0, False]]
+        while stack:
+            entry = stack[-1]
+            node, depth, budget, lpad, parent_entry, width, expanded = entry
+            if not expanded:
+                width = self.__cached_width(node, depth)
+                if width is None:
+                    lines, children, elision, child_lpad, child_budget = (
+                        self.__contents(node, depth, budget))
+                    if elision is not None:
+                        lines.append(elision)
+                    entry[5] = max(map(len, lines), default=0)
+                    entry[6] = True
+                    for child in reversed(children):
+                        stack.append([child, depth + 1, child_budget,
+                                      child_lpad, entry, 0, False])
+                    continue
+            else:
+                self.widths[(id(node), depth)] = width
+                if self.use_cache and node.use_render_cache:
+                    node._SectionStringParser__render_cache().setdefault(
+                        'widths', {})[depth == 0] = width
+            stack.pop()
+            if parent_entry is not None:
+                parent_entry[5] = max(parent_entry[5], len(lpad) + width + 4)
+
+    def __write(
+            self, root: SectionType, budget: Optional[int], file: IO[str]
+    ) -> None:
+        """
+        Write every line in depth-first order. Each box is given a frame of
+        the text before and after its content lines.
+        """
+        stack = [(root, 0, budget, '', None)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item[0], str):
+                # a line left to write after the children's boxes
+                line, frame = item
+                self.__write_line(file, frame, line)
+                continue
+            node, depth, budget, lpad, parent_frame = item
+            width = self.__width(node, depth, budget)
+            lines, children, elision, child_lpad, child_budget = (
+                self.__contents(node, depth, budget))
+            if not lines and not children and elision is None:
+                lines = ['']
+            frame = self.__frame(lpad, width, parent_frame)
+            self.__write_line(
+                file, parent_frame, lpad + ' ' + '_' * (width + 2))
+            for line in lines:
+                self.__write_line(file, frame, line)
+            stack.append((lpad + ' ' + '¯' * (width + 2), parent_frame))
+            if elision is not None:
+                stack.append((elision, frame))
+            for child in reversed(children):
+                stack.append(
+                    (child, depth + 1, child_budget, child_lpad, frame))
+
+    def __frame(
+            self, lpad: str, width: int, parent_frame: Optional[Tuple]
+    ) -> Tuple[str, int, str]:
+        """
+        Return the text before a box's content lines, the width of its
+        contents, and the text after the box's right side.
+        """
+        if parent_frame is None:
+            return lpad + '│ ', width, ''
+        parent_prefix, parent_width, parent_tail = parent_frame
+        tail = (' ' * (parent_width - (len(lpad) + width + 4)) + ' │'
+                + parent_tail)
+        return parent_prefix + lpad + '│ ', width, tail
+
+    def __write_line(
+            self, file: IO[str], frame: Optional[Tuple], line: str
+    ) -> None:
+        if frame is None:
+            file.write(line + '\n')
+        else:
+            prefix, width, tail = frame
+            file.write(prefix + line + ' ' * (width - len(line)) + ' │'
+                       + tail + '\n')
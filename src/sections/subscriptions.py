@@ -0,0 +1,167 @@
+import asyncio
+from threading import Lock
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from .hooks import add_change_listener
+from .hooks import remove_change_listener
+from .pluralizer import Pluralizer
+from .types import SectionNone
+from .types import SectionType
+
+
+class Change(NamedTuple):
+    """
+    A change delivered to a :class:`Subscription <Subscription>`. `kind` is
+    one of:
+
+        'added'     child `name` of `node` was added, `value` is the child
+        'removed'   child `name` of `node` was removed, or all its children
+                    if `name` is SectionNone
+        'moved'     child `name` of `node` was moved to an end
+        'changed'   attribute `name` of `node` was set to `value`, or was
+                    deleted if `value` is SectionNone
+    """
+
+    kind: str
+    node: SectionType
+    name: Any
+    value: Any
+
+
+Callback = Callable[[List[Change]], Any]
+
+
+class Subscription:
+    """
+    A subscription to the changes made to a subtree, delivered to a callback
+    as lists of :class:`Change <Change>` events, as returned by
+    :meth:`Section.subscribe <Section.subscribe>`. With `'sync'` delivery,
+    each change is delivered as it is made. Otherwise changes are collected,
+    with repeated changes of the same attribute of a node coalesced into the
+    last one, and delivered together: with `'deferred'` delivery whenever
+    :meth:`flush <Subscription.flush>` is called, and with `'asyncio'`
+    delivery by a flush scheduled on `loop`, once for all the changes made
+    until it runs.
+    """
+
+    def __init__(
+            self,
+            subtree: SectionType,
+            callback: Callback,
+            attrs: Optional[Iterable[str]] = None,
+            delivery: str = 'sync',
+            loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        """See :meth:`Section.subscribe <Section.subscribe>`."""
+        if delivery not in ('sync', 'deferred', 'asyncio'):
+            raise ValueError(f'Unknown delivery {delivery!r}.')
+        if delivery == 'asyncio' and loop is None:
+            loop = asyncio.get_running_loop()
+        self.subtree = subtree
+        self.callback = callback
+        self.delivery = delivery
+        self.loop = loop
+        self.__attrs = None
+        if attrs is not None:
+            self.__attrs = set()
+            for name in attrs:
+                self.__attrs.update((name, *_pluralizer(name)))
+        self.__lock = Lock()
+        self.__changes: List[Change] = []
+        # positions in self.__changes of the pending attribute changes
+        self.__positions: Dict[Tuple[int, str], int] = {}
+        self.__scheduled = False
+        self.__cls = subtree.cls
+        add_change_listener(self.__cls, self.__on_change)
+
+    def close(self) -> None:
+        """Stop the subscription, dropping any changes not delivered yet."""
+        remove_change_listener(self.__cls, self.__on_change)
+        with self.__lock:
+            self.__changes = []
+            self.__positions = {}
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def flush(self) -> None:
+        """Deliver the changes collected so far, if there are any."""
+        with self.__lock:
+            changes = self.__changes
+            self.__changes = []
+            self.__positions = {}
+            self.__scheduled = False
+        if changes:
+            self.callback(changes)
+
+    def __on_change(self, node: SectionType, change: Tuple[Any, ...]) -> None:
+        """Called after `node` is changed by `change`. Collect the change."""
+        op, *args = change
+        if op == 'setattr' or op == 'delattr':
+            name = args[0]
+            if self.__attrs is not None and name not in self.__attrs:
+                return
+            changes = [Change('changed', node, name,
+                              args[1] if op == 'setattr' else SectionNone)]
+        elif op == 'setitem':
+            changes = [Change('added', node, args[0], args[1])]
+        elif op == 'insert':
+            changes = [Change('added', node, args[1], args[2])]
+        elif op == 'delitem':
+            changes = [Change('removed', node, args[0], None)]
+        elif op == 'clear':
+            changes = [Change('removed', node, SectionNone, None)]
+        elif op == 'move_to_end':
+            changes = [Change('moved', node, args[0], None)]
+        else:  # graft
+            key, child, old_parent, old_key = args
+            changes = [Change('added', node, key, child)]
+            if old_parent is not None:
+                changes.insert(0, Change('removed', old_parent, old_key, None))
+        changes = [change for change in changes if self.__within(change.node)]
+        if not changes:
+            return
+        if self.delivery == 'sync':
+            self.callback(changes)
+            return
+        with self.__lock:
+            for change in changes:
+                self.__collect(change)
+            schedule = self.delivery == 'asyncio' and not self.__scheduled
+            self.__scheduled = self.__scheduled or schedule
+        if schedule:
+            self.loop.call_soon_threadsafe(self.flush)
+
+    def __collect(self, change: Change) -> None:
+        if change.kind != 'changed':
+            self.__changes.append(change)
+            return
+        key = (id(change.node), change.name)
+        i = self.__positions.get(key)
+        if i is not None:
+            # only the last value set matters, delivered in the first place
+            self.__changes[i] = change
+        else:
+            self.__positions[key] = len(self.__changes)
+            self.__changes.append(change)
+
+    def __within(self, node: SectionType) -> bool:
+        """Return whether `node` is in the subscribed subtree."""
+        while node is not None:
+            if node is self.subtree:
+                return True
+            node = node.__dict__.get('parent')
+        return False
+
+
+_pluralizer = Pluralizer()
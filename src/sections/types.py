@@ -56,6 +56,10 @@ class SectionNoneType:
         """
         return 'sections'
 
+    def __reduce__(self) -> str:
+        """Pickle and copy SectionNone as the singleton it is."""
+        return 'SectionNone'
+
 
 # SectionNoneType instantiation, like how None is an instantiation of NoneType
 SectionNone = SectionNoneType()
@@ -0,0 +1,412 @@
+import weakref
+from collections import OrderedDict
+from collections.abc import Sequence
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from .gathering import forms
+from .gathering import gathered
+from .gathering import nearest
+from .hooks import add_change_hook
+from .hooks import remove_change_hook
+from .lazy import materialize
+from .types import AnyDict
+from .types import GetType
+from .types import SectionNone
+from .types import SectionType
+
+# a node's attrs and (key, child) pairs as of some version
+NodeState = Tuple[AnyDict, Tuple[Tuple[Any, SectionType], ...]]
+
+
+class VersionedStructure:
+    """
+    A structure whose changes are published as numbered versions, which
+    readers can keep reading consistently while the structure is changed in
+    place. Changes are made to the structure as usual, inside :meth:`batch
+    <VersionedStructure.batch>`, and each committed batch is a new version.
+    Versions share all unchanged nodes with the structure: before a node is
+    first changed after a commit, its attrs and children as of the last
+    version are recorded in its history, and readers of older versions read
+    those instead of the node's current state. Readers never take the writer
+    lock, and pinning a version is O(1). The history recorded for a version
+    is freed by the first commit after the version's last reader releases it.
+    """
+
+    def __init__(self, root: SectionType) -> None:
+        """Version the structure with root `root`, starting at version 0."""
+        self.root = root
+        self.version = 0
+        self.__writer_lock = Lock()
+        # guards pins and recorded histories, only ever held briefly
+        self.__lock = Lock()
+        self.__pins: Dict[int, int] = {}
+        self.__changed = set()
+        self.__histories = set()
+        add_change_hook(root.cls, self.__record)
+
+    def close(self) -> None:
+        """
+        Stop versioning the structure, freeing all recorded history. Versions
+        still pinned read the structure's current state from then on.
+        """
+        remove_change_hook(self.root.cls, self.__record)
+        with self.__lock:
+            for node in self.__histories:
+                del node.__dict__['_Section__history']
+            self.__histories = set()
+
+    def __enter__(self) -> 'VersionedStructure':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @contextmanager
+    def batch(self) -> Iterator[SectionType]:
+        """
+        Context manager for changing the structure, yielding its root. One
+        writer at a time enters a batch, and the batch's changes are
+        committed as one new version when it exits without an exception.
+        Changes of a failed batch are committed with the next version.
+        """
+        with self.__writer_lock:
+            yield self.root
+            self.commit()
+
+    def commit(self) -> int:
+        """
+        Publish the changes made since the last commit as a new version,
+        free the history no pinned version needs anymore, and return the new
+        version number.
+        """
+        with self.__lock:
+            self.version += 1
+            self.__changed = set()
+            self.__prune()
+        return self.version
+
+    def pin(self) -> 'Version':
+        """
+        Return the latest committed version, which stays readable unchanged
+        until it is released, either explicitly or by being garbage
+        collected.
+        """
+        with self.__lock:
+            number = self.version
+            self.__pins[number] = self.__pins.get(number, 0) + 1
+        return Version(self, number)
+
+    def __release(self, number: int) -> None:
+        with self.__lock:
+            count = self.__pins.pop(number) - 1
+            if count:
+                self.__pins[number] = count
+
+    def __record(self, node: SectionType) -> None:
+        """
+        Called before `node` is changed. Record its state as of the latest
+        version the first time it changes after each commit.
+        """
+        if node in self.__changed:
+            return
+        materialize(node)
+        state = _live_state(node)
+        with self.__lock:
+            self.__changed.add(node)
+            history = node.__dict__.get('_Section__history')
+            if history is None:
+                history = node.__dict__['_Section__history'] = []
+            history.append((self.version, state))
+            self.__histories.add(node)
+
+    def __prune(self) -> None:
+        """Drop recorded states older than the oldest pinned version."""
+        oldest = min(self.__pins, default=self.version)
+        for node in list(self.__histories):
+            history = [entry for entry in node.__dict__['_Section__history']
+                       if entry[0] >= oldest]
+            if history:
+                # replaced rather than changed, as readers may be iterating
+                node.__dict__['_Section__history'] = history
+            else:
+                del node.__dict__['_Section__history']
+                self.__histories.discard(node)
+
+
+class Version:
+    """
+    A pinned, immutable version of a :class:`VersionedStructure
+    <VersionedStructure>`. Its root is a read-only :class:`VersionView
+    <VersionView>`.
+    """
+
+    def __init__(self, structure: VersionedStructure, number: int) -> None:
+        self.number = number
+        self.__states: Dict[SectionType, NodeState] = {}
+        self.root = VersionView(self, structure.root)
+        self.__release = weakref.finalize(
+            self, structure._VersionedStructure__release, number)
+
+    def release(self) -> None:
+        """Unpin the version, letting its recorded history be freed."""
+        self.__release()
+
+    def __enter__(self) -> 'Version':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+    def state(self, node: SectionType) -> NodeState:
+        """Return the attrs and children of `node` as of this version."""
+        state = self.__states.get(node)
+        if state is None:
+            state = self.__states[node] = _state(node, self.number)
+        return state
+
+
+class VersionView:
+    """
+    A read-only node of a pinned :class:`Version <Version>`. Supports the
+    same read-only part of the Section interface as :class:`SectionView
+    <SectionView>`, reading the attributes stored on nodes.
+    """
+
+    default_gettype = 'hybrid'
+    default_attr = 'names'
+
+    def __init__(
+            self, version: Version, node: SectionType,
+            parent: Optional['VersionView'] = None, name: Any = SectionNone,
+    ) -> None:
+        self.__version = version
+        self.__node = node
+        self.__parent = parent
+        if parent is None:
+            name = version.state(node)[0].get(node._Section__keyname,
+                                              SectionNone)
+        self.__name = name
+
+    @property
+    def name(self) -> Any:
+        """The name of the node."""
+        return self.__name
+
+    @property
+    def parent(self) -> Optional['VersionView']:
+        """The parent node, or None for the version's root."""
+        return self.__parent
+
+    @property
+    def isleaf(self) -> bool:
+        """True iff self node has no children."""
+        return not len(self)
+
+    @property
+    def isroot(self) -> bool:
+        """True iff self node is the version's root."""
+        return self.__parent is None
+
+    @property
+    def children(self) -> 'VersionViews':
+        """The child nodes of self."""
+        return VersionViews(self.__version, [
+            type(self)(self.__version, child, self, key)
+            for key, child in self.__children()])
+
+    @property
+    def leaves(self) -> 'VersionViews':
+        """The leaf nodes of self, in the same order as Section.leaves."""
+        return VersionViews(self.__version, [
+            view for view in self.__iter_preorder() if view.isleaf])
+
+    @property
+    def descendants(self) -> 'VersionViews':
+        """Self and all its descendant nodes in depth-first order."""
+        return VersionViews(self.__version, list(self.__iter_preorder()))
+
+    def __len__(self) -> int:
+        return len(self.__children())
+
+    def __iter__(self) -> Iterator['VersionView']:
+        """Iterate over child nodes, as Section does, not over their keys."""
+        return iter(self.children)
+
+    def __contains__(self, name: Any) -> bool:
+        return any(key == name for key, _ in self.__children())
+
+    def __getitem__(self, name: Any) -> 'VersionView':
+        for key, child in self.__children():
+            if key == name:
+                return type(self)(self.__version, child, self, key)
+        raise KeyError(name)
+
+    def get(self, name: Any, default: Any = None) -> Any:
+        """Return the child named `name` if there is one, else `default`."""
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[Any]:
+        """The names of self's children."""
+        return [key for key, _ in self.__children()]
+
+    def values(self) -> 'VersionViews':
+        """The child nodes of self."""
+        return self.children
+
+    def items(self) -> List[Tuple[Any, 'VersionView']]:
+        """The (name, node) pairs of self's children."""
+        return [(view.name, view) for view in self.children]
+
+    def __call__(
+            self,
+            name: str = SectionNone,
+            gettype: GetType = 'default',
+            default: Any = SectionNone,
+    ) -> Union[Any, List[Any]]:
+        """
+        Return attribute `name` from self if it has it, else gather it from
+        the nearest descendants that have it, as
+        :meth:`Section.__call__ <Section.__call__>` does.
+        """
+        return _gather(self, [self], name, gettype, default)
+
+    def __getattr__(self, name: str) -> Any:
+        """Gather attribute `name` through :meth:`__call__`."""
+        if name.startswith(('__', '_VersionView')):
+            raise AttributeError(name)
+        return self(name)
+
+    def __repr__(self) -> str:
+        return (f'<{type(self).__name__} {self.__name!r} '
+                f'@{self.__version.number}>')
+
+    def __eq__(self, other: Any) -> bool:
+        return (isinstance(other, VersionView)
+                and other.__version is self.__version
+                and other.__node is self.__node)
+
+    def __hash__(self) -> int:
+        return hash((id(self.__version), id(self.__node)))
+
+    def _attrs(self) -> AnyDict:
+        """The attrs stored on self's node as of self's version."""
+        return self.__version.state(self.__node)[0]
+
+    def __children(self) -> Tuple[Tuple[Any, SectionType], ...]:
+        return self.__version.state(self.__node)[1]
+
+    def __iter_preorder(self) -> Iterator['VersionView']:
+        stack = [self]
+        while stack:
+            view = stack.pop()
+            yield view
+            stack.extend(reversed(view.children))
+
+
+class VersionViews(Sequence):
+    """
+    A sequence of :class:`VersionView <VersionView>` nodes whose attributes
+    can be gathered together, like the node returned by Section.leaves.
+    """
+
+    default_gettype = 'hybrid'
+    default_attr = 'names'
+
+    def __init__(self, version: Version, views: List[VersionView]) -> None:
+        self.__version = version
+        self.__views = views
+
+    def __len__(self) -> int:
+        return len(self.__views)
+
+    def __getitem__(
+            self, i: Union[int, slice]
+    ) -> Union[VersionView, 'VersionViews']:
+        if isinstance(i, slice):
+            return VersionViews(self.__version, self.__views[i])
+        return self.__views[i]
+
+    def names_list(self) -> List[Any]:
+        """Return the name of each node."""
+        return [view.name for view in self.__views]
+
+    def __call__(
+            self,
+            name: str = SectionNone,
+            gettype: GetType = 'default',
+            default: Any = SectionNone,
+    ) -> Union[Any, List[Any]]:
+        """Gather attribute `name` from each node like VersionView does."""
+        return _gather(self, self.__views, name, gettype, default)
+
+    def __getattr__(self, name: str) -> Any:
+        """Gather attribute `name` through :meth:`__call__`."""
+        if name.startswith(('__', '_VersionViews')):
+            raise AttributeError(name)
+        return self(name)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} of {len(self)} nodes>'
+
+
+def _live_state(node: SectionType) -> NodeState:
+    """Return the current attrs and children of `node`."""
+    prefix = node.cls._Section__private_prefix
+    # dict() and tuple() copy without running Python code, so a writer in
+    # another thread cannot change the node halfway through either copy
+    attrs = {k: v for k, v in dict(node.__dict__).items()
+             if k != 'parent' and not k.startswith(prefix)}
+    return attrs, tuple(OrderedDict.items(node))
+
+
+def _state(node: SectionType, number: int) -> NodeState:
+    """Return the attrs and children of `node` as of version `number`."""
+    materialize(node)
+    state = _live_state(node)
+    # a node's state is recorded before it is changed, so if the live copy
+    # above saw any change made since version `number`, the recorded state
+    # is found here
+    for version, recorded in node.__dict__.get('_Section__history', ()):
+        if version >= number:
+            return recorded
+    return state
+
+
+def _gather(
+        caller: Union[VersionView, VersionViews], views: List[VersionView],
+        name: str, gettype: GetType, default: Any
+) -> Any:
+    """
+    Gather attribute `name` from each of `views` that has it, else from the
+    nearest of its descendants that have it, and return the values in the
+    form requested by `gettype`, as Section.__call__ does.
+    """
+    if name is SectionNone:
+        name = caller.default_attr
+    names = forms(name)
+
+    def value(view: VersionView) -> Any:
+        attrs = view._attrs()
+        keyname = view._VersionView__node._Section__keyname
+        for form in names:
+            found_value = (view.name if form == keyname
+                           else attrs.get(form, SectionNone))
+            if found_value is not SectionNone:
+                return found_value
+        return SectionNone
+
+    found = nearest(views, value, lambda view: view.children)
+    default_key = caller if isinstance(caller, VersionView) else None
+    return gathered(caller, found, name, gettype, default, default_key,
+                    lambda view: view.name)
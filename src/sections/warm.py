@@ -0,0 +1,75 @@
+import sys
+import time
+from concurrent.futures import Future
+from threading import Thread
+from typing import Iterable
+from typing import NamedTuple
+
+from .properties import untracked
+from .types import SectionType
+
+
+class WarmReport(NamedTuple):
+    """
+    What warming caches with :meth:`Section.warm <Section.warm>` did.
+    `nbytes` is the size of the attribute dicts cached, not counting the
+    attribute values they share with the nodes.
+    """
+
+    seconds: float
+    nofnodes: int
+    nofentries: int
+    nbytes: int
+
+
+def warm(node: SectionType, names: Iterable[str]) -> WarmReport:
+    """See :meth:`Section.warm <Section.warm>`."""
+    start = time.perf_counter()
+    names = tuple(names)
+    nofnodes = nofentries = nbytes = 0
+    if not node.use_cache:
+        return WarmReport(time.perf_counter() - start, 0, 0, 0)
+    # postorder over the non-leaf nodes, so each node's attribute caches are
+    # filled from its children's, without recursion
+    stack = [(node, False)]
+    with untracked():
+        while stack:
+            current, children_done = stack.pop()
+            if current.isleaf:
+                continue
+            if not children_done:
+                stack.append((current, True))
+                stack.extend((child, False) for child in current.values())
+                continue
+            nofnodes += 1
+            cache = current._SectionAttrParser__cache
+            for name in names:
+                if name in cache:
+                    continue
+                current._get_nearest_attr(name)
+                attrs = cache.get(name)
+                if attrs is not None:
+                    nofentries += 1
+                    nbytes += sys.getsizeof(attrs)
+    return WarmReport(time.perf_counter() - start, nofnodes, nofentries,
+                      nbytes)
+
+
+def warm_in_background(
+        node: SectionType, names: Iterable[str],
+) -> 'Future[WarmReport]':
+    """
+    Warm caches as :func:`warm` does in a daemon thread, and return a future
+    for its report.
+    """
+    future: 'Future[WarmReport]' = Future()
+    future.set_running_or_notify_cancel()
+
+    def run() -> None:
+        try:
+            future.set_result(warm(node, names))
+        except BaseException as e:
+            future.set_exception(e)
+
+    Thread(target=run, daemon=True).start()
+    return future
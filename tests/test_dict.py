@@ -114,3 +114,27 @@ def test_getitem():
     # test getting non-existent key
     with pytest.raises(KeyError):
         assert s['non-existent-key']
+
+
+def test_graft() -> None:
+    a = sections('x', [{'big'}, [{'p'}, 'q', 'r'], 's'], price=[1, [[2, 3], 4]])
+    b = sections('y', 'z', price=[5, 6])
+    assert a.prices == [1, 2, 3, 4]
+    big = a['big']
+    b['copied'] = big
+    assert b['copied'] is not big and a['big'] is big
+    assert b['copied'].cls is b.cls and b.prices == [5, 6, 2, 3, 4]
+    assert b.graft('moved', big) is big
+    assert list(a.keys()) == ['x'] and a.prices == 1
+    assert big.cls is b.cls and big.parent is b and big.name == 'moved'
+    assert all(node.cls is b.cls for node in big.descendants_iter)
+    assert b.prices == [5, 6, 2, 3, 4, 2, 3, 4]
+    assert b.find_name('q', list)[-1].path == ('moved', 'p', 'q')
+    # moving within a structure
+    b['y'].graft('p', big['p'])
+    assert list(big.keys()) == ['s'] and b['y']['p'].leaves.names == ['q', 'r']
+    assert b['y']['p'].prices == [2, 3] and b['moved'].prices == 4
+    with pytest.raises(ValueError):
+        big.graft('b', b)
+    with pytest.raises(ValueError):
+        b['y']['p'].graft('y', b['y'])
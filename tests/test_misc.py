@@ -1,9 +1,16 @@
+import asyncio
+import gc
+import operator
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+from io import StringIO
 
 import pytest
 
 import sections
 from sections import Section
+from sections import SectionView
 
 from .test_doc_examples import test_docs_examples_details
 from .test_doc_examples import test_docs_examples_usage
@@ -67,6 +74,31 @@ def test_deep_leaf_instantiation() -> None:
     assert s[0][1][0].nofchildren == 0
 
 
+def test_very_deep_instantiation() -> None:
+    depth = 5000
+    x = ['leaf']
+    for _ in range(depth):
+        x = [x]
+    s = sections(x=x)
+    node = s
+    for _ in range(depth + 1):
+        assert node.nofchildren == 1
+        node = node[0]
+    assert node.x == 'leaf'
+    assert node.isleaf
+
+
+def test_structure_change_in_construction() -> None:
+    changed = []
+
+    class Tracked(Section):
+        def structure_change(self) -> None:
+            changed.append(self.name)
+
+    Tracked({'r'}, [{'a'}, 'a0', 'a1'], 'b')
+    assert sorted(changed, key=str) == ['a', 'a0', 'a1', 'b', 'r']
+
+
 def test_instantiation_abuse() -> None:
     import sections as sect
     s = sect(
@@ -153,6 +185,68 @@ def test_str() -> None:
     assert s1.node_str() == s2.node_str()
 
 
+def test_bounded_str() -> None:
+    s = sections('r', x=[[1, 2, 3], [4, 5]], y=['a' * 40, 'b'])
+    assert s.descendants_str() == str(s)
+    out = s.descendants_str(max_depth=1)
+    assert "'a" + 'a' * 39 + "'" in out
+    assert '... 3 more' in out and '... 2 more' in out
+    assert 'x = 1' not in out
+    out = s.descendants_str(max_children=1, elision='~')
+    assert 'x = 1' in out and 'x = 2' not in out
+    assert '~ 2 more' in out and '~ 1 more' in out
+    out = s.descendants_str(max_width=20)
+    assert max(map(len, out.split('\n'))) == 20
+    assert "y = 'aa..." in out
+    s.cls.str_max_depth = 0
+    assert str(s).count('more') == 1
+    buf = StringIO()
+    s.render(buf, max_depth=None)
+    assert '\n' + buf.getvalue() == s.descendants_str(max_depth=None)
+    # rendering does not recurse
+    depth = 3000
+    x = ['leaf']
+    for _ in range(depth):
+        x = [x]
+    s = sections(x=x)
+    assert "x = 'leaf'" in str(s)
+
+
+def test_str_cache() -> None:
+    def uncached_str(s):
+        s.cls.use_render_cache = False
+        string = str(s)
+        s.cls.use_render_cache = True
+        return string
+
+    s = sections({'r'}, [{'a'}, 'a0', 'a1'], [{'b'}, 'b0'],
+                 price=[{0}, [{1}, 2, 3], [{4}, 5]])
+    # values changed in place are printed as they are now by default
+    s['a']['a0'].tags = {'x'}
+    str(s)
+    s['a']['a0'].tags.add('y')
+    assert "'y'" in str(s) and "'y'" in s['a']['a0'].node_str()
+    del s['a']['a0'].tags
+    s.cls.use_render_cache = True
+    first = str(s)
+    assert str(s) is first
+    assert s['a'].node_str() is s['a'].node_str()
+    s['a']['a0'].price = 'a much longer price than before'
+    assert str(s) == uncached_str(s) != first
+    assert 'a much longer price' in str(s['a'])
+    del s['b']['b0'].price
+    s['b']['b1'] = sections(price=6)
+    assert str(s) == uncached_str(s)
+    s['b'].default_gettype = list
+    assert 'default_gettype' in str(s)
+    assert str(s) == uncached_str(s)
+    s.pop('a')
+    assert str(s) == uncached_str(s)
+    # copies from the node property do not share the cache
+    assert s['b'].node.nofchildren == 0
+    assert 'b1' not in str(s['b'].node)
+
+
 def test_deepcopy() -> None:
     tree = get_tree()
     tree_copy = deepcopy(tree)
@@ -160,3 +254,523 @@ def test_deepcopy() -> None:
     assert str(tree) == str(tree_copy)
     assert_tree(tree)
     assert_tree(tree_copy)
+
+
+def test_pickle() -> None:
+    factor = 3
+    s = sections(
+        'a', [{'b'}, 'b0', 'b1'], price=[1, [2, 3]],
+        total=property(lambda self: sum(self.leaves.prices)),
+        scaled=lambda self, k=2: [p * k * factor for p in self.prices],
+    )
+    loaded = pickle.loads(pickle.dumps(s))
+    assert str(loaded) == str(s)
+    assert loaded.cls is not s.cls and issubclass(loaded.cls, Section)
+    assert loaded.total == 6 and loaded['b'].scaled() == [12, 18]
+    assert loaded['b']['b1'].parent.parent is loaded
+    assert loaded.name is sections.SectionNone
+    # a pickled non-root node is unpickled as a root
+    b = pickle.loads(pickle.dumps(s['b']))
+    assert b.isroot and b.leaves.names == ['b0', 'b1'] and b.total == 5
+    tree = pickle.loads(pickle.dumps(get_tree()))
+    assert_tree(tree)
+    b_copy = deepcopy(s['b'])
+    assert b_copy.cls is s.cls and b_copy.parent.total == 6
+
+
+def test_pickle_attached(tmp_path) -> None:
+    s = sections('a', [{'b'}, 'b0', 'b1'], price=[1, [2, 3]])
+    changes = []
+    journal = s.journal(str(tmp_path / 'tree.journal'))
+    subscription = s.subscribe(lambda batch: changes.extend(batch))
+    versioned = s.versioned()
+    clone = s.clone()
+    loaded = pickle.loads(pickle.dumps(s))
+    assert not loaded.cls._Section__change_hooks
+    assert not loaded.cls._Section__change_listeners
+    for copy in (loaded, deepcopy(s)):
+        assert copy.leaves.prices == [1, 2, 3]
+        copy['b']['b0'].price = 20
+    assert not changes and s.leaves.prices == clone.leaves.prices == [1, 2, 3]
+    s['a'].price = 10
+    assert len(changes) == 1 and clone.leaves.prices == [1, 2, 3]
+    subscription.close()
+    versioned.close()
+    journal.close()
+    path = str(tmp_path / 'tree.db')
+    s.save_sqlite(path)
+    with Section.open_sqlite(path) as store:
+        loaded = pickle.loads(pickle.dumps(store.root))
+        loaded['b'].graft('a', loaded['a'])
+        assert loaded['b'].prices == [2, 3, 10]
+
+
+def test_snapshot(tmp_path) -> None:
+    path = str(tmp_path / 'tree.snapshot')
+    tree = get_tree()
+    tree.save(path)
+    loaded = Section.load(path)
+    assert isinstance(loaded, Section) and loaded.cls is not Section
+    # children are only read from the snapshot when first accessed
+    assert '_Section__pending' in loaded.__dict__
+    assert str(loaded) == str(tree)
+    assert '_Section__pending' not in loaded.__dict__
+    assert_tree(loaded)
+    assert_tree(deepcopy(Section.load(path)))
+
+    s = sections({'r'}, 'a', [{'b'}, 'b0', 'b1'], price=[1.5, [2, 2 ** 70]],
+                 flag=True, missing=None, _tags=[(2, 3), 'x'])
+    s.save(path)
+    loaded = Section.load(path)
+    assert loaded['b'].leaves.names == ['b0', 'b1']
+    assert loaded.prices == [1.5, 2, 2 ** 70]
+    assert loaded.flag is True and loaded.missing is None
+    assert loaded._tags == [(2, 3), 'x']
+    loaded['b']['b2'] = loaded.cls(price=4)
+    assert loaded.leaves.prices == [1.5, 2, 2 ** 70, 4]
+    with open(path, 'wb') as file:
+        file.write(b'not a snapshot')
+    with pytest.raises(ValueError):
+        Section.load(path)
+
+
+def test_shared_view(tmp_path) -> None:
+    s = sections({'r'}, 'a', [{'b'}, 'b0', 'b1'], price=[1, [2, 3]],
+                 _tags=[1, 2])
+    with s.share() as shared:
+        view = SectionView.attach(shared.name)
+        assert view.name == 'r' and view.isroot and len(view) == 2
+        assert list(view) == [view['a'], view['b']] and 'b' in view
+        assert view['b']['b1'].parent.parent == view
+        for gettype in ['hybrid', list, dict]:
+            assert view('price', gettype) == s('price', gettype)
+            assert view['b']('name', gettype) == s['b']('name', gettype)
+        assert view.leaves.names == s.leaves.names
+        assert view.children.names == ['a', 'b']
+        assert view.descendants.prices == s.descendants.prices
+        assert view['b'].prices == [2, 3] and view._tags == [1, 2]
+        assert view('missing', default=0) == 0
+        with pytest.raises(AttributeError):
+            view.missing
+        with pytest.raises(KeyError):
+            view['c']
+    path = str(tmp_path / 'tree.snapshot')
+    s.save(path)
+    assert SectionView.open(path)['b'].leaves.prices == [2, 3]
+
+
+def double_price(leaf: Section) -> int:
+    return leaf.price * 2
+
+
+def halve_price(leaf: Section) -> dict:
+    return {'price': leaf.price / 2}
+
+
+def test_map_reduce() -> None:
+    s = sections(*[[{i}, *range(i + 1)] for i in range(6)],
+                 price=[list(range(i + 1)) for i in range(6)])
+    prices = s.prices
+    with ProcessPoolExecutor(2) as executor:
+        doubled = s.map_reduce(double_price, executor=executor, nofchunks=3)
+        assert list(doubled) == list(s.leaves_iter)
+        assert list(doubled.values()) == [p * 2 for p in prices]
+        assert s.map_reduce(double_price, reduce=operator.add,
+                            executor=executor) == sum(prices) * 2
+        s.map_reduce(halve_price, executor=executor, write=True)
+    assert s.prices == s.leaves.prices == [p / 2 for p in prices]
+    assert s[5].prices == [p / 2 for p in range(6)]
+
+
+def test_map_reduce_attached(tmp_path) -> None:
+    s = sections(*[[{i}, *range(i + 1)] for i in range(4)],
+                 price=[list(range(i + 1)) for i in range(4)])
+    prices = s.prices
+    changes = []
+    with s.journal(str(tmp_path / 'tree.journal')):
+        with s.subscribe(changes.extend), ProcessPoolExecutor(2) as executor:
+            assert s.map_reduce(double_price, reduce=operator.add,
+                                executor=executor) == sum(prices) * 2
+            s.map_reduce(halve_price, executor=executor, write=True)
+    assert s.prices == [p / 2 for p in prices]
+    assert len(changes) == len(prices)
+
+
+def test_build_parallel() -> None:
+    specs = [
+        ([{f'g{g}'}, *[[{k}, 'x', 'y'] for k in range(3)]],
+         {'price': [[g, k] for k in range(3)]})
+        for g in range(4)
+    ] + [((), {'total': property(lambda self: sum(self.leaves.prices))})]
+    with ProcessPoolExecutor(2) as executor:
+        s = sections.build_parallel(specs, executor=executor, name='root')
+    serial = sections(*[sections(*args, **kwds) for args, kwds in specs[:-1]])
+    assert s.name == 'root' and list(s.keys()) == ['g0', 'g1', 'g2', 'g3', 4]
+    assert s['g2'][1].prices == [2, 1] and s['g2'][1]['y'].parent.parent.parent is s
+    assert s.leaves.prices == serial.leaves.prices
+    assert s.total == sum(serial.leaves.prices)
+    assert all(node.cls is s.cls for node in s.descendants_iter)
+
+
+def test_clone() -> None:
+    s = sections(*[[{f'g{g}'}, *range(3)] for g in range(3)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(3)])
+    prices = s.prices
+    c = s.clone()
+    assert c is not s and c.isroot and '_Section__pending' in c.__dict__
+    assert c.prices == prices and '_Section__pending' in c.__dict__
+    assert list(c.keys()) == list(s.keys()) and c['g1'][2].price == 5
+    c['g1'][2].price = -1
+    del c['g0']
+    assert s.prices == prices and list(s.keys()) == ['g0', 'g1', 'g2']
+    assert c.prices == [3, 4, -1, 6, 7, 8]
+    s['g2'][0].price = 100
+    s['g1'].clear()
+    assert c.prices == [3, 4, -1, 6, 7, 8] and c['g1'].nofchildren == 3
+    assert s.prices == [0, 1, 2, 100, 7, 8]
+    sub = s['g0'].clone()
+    s['g0'][1].price = 50
+    assert sub.prices == [0, 1, 2] and sub.isroot and sub.name == 'g0'
+    del c, sub
+    gc.collect()
+    assert not s.cls._Section__change_hooks
+
+
+def test_versions() -> None:
+    s = sections(*[[{f'g{g}'}, *range(3)] for g in range(3)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(3)])
+    versioned = s.versioned()
+    v0 = versioned.pin()
+    with versioned.batch() as root:
+        root['g1'][2].price = -1
+        del root['g0']
+        root['g2']['new'] = sections(price=9)
+        root['g2'].graft('moved', root['g1'][0])
+    assert versioned.version == 1 and s.prices == [4, -1, 6, 7, 8, 9, 3]
+    assert v0.number == 0 and v0.root.prices == list(range(9))
+    assert v0.root.keys() == ['g0', 'g1', 'g2'] and v0.root['g1'][0].price == 3
+    assert v0.root.leaves.names == [0, 1, 2] * 3
+    assert [child.name for child in v0.root] == ['g0', 'g1', 'g2']
+    with versioned.pin() as v1:
+        assert v1.root.prices == [4, -1, 6, 7, 8, 9, 3]
+        assert v1.root['g2'].keys() == [0, 1, 2, 'new', 'moved']
+        assert v1.root['g2']['moved'].parent.name == 'g2'
+        assert v1.root['g2']('price', dict)['moved'] == 3
+    v0.release()
+    versioned.commit()
+    assert not any('_Section__history' in node.__dict__
+                   for node in s.descendants_iter)
+    versioned.close()
+    with s.versioned() as versioned:
+        versioned.pin()
+        s['g1'][0].price = 0
+    assert not s.cls._Section__change_hooks
+    assert not any('_Section__history' in node.__dict__
+                   for node in s.descendants_iter)
+
+
+def test_diff() -> None:
+    a = sections(*[[{f'g{g}'}, *range(3)] for g in range(4)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(4)])
+    b = deepcopy(a)
+    assert a.content_hash == b.content_hash and not any(a.diff(b))
+    b['g0'][1].price = -1
+    b['g1'].graft('moved', b['g2'][0])
+    del b['g3']
+    b['g0']['new'] = sections(price=9)
+    assert a.content_hash != b.content_hash
+    assert a['g1'][0].content_hash == b['g1'][0].content_hash
+    diff = Section.diff(a, b)
+    assert [node.path for node in diff.added] == [('g0', 'new')]
+    assert [node.path for node in diff.removed] == [('g3',)]
+    assert [(x.path, y.path) for x, y in diff.moved] == [
+        (('g2', 0), ('g1', 'moved'))]
+    assert [(x.path, y.path) for x, y in diff.changed] == [
+        (('g0', 1), ('g0', 1))]
+    b['g0'][1].price = 1
+    assert len(a.diff(b).changed) == 0
+
+
+def test_interned_snapshot(tmp_path) -> None:
+    options = [[{f'o{j}'}, 'x', 'y'] for j in range(2)]
+    s = sections(*[[{f'p{i}'}, *options] for i in range(3)],
+                 price=[[[1, 2], [3, 4]]] * 3)
+    s['p2']['o1']['y'].price = 5
+    path = str(tmp_path / 's.snap')
+    s.save(path, intern=True)
+    view = SectionView.open(path)
+    assert view.prices == s.prices and view.leaves.names == s.leaves.names
+    # views of a shared node are equal, whichever parent they were reached by
+    assert view['p1']['o0'] == view['p0']['o0'] == view['p2']['o0']
+    assert view['p2']['o1'] != view['p0']['o1']
+    s.save(str(tmp_path / 'flat.snap'))
+    assert (tmp_path / 's.snap').stat().st_size < (
+        tmp_path / 'flat.snap').stat().st_size
+    assert view['p1']['o1']['x'].parent.parent.name == 'p1'
+    assert [leaf.parent.parent.name for leaf in view.leaves] == [
+        leaf.parent.parent.name for leaf in s.leaves]
+    assert view.descendants.prices == s.descendants.prices
+    assert view['p2']('price', dict) == s['p2']('price', dict)
+    loaded = Section.load(path)
+    assert loaded.prices == s.prices and loaded['p1']['o1'].parent.name == 'p1'
+    frozen = s.freeze(intern=True)
+    assert frozen.prices == s.prices and frozen['p2']['o1']['y'].price == 5
+
+
+def test_journal(tmp_path) -> None:
+    def build():
+        return sections(*[[{f'g{g}'}, *range(3)] for g in range(3)],
+                        price=[[g * 3 + k for k in range(3)] for g in range(3)])
+    s = build()
+    snapshot, journal = str(tmp_path / 's.snap'), str(tmp_path / 's.jrnl')
+    s.save(snapshot)
+    with s.journal(journal, flush_every=2):
+        s['g0'][1].price = -1
+        s['g1'].tag = 'x'
+        del s['g1'].tag
+        s['g2']['new'] = sections(price=9)
+        s['g2'].graft('moved', s['g1'][0])
+        s['g1'].pop(1)
+        s['g0'].move_to_end(0)
+        s['g0'].insert(1, sections(name='inserted', price=7))
+        s['g0'].graft('copied', build()['g2'])
+        # popped children are journaled by key, not by name
+        s['g2'][1].name = 'renamed'
+        s['g2'].pop(1)
+        s['g2']['new'].name = 'N'
+        s['g2'].pop(2)
+    loaded = Section.load(snapshot)
+    assert loaded.replay(journal) == 13
+    assert not any(s.diff(loaded)) and loaded.prices == s.prices
+    assert list(loaded['g0'].keys()) == [1, 'inserted', 2, 0, 'copied']
+    # a record cut short by a crash ends the journal
+    with open(journal, 'ab') as file:
+        file.write(b'\xff\x00\x00\x00\x80')
+    assert Section.load(snapshot).replay(journal) == 13
+    compacted = Section.compact(snapshot, journal)
+    assert compacted.prices == s.prices
+    # the journal was emptied, so a restart does not replay it twice
+    reopened = Section.load(snapshot)
+    assert reopened.replay(journal) == 0
+    assert not any(s.diff(reopened)) and reopened.prices == s.prices
+
+
+def test_sqlite(tmp_path) -> None:
+    s = sections(*[[{f'g{g}'}, *range(20)] for g in range(10)],
+                 price=[[g * 20 + k for k in range(20)] for g in range(10)])
+    path = str(tmp_path / 's.db')
+    s.save_sqlite(path)
+    store = Section.open_sqlite(path, cache_budget=50)
+    root = store.root
+    # gathered with range queries, without paging in any node
+    assert root.prices == s.prices and store.nofloaded == 0
+    assert root['g3'].prices == s['g3'].prices and store.nofloaded == 10
+    assert [len(group) for group in root] == [20] * 10
+    assert store.nofloaded <= 50
+    with store.batch():
+        root['g0'][1].price = -1
+        root['g1'].tag = 'x'
+        root['g2']['new'] = {'price': 9}
+        root['g2'].graft('moved', root['g1'][0])
+        root['g0'].insert(0, sections(name='first', price=7))
+        removed = root['g3'].pop(5)
+        root['g4'].clear()
+    assert removed.price == 65 and '_Section__store_path' not in removed.__dict__
+    expected = root.prices
+    store.close()
+    with Section.open_sqlite(path) as store:
+        root = store.root
+        assert root.prices == expected and root['g1'].tag == 'x'
+        assert list(root['g0'].keys())[:3] == ['first', 0, 1]
+        assert list(root['g2'].keys())[-2:] == ['new', 'moved']
+        assert 5 not in root['g3'] and root['g4'].isleaf
+    # paging in the graft's target does not evict the source's page
+    with Section.open_sqlite(path, cache_budget=20) as store:
+        root = store.root
+        moved = root['g5'][3]
+        root['g6'].graft('moved', moved)
+        assert root['g6']['moved'] is moved and 3 not in root['g5']
+        store.commit()
+    with Section.open_sqlite(path) as store:
+        assert store.root['g6']['moved'].price == 103
+        assert 3 not in store.root['g5']
+
+
+def test_abuild() -> None:
+    async def records(n):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield {'sector': f's{i % 3}', 'ticker': f't{i % 6}', 'price': i}
+
+    async def build():
+        builder = Section.abuild(records(100), group_by=['sector', 'ticker'],
+                                 chunk_size=10)
+        task = asyncio.ensure_future(builder)
+        seen = []
+        while not task.done():
+            # readers only ever see whole chunks, with caches up to date
+            if builder.root.isparent:
+                seen.append(len(builder.root('prices', gettype=list)))
+                builder.root.find_name('s0')
+            await asyncio.sleep(0)
+        return await task, seen
+
+    root, seen = asyncio.run(build())
+    assert set(seen) <= set(range(0, 101, 10)) and len(set(seen)) > 2
+    assert list(root.keys()) == ['s0', 's1', 's2']
+    assert list(root['s0'].keys()) == ['t0', 't3']
+    assert root['s1']['t4'].prices == list(range(4, 100, 6))
+    assert root['s1']['t4'][0].ticker == 't4'
+    # the index built after the first chunk is kept up to date
+    assert len(root.find_name(16, gettype=list)) == 4
+
+
+def test_subscribe() -> None:
+    s = sections(*[[{f'g{g}'}, *range(3)] for g in range(2)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(2)])
+    batches = []
+    with s.subscribe(batches.append):
+        s['g0'][1].price = -1
+        s['g1']['new'] = sections(price=9)
+        s['g1'].graft('moved', s['g0'][0])
+    assert [[change[:3] for change in batch] for batch in batches] == [
+        [('changed', s['g0'][1], 'price')],
+        [('added', s['g1'], 'new')],
+        [('removed', s['g0'], 0), ('added', s['g1'], 'moved')],
+    ]
+    batches.clear()
+    subscription = s.subscribe(batches.append, attrs=['price'],
+                               subtree=s['g1'], delivery='deferred')
+    for value in range(3):
+        s['g1'][1].price = value
+    s['g1'][1].other = 0
+    s['g0'][1].price = 0
+    del s['g1'][2]
+    assert not batches
+    subscription.flush()
+    assert batches == [[('changed', s['g1'][1], 'price', 2),
+                        ('removed', s['g1'], 2, None)]]
+    subscription.close()
+
+    async def changes_per_batch():
+        batches = []
+        s.subscribe(batches.append, delivery='asyncio')
+        s['g0'][1].price = 1
+        s['g1'].clear()
+        await asyncio.sleep(0)
+        s['g0'][1].price = 2
+        await asyncio.sleep(0)
+        return [[change.kind for change in batch] for batch in batches]
+
+    assert asyncio.run(changes_per_batch()) == [['changed', 'removed'],
+                                                ['changed']]
+
+
+def test_cached_property() -> None:
+    calls = []
+
+    class Portfolio(sections.Section):
+        @sections.cached_property
+        def total(self):
+            calls.append(self)
+            return sum(self('price', gettype=list))
+
+        @sections.cached_property
+        def first_name(self):
+            calls.append(self)
+            return next(iter(self.values())).name
+
+        @sections.cached_property
+        def double(self):
+            return self.price * 2
+
+    s = Portfolio(*[[{f'g{g}'}, *range(3)] for g in range(2)],
+                  price=[[g * 3 + k for k in range(3)] for g in range(2)])
+    assert s.total == 15 and s.total == 15 and len(calls) == 1
+    assert s['g1'].total == 12 and len(calls) == 2
+    s['g0'][1].other = 0
+    assert s.total == 15 and s['g1'].total == 12 and len(calls) == 2
+    s['g0'][1].price = 10
+    assert s.total == 24 and len(calls) == 3
+    assert s['g1'].total == 12 and len(calls) == 3
+    del s['g1'][2]
+    assert s.total == 19 and s['g1'].total == 7 and len(calls) == 5
+    assert s.first_name == 'g0' and len(calls) == 6
+    s['g0'].other = 1
+    assert s.first_name == 'g0' and len(calls) == 7
+    s.move_to_end('g0')
+    assert s.first_name == 'g1' and s.total == 19 and len(calls) == 9
+    leaf = s['g1'][1]
+    assert leaf.double == 8
+    leaf.price = 5
+    assert leaf.double == 10
+
+
+def test_gather() -> None:
+    s = sections(*[[{f'g{g}'}, *range(3)] for g in range(2)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(2)],
+                 qty=[[1, 2, 3], 4], status='ok')
+    assert s.gather(['prices', 'qty', 'status'], 'columns') == {
+        'prices': s('price', list), 'qty': [1, 2, 3, 4, 4, 4],
+        'status': ['ok'] * 6,
+    }
+    assert s['g1'].gather(['price', 'qty'])[0] == {'price': 3, 'qty': 4}
+    s['g1'][2].price = -1
+    s.status = 'done'
+    assert s.gather(['price', 'status'], 'records')[-1] == {
+        'price': -1, 'status': 'done'}
+    assert s.gather(['price', 'size'], 'columns', default=0)['size'] == [0] * 6
+    with pytest.raises(AttributeError):
+        s.gather(['price', 'size'])
+
+
+def test_warm() -> None:
+    s = sections(*[[{f'g{g}'}, *range(3)] for g in range(2)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(2)])
+    report = s.warm(['price'])
+    assert (report.nofnodes, report.nofentries) == (3, 3)
+    assert report.nbytes > 0
+    assert 'prices' in s['g1']._SectionAttrParser__cache
+    assert s.warm(['price']).nofentries == 0
+    s['g1'][0].price = -1
+    assert s.warm(['price'], background=True).result().nofentries == 2
+    assert s('price', list) == [0, 1, 2, -1, 4, 5]
+
+
+def test_accessor() -> None:
+    s = sections(*[[{f'g{g}'}, *range(3)] for g in range(2)],
+                 price=[[g * 3 + k for k in range(3)] for g in range(2)])
+    prices = s.cls.accessor('prices', gettype=list)
+    price = s.cls.accessor('price')
+    assert prices(s) == s('prices', list) == prices(s)
+    assert prices(s['g1'][0]) == [3] and price(s['g1'][0]) == 3
+    assert price(s['g1']) == [3, 4, 5]
+    s['g1'][0].price = -1
+    assert prices(s) == [0, 1, 2, -1, 4, 5]
+    assert s.cls.accessor('size', default=0)(s) == 0
+    with pytest.raises(AttributeError):
+        s.cls.accessor('size')(s)
+
+
+def test_keys_kept_apart_from_names(tmp_path) -> None:
+    assert len(deepcopy(sections(x=[[1, 2], [3, 4]]).leaves)) == 4
+    s = sections('a', 'b', price=[1, 2])
+    s['b'].name = 'a'
+    s.save(str(tmp_path / 'tree.snapshot'))
+    s.save_sqlite(str(tmp_path / 'tree.db'))
+    for copy in (deepcopy(s), pickle.loads(pickle.dumps(s)),
+                 Section.load(str(tmp_path / 'tree.snapshot')),
+                 Section.open_sqlite(str(tmp_path / 'tree.db')).root,
+                 s.freeze(), s.freeze(intern=True)):
+        assert list(copy.keys()) == ['a', 'b']
+        assert copy['b'].name == 'a' and copy['b'].price == 2
+
+
+def test_content_hash_collisions() -> None:
+    for x, y in ((-1, -2), (1, 2 ** 61), ([1], (1,)), ({1: 'a'}, {1: 'b'})):
+        a = sections('x', 'y', price=[x, 5])
+        b = sections('x', 'y', price=[y, 5])
+        assert a.content_hash != b.content_hash
+        assert a.diff(b).changed == [(a['x'], b['x'])]
+    with pytest.raises(AttributeError, match="'content_hash' is a reserved"):
+        sections('x', 'y', content_hash=[1, 2])
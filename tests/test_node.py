@@ -18,3 +18,155 @@ def test_get_self_attr() -> None:
     assert sect.node.names == 0
     with pytest.raises(AttributeError):
         assert sect.node.x
+
+
+def test_path_index() -> None:
+    library = sections(
+        [{'Fiction'}, [{'Tolkien'}, 'LOTR', 'Hobbit'], [{'Rowling'}, 'HP']],
+        [{'Non-Fiction'}, [{'Hawking'}, 'Time'], [{'Tolkien'}, 'Letters']],
+    )
+    lotr = library.at(('Fiction', 'Tolkien', 'LOTR'))
+    assert lotr is library['Fiction']['Tolkien']['LOTR']
+    assert lotr.path == ('Fiction', 'Tolkien', 'LOTR')
+    assert library.at(()) is library
+    assert library.path == ()
+    with pytest.raises(KeyError):
+        library.at(('Fiction', 'Nobody'))
+    assert library.find_name('LOTR') is lotr
+    assert library.find_name('LOTR', list) == [lotr]
+    # duplicate names are all found, but only from the searching node down
+    assert len(library.find_name('Tolkien')) == 2
+    assert library['Fiction'].find_name('Tolkien').path == (
+        'Fiction', 'Tolkien')
+    with pytest.raises(KeyError):
+        library['Fiction'].find_name('Letters')
+    # the index and cached paths are kept current as the structure changes
+    library['Fiction']['Tolkien']['Silmarillion'] = sections()
+    assert library.find_name('Silmarillion').path == (
+        'Fiction', 'Tolkien', 'Silmarillion')
+    del library['Fiction']['Tolkien']['LOTR']
+    with pytest.raises(KeyError):
+        library.find_name('LOTR')
+    hp = library['Fiction'].pop('Rowling')['HP']
+    with pytest.raises(KeyError):
+        library.find_name('HP')
+    library['Non-Fiction']['Rowling'] = sections('Rowling', hp)
+    assert library.find_name('HP').path == ('Non-Fiction', 'Rowling', 'HP')
+    time = library.find_name('Time')
+    assert time.path == ('Non-Fiction', 'Hawking', 'Time')
+    library['Non-Fiction']['Hawking'].name = 'S. Hawking'
+    assert library.find_name('S. Hawking').name == 'S. Hawking'
+    with pytest.raises(KeyError):
+        library.find_name('Hawking')
+    assert time.parent.name == 'S. Hawking'
+    # renaming does not re-key a node, so paths hold keys rather than names
+    assert time.path == ('Non-Fiction', 'Hawking', 'Time')
+    assert library.at(time.path) is time
+    # path and depth are reserved, but can be replaced by properties
+    with pytest.raises(AttributeError, match="'path' is a reserved"):
+        sections('a', 'b', path=[1, 2])
+    with pytest.raises(AttributeError, match="'depth' is a reserved"):
+        sections(depth=1)
+    s = sections('a', 'b', path=property(lambda self: [self.name]))
+    assert s['b'].path == ['b']
+
+
+def test_ancestry() -> None:
+    s = sections({0}, [{1}, [{2}, 3, 4], 5], [{6}, 7, 8])
+    n1, n2, n3, n4, n5 = (s.find_name(i) for i in range(1, 6))
+    n6, n7, n8 = (s.find_name(i) for i in range(6, 9))
+    assert [s.depth, n1.depth, n2.depth, n3.depth, n7.depth] == [0, 1, 2, 3, 2]
+    assert s.is_ancestor_of(n3)
+    assert n1.is_ancestor_of(n4)
+    assert not n1.is_ancestor_of(n7)
+    assert not n3.is_ancestor_of(n1)
+    assert not n1.is_ancestor_of(n1)
+    assert sections.Section.lca(n3, n4) is n2
+    assert sections.Section.lca(n3, n5) is n1
+    assert sections.Section.lca(n4, n7) is s
+    assert sections.Section.lca(n2, n3) is n2
+    assert sections.Section.lca(n3, sections()) is None
+    # the ancestry tables are rebuilt after the structure changes
+    n6[9] = n1.pop(2)
+    assert n3.depth == 3
+    assert n6.is_ancestor_of(n3)
+    assert not n1.is_ancestor_of(n3)
+    assert sections.Section.lca(n3, n7) is n6
+    assert sections.Section.lca(n3, n5) is s
+    n6.pop(9)
+    assert n6.isleaf is False
+    assert sections.Section.lca(n7, n8) is n6
+
+
+def test_positional_access() -> None:
+    s = sections({0}, [{1}, [{2}, 3, 4], 5], [{6}, 7, 8])
+    assert s.nofleaves == 5
+    assert s.nofdescendants == 9
+    assert s[1].nofleaves == 3
+    assert [s.leaf_at(i).name for i in range(5)] == [3, 4, 5, 7, 8]
+    assert s.leaf_at(-1).name == 8
+    with pytest.raises(IndexError):
+        s.leaf_at(5)
+    assert s.leaves_slice(1, 4).names == [4, 5, 7]
+    assert s.leaves_slice(3).names == [7, 8]
+    assert s.leaves_slice(4, 2).nofchildren == 0
+    assert [s.descendant_at(i).name for i in range(9)] == list(range(9))
+    assert s[1].descendant_at(2).name == 3
+    for i, node in enumerate(s.descendants_iter):
+        assert s.descendant_rank(node) == i
+    with pytest.raises(ValueError):
+        s[6].descendant_rank(s.find_name(3))
+    # counts are kept current as the structure changes
+    s[6][9] = sections(x=[0, 1, 2])
+    assert s.nofleaves == 8
+    assert s.nofdescendants == 13
+    assert s.leaves_slice(-4).names == [8, 0, 1, 2]
+    del s[1][2]
+    assert s.nofleaves == 6
+    assert [s.leaf_at(i).name for i in range(6)] == [5, 7, 8, 0, 1, 2]
+    s.move_to_end(1)
+    assert s.leaf_at(0).name == 7
+    assert s.descendant_rank(s[1]) == 8
+    for name in ['nofleaves', 'nofdescendants']:
+        with pytest.raises(AttributeError, match=f"'{name}' is a reserved"):
+            sections('a', 'b', **{name: [1, 2]})
+
+
+def test_cached_sequences() -> None:
+    s = sections({0}, [{1}, 2, 3], [{4}, 5, 6],
+                 price=[{0}, [{1}, 2, 3], [{4}, 5, 6]])
+    leaves = s.leaves
+    assert s.leaves is leaves
+    assert s.entries is leaves
+    assert s.flat is s.descendants
+    assert leaves.names == [2, 3, 5, 6]
+    assert leaves.prices == [2, 3, 5, 6]
+    # attribute edits keep the cached nodes, but not their cached attributes
+    s[1][2].price = 20
+    s[4].price = [50, 60]
+    assert s.leaves is leaves
+    assert s.leaves.prices == [20, 3, 50, 60]
+    assert s[1].leaves.prices == [20, 3]
+    assert s.descendants.prices == [0, 1, 20, 3, 4, 50, 60]
+    del s[4][5].price
+    assert s.leaves.prices == [20, 3, 60]
+    # structure changes rebuild them
+    s[4][7] = sections(price=70)
+    assert s.leaves is not leaves
+    assert s.leaves.names == [2, 3, 5, 6, 7]
+    assert s.descendants.names == [0, 1, 2, 3, 4, 5, 6, 7]
+    s[1].pop(3)
+    assert s.leaves.names == [2, 5, 6, 7]
+    # the cached nodes are shared, so they cannot be changed
+    with pytest.raises(TypeError):
+        s.leaves.pop(0)
+    with pytest.raises(TypeError):
+        s.descendants.label = 'x'
+    assert s.leaves.names == [2, 5, 6, 7]
+    # views can be modified without affecting the structure's index
+    view = s[4].children
+    view.pop(s.find_name(6))
+    assert s.find_name(6).name == 6
+    s.cls.use_cache = False
+    assert s.leaves is not s.leaves
+    assert s.leaves.prices == [20, 60, 70]